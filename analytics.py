@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Market analytics: a deal score for each new listing.
+
+A car's deal score is where its price falls among comparable cars: the same
+model (card title), a year within one either side, and the same mileage band
+(MARKET_MILEAGE_BAND_KM wide). Prices are compared in AZN, converted at
+MARKET_RATES.
+
+Comparables are every priced listing card the monitor has seen, read from the
+normalized columns of listing_state. MarketIndex keeps one sorted NumPy array
+of prices per (model, year, band) group, so any quantile of a group is an
+index and a price's rank is a binary search. The index is built once, with
+a single lexsort over all rows, and kept current from each cycle's listing
+cards by inserting into, or removing from, the affected group only.
+
+Needs numpy (pip install numpy); without it deal scores are left out.
+"""
+import importlib.util
+import logging
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from car_scraper import CarListing, normalize_card, parse_price
+from config import MARKET_MILEAGE_BAND_KM, MARKET_MIN_COMPARABLES, MARKET_RATES
+from metrics import MARKET_LISTINGS
+
+# numpy is imported where it is used, so importing the web app stays fast
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = "AZN"
+
+# Cars with mileage missing from the card are grouped on their own
+UNKNOWN_BAND = -1
+
+# Upper percentile bound of each deal label
+DEAL_LABELS = ((20, "great"), (40, "good"), (60, "fair"), (100, "high"))
+
+# Bootstrap badge colour of each label on the dashboard and cars pages
+DEAL_BADGES = {
+    "great": "success",
+    "good": "info",
+    "fair": "secondary",
+    "high": "danger",
+}
+
+GroupKey = Tuple[str, int, int]
+
+
+def azn_price(
+    price_text: Optional[str], rates: Optional[Dict[str, float]] = None
+) -> Optional[float]:
+    """A listing price in AZN ('$9 000' -> 15300.0), or None if unknown."""
+    value, currency = parse_price(price_text)
+    # Prices without a currency marker are in AZN, as on turbo.az
+    currency = currency or BASE_CURRENCY
+    if currency == BASE_CURRENCY:
+        rate = 1.0
+    else:
+        rate = (MARKET_RATES if rates is None else rates).get(currency)
+    if value is None or rate is None:
+        return None
+    return value * rate
+
+
+def deal_label(percentile: float) -> str:
+    for bound, label in DEAL_LABELS:
+        if percentile <= bound:
+            return label
+    return DEAL_LABELS[-1][1]
+
+
+class MarketIndex:
+    """Sorted AZN prices per (model, year, mileage band) group."""
+
+    def __init__(
+        self,
+        band_km: int = MARKET_MILEAGE_BAND_KM,
+        rates: Optional[Dict[str, float]] = None,
+        min_comparables: int = MARKET_MIN_COMPARABLES,
+    ):
+        self.band_km = max(1, band_km)
+        self.rates = {BASE_CURRENCY: 1.0, **(MARKET_RATES if rates is None else rates)}
+        self.min_comparables = min_comparables
+        self.groups: Dict[GroupKey, "np.ndarray"] = {}
+        # car_id -> (group, price), to move a car when its card changes
+        self.cars: Dict[str, Tuple[GroupKey, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.cars)
+
+    def _band(self, km: Optional[int]) -> int:
+        return UNKNOWN_BAND if km is None else km // self.band_km
+
+    def load(self, rows: List[Tuple]):
+        """Replace the index with get_market_rows() rows: (car_id, model,
+        year, mileage_km, engine_l, price_value, currency)."""
+        import numpy as np
+
+        self.groups.clear()
+        self.cars.clear()
+        MARKET_LISTINGS.set(0)
+        if not rows:
+            return
+        car_ids, models, years, kms, _, values, currencies = zip(*rows)
+
+        codes, currency_index = np.unique(
+            np.array([code or BASE_CURRENCY for code in currencies]),
+            return_inverse=True,
+        )
+        rates = np.array(
+            [self.rates.get(code, np.nan) for code in codes.tolist()], dtype=float
+        )
+        prices = np.array(values, dtype=float) * rates[currency_index]
+        km = np.array(kms, dtype=float)
+        bands = np.where(np.isnan(km), UNKNOWN_BAND, km // self.band_km)
+        bands = bands.astype(np.int64)
+        years = np.array(years, dtype=np.int64)
+        names, model_index = np.unique(np.array(models), return_inverse=True)
+        ids = np.array(car_ids)
+
+        # Unknown currencies have no rate
+        keep = ~np.isnan(prices)
+        prices, bands, years = prices[keep], bands[keep], years[keep]
+        model_index, ids = model_index[keep], ids[keep]
+        if not len(prices):
+            return
+
+        # One sort orders rows by group, then by price within each group
+        order = np.lexsort((prices, bands, years, model_index))
+        prices, bands, years = prices[order], bands[order], years[order]
+        model_index, ids = model_index[order], ids[order]
+        starts = (
+            np.flatnonzero(
+                (np.diff(model_index) != 0)
+                | (np.diff(years) != 0)
+                | (np.diff(bands) != 0)
+            )
+            + 1
+        )
+
+        group_names = names[model_index[np.r_[0, starts]]].tolist()
+        group_years = years[np.r_[0, starts]].tolist()
+        group_bands = bands[np.r_[0, starts]].tolist()
+        for name, year, band, group_prices, group_ids in zip(
+            group_names,
+            group_years,
+            group_bands,
+            np.split(prices, starts),
+            np.split(ids, starts),
+        ):
+            key = (name, year, band)
+            self.groups[key] = group_prices
+            for car_id, price in zip(group_ids.tolist(), group_prices.tolist()):
+                self.cars[car_id] = (key, price)
+        MARKET_LISTINGS.set(len(self.cars))
+
+    def entry(self, car: CarListing) -> Optional[Tuple[GroupKey, float]]:
+        """(group, AZN price) of a listing card, or None if it has no model,
+        year or usable price."""
+        model, year, km, _ = normalize_card(
+            car.title, car.year, car.mileage, car.engine
+        )
+        price = azn_price(car.price, self.rates)
+        if model is None or year is None or price is None:
+            return None
+        return (model, year, self._band(km)), price
+
+    def observe(self, cars: Iterable[CarListing]) -> int:
+        """Add new cards and move changed ones; returns how many changed."""
+        changed = 0
+        for car in cars:
+            entry = self.entry(car)
+            known = self.cars.get(car.car_id)
+            if entry == known:
+                continue
+            if known is not None:
+                self._remove(*known)
+            if entry is None:
+                del self.cars[car.car_id]
+            else:
+                self._insert(*entry)
+                self.cars[car.car_id] = entry
+            changed += 1
+        if changed:
+            MARKET_LISTINGS.set(len(self.cars))
+        return changed
+
+    def _insert(self, key: GroupKey, price: float):
+        import numpy as np
+
+        prices = self.groups.get(key)
+        if prices is None:
+            self.groups[key] = np.array([price])
+            return
+        self.groups[key] = np.insert(prices, np.searchsorted(prices, price), price)
+
+    def _remove(self, key: GroupKey, price: float):
+        import numpy as np
+
+        prices = self.groups[key]
+        if len(prices) == 1:
+            del self.groups[key]
+            return
+        self.groups[key] = np.delete(prices, np.searchsorted(prices, price))
+
+    def score(self, car: CarListing) -> Dict:
+        """The car's deal score, or {} with too few comparables.
+
+        percentile: share of comparable cars priced below this one (ties
+        count half), 0-100; comparables: how many there are; median: their
+        median price in AZN; label: great, good, fair or high.
+        """
+        import numpy as np
+
+        entry = self.entry(car)
+        if entry is None:
+            return {}
+        (model, year, band), price = entry
+
+        keys = [(model, other, band) for other in (year - 1, year, year + 1)]
+        groups = [self.groups[key] for key in keys if key in self.groups]
+        if not groups:
+            return {}
+        prices = np.concatenate(groups) if len(groups) > 1 else groups[0]
+
+        # The car itself is in the index once observed
+        own = self.cars.get(car.car_id)
+        if own is not None and own[0] in keys:
+            prices = np.delete(prices, np.flatnonzero(prices == own[1])[:1])
+        if len(prices) < self.min_comparables:
+            return {}
+
+        below = sum(int(np.searchsorted(group, price)) for group in groups)
+        equal = (
+            sum(int(np.searchsorted(group, price, side="right")) for group in groups)
+            - below
+        )
+        if own is not None and own[0] in keys:
+            if own[1] < price:
+                below -= 1
+            elif own[1] == price:
+                equal -= 1
+        percentile = round(100 * (below + 0.5 * equal) / len(prices))
+        return {
+            "percentile": percentile,
+            "comparables": len(prices),
+            "median": int(round(float(np.median(prices)))),
+            "label": deal_label(percentile),
+        }
+
+
+def load_market(db) -> Optional[MarketIndex]:
+    """The index of every priced card in listing_state, or None without numpy."""
+    if not NUMPY_AVAILABLE:
+        logger.info("numpy is not installed; deal scores are disabled")
+        return None
+    index = MarketIndex()
+    index.load(db.get_market_rows())
+    if index:
+        logger.info(
+            f"Market index: {len(index)} listings in {len(index.groups)} groups"
+        )
+    return index
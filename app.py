@@ -1,687 +1,412 @@
 #!/usr/bin/env python3
 import asyncio
+import atexit
+import hashlib
 import json
 import logging
 import os
-import sqlite3
-import threading
-from datetime import datetime, timedelta
-
-from flask import Flask, flash, jsonify, redirect, render_template, request, url_for
+import uuid
+from datetime import date, datetime, timezone
+
+from flask import (
+    Flask,
+    Response,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    session,
+    stream_with_context,
+    url_for,
+)
 from flask_socketio import SocketIO, emit
+from jinja2 import FileSystemBytecodeCache
+
+from analytics import DEAL_BADGES, NUMPY_AVAILABLE
+from config import (
+    ADMIN_TOKEN,
+    BOT_TOKEN,
+    CHAT_ID,
+    CHECK_INTERVAL_MINUTES,
+    IMAGE_CACHE_DIR,
+    TEMPLATE_CACHE_DIR,
+    TRACE_RETENTION,
+)
+from database import (
+    CAR_FILTER_COLUMNS,
+    CAR_RANGE_FILTERS,
+    CAR_RECORD_COLUMNS,
+    DatabaseManager,
+    car_filter_sql,
+)
+from exporter import CarExport, ExportError
+from filter_rules import RULES_SETTING, RuleError, compile_rules, parse_rules
+from image_cache import CACHE_MAX_AGE, ImageCache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import IMAGE_REQUESTS, REGISTRY
+from monitor_worker import WorkerSupervisor
+from page_cache import PageCache
+from similar_cars import DEFAULT_LIMIT as SIMILAR_LIMIT
+from similar_cars import SimilarCars
+from tracing import KINDS as SPAN_KINDS
 
-from car_monitor import CarMonitor
-from car_scraper import CarListing
-from config import BOT_TOKEN, CHAT_ID, CHECK_INTERVAL_MINUTES
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "your-secret-key-change-this")
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Global variables
-monitor = None
-monitoring_thread = None
-is_monitoring = False
-
-
-class DatabaseManager:
-    def __init__(self, db_path="app_data.db"):
-        self.db_path = db_path
-        self.init_database()
-
-    def init_database(self):
-        """Initialize the SQLite database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create enhanced cars table with all details
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS found_cars (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                car_id TEXT UNIQUE,
-                title TEXT,
-                price TEXT,
-                year TEXT,
-                mileage TEXT,
-                engine TEXT,
-                url TEXT,
-                image_url TEXT,
-                city TEXT,
-                brand TEXT,
-                model TEXT,
-                body_type TEXT,
-                color TEXT,
-                engine_details TEXT,
-                transmission TEXT,
-                drivetrain TEXT,
-                is_new TEXT,
-                seats TEXT,
-                owners TEXT,
-                condition_info TEXT,
-                market TEXT,
-                description TEXT,
-                all_images TEXT,
-                specifications TEXT,
-                found_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notified BOOLEAN DEFAULT FALSE
-            )
-        """
-        )
 
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS app_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                level TEXT,
-                message TEXT
-            )
-        """
+def waterfall_rows(trace):
+    """Flatten a stored trace into depth-ordered rows with bar offsets in percent."""
+    spans = trace["spans"]
+    total = trace["duration_ms"] or 1.0
+    children = {}
+    for index, item in enumerate(spans):
+        children.setdefault(item["parent"], []).append(index)
+
+    rows = []
+    stack = [(index, 0) for index in reversed(children.get(None, []))]
+    while stack:
+        index, depth = stack.pop()
+        item = spans[index]
+        rows.append(
+            {
+                **item,
+                "depth": depth,
+                "left": min(item["start_ms"] / total * 100, 100.0),
+                "width": max(item["duration_ms"] / total * 100, 0.2),
+            }
         )
+        stack.extend((child, depth + 1) for child in reversed(children.get(index, [])))
+    return rows
 
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS app_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """
-        )
 
-        conn.commit()
-        conn.close()
+# Initialize database
+db = DatabaseManager(on_log=lambda entry: socketio.emit("new_log", entry))
+
+# Compiled templates survive restarts; rendered pages live until data changes
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR or None)
+page_cache = PageCache()
+
+# Photos come from the local thumbnail cache once the worker registers them
+image_cache = ImageCache() if IMAGE_CACHE_DIR else None
+app.jinja_env.globals["photo_src"] = (
+    image_cache.src if image_cache else lambda url, size="card": url
+)
+app.jinja_env.globals["deal_badges"] = DEAL_BADGES
+
+# Nearest neighbours for the car detail page, caught up as cars are stored
+similar_cars = SimilarCars() if NUMPY_AVAILABLE else None
+
+# Monitoring runs in a supervised worker process; its events fan out here
+supervisor = WorkerSupervisor(on_event=socketio.emit)
+atexit.register(supervisor.shutdown)
+
+
+def cached_page(render, *key):
+    """render() once per data and settings version; repeats come from memory.
+
+    `key` adds request state the page depends on beyond its URL.
+    """
+    # Pending flash messages are shown once, so that page is never cached
+    if session.get("_flashes"):
+        return render()
+    version = db.get_page_version()
+    key = (request.full_path, *key)
+    page = page_cache.get(version, key)
+    if page is None:
+        page = render()
+        if isinstance(page, str):
+            page_cache.put(version, key, page)
+    return page
+
+
+def car_filter_args():
+    """Filter query parameters shared by /api/cars and /api/export."""
+    names = CAR_FILTER_COLUMNS + CAR_RANGE_FILTERS
+    return {name: request.args[name] for name in names if name in request.args}
+
+
+def car_fields_arg():
+    """Columns picked with ?fields=a,b; all of them by default."""
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    unknown = [field for field in fields if field not in CAR_RECORD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(fields)) or CAR_RECORD_COLUMNS
+
+
+def versioned_json(build):
+    """JSON from build(), or 304 if the client's ETag is still current.
+
+    The ETag comes from the found_cars change counter, read before the
+    query, so a write racing with the request can only make the next poll
+    refetch, never hide a change. Last-Modified is informational only:
+    HTTP dates have whole seconds, so If-Modified-Since cannot tell apart
+    two changes in the same second and is not honoured.
+    """
+    version, modified = db.get_data_version()
+    key = hashlib.sha1(request.full_path.encode("utf-8")).hexdigest()[:16]
+    etag = f"{version}-{key}"
+    last_modified = (
+        datetime.fromtimestamp(int(modified), timezone.utc) if modified else None
+    )
 
-    def save_car(self, car: CarListing, notified=False):
-        """Save a found car to the database with all details."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        payload = build()
+        if payload is None:
+            return jsonify({"success": False, "message": "Not found"}), 404
+        response = jsonify(payload)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
 
-        try:
-            # Convert lists and dicts to JSON strings
-            all_images_json = json.dumps(car.all_images) if car.all_images else None
-            specifications_json = (
-                json.dumps(car.specifications) if car.specifications else None
-            )
 
-            # Try to update existing record first (to avoid resetting found_at)
-            cursor.execute(
-                """
-                UPDATE found_cars SET 
-                    title=?, price=?, year=?, mileage=?, engine=?, url=?, image_url=?,
-                    city=?, brand=?, model=?, body_type=?, color=?, engine_details=?, transmission=?,
-                    drivetrain=?, is_new=?, seats=?, owners=?, condition_info=?, market=?, description=?,
-                    all_images=?, specifications=?, notified=?
-                WHERE car_id=?
-            """,
-                (
-                    car.title,
-                    car.price,
-                    car.year,
-                    car.mileage,
-                    car.engine,
-                    car.url,
-                    car.image_url,
-                    car.city,
-                    car.brand,
-                    car.model,
-                    car.body_type,
-                    car.color,
-                    car.engine_details,
-                    car.transmission,
-                    car.drivetrain,
-                    car.is_new,
-                    car.seats,
-                    car.owners,
-                    car.condition,
-                    car.market,
-                    car.description,
-                    all_images_json,
-                    specifications_json,
-                    notified,
-                    car.car_id,
-                ),
-            )
+@app.route("/")
+def dashboard():
+    """Main dashboard page."""
+    is_monitoring = supervisor.want_monitoring
 
-            if cursor.rowcount == 0:
-                # No existing row; insert new
-                cursor.execute(
-                    """
-                    INSERT INTO found_cars 
-                    (car_id, title, price, year, mileage, engine, url, image_url,
-                     city, brand, model, body_type, color, engine_details, transmission,
-                     drivetrain, is_new, seats, owners, condition_info, market, description,
-                     all_images, specifications, notified)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        car.car_id,
-                        car.title,
-                        car.price,
-                        car.year,
-                        car.mileage,
-                        car.engine,
-                        car.url,
-                        car.image_url,
-                        car.city,
-                        car.brand,
-                        car.model,
-                        car.body_type,
-                        car.color,
-                        car.engine_details,
-                        car.transmission,
-                        car.drivetrain,
-                        car.is_new,
-                        car.seats,
-                        car.owners,
-                        car.condition,
-                        car.market,
-                        car.description,
-                        all_images_json,
-                        specifications_json,
-                        notified,
-                    ),
-                )
-            conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"Error saving car: {e}")
-        finally:
-            conn.close()
-
-    def get_recent_cars(self, limit=50):
-        """Get recently found cars with all details."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            SELECT * FROM found_cars 
-            ORDER BY found_at DESC 
-            LIMIT ?
-        """,
-            (limit,),
+    def render():
+        filters = db.get_filter_settings()
+        return render_template(
+            "dashboard.html",
+            stats=db.get_stats(),
+            recent_cars=db.get_recent_cars(10),
+            is_monitoring=is_monitoring,
+            bot_configured=bool(BOT_TOKEN and CHAT_ID),
+            filters=filters,
+            current_url=db.build_turbo_az_url(filters),
         )
 
-        cars = []
-        for row in cursor.fetchall():
-            # Parse JSON fields
-            try:
-                all_images = json.loads(row[23]) if row[23] and row[23].strip() else []
-            except (json.JSONDecodeError, TypeError):
-                all_images = []
-            try:
-                specifications = (
-                    json.loads(row[24]) if row[24] and row[24].strip() else {}
-                )
-            except (json.JSONDecodeError, TypeError):
-                specifications = {}
-
-            cars.append(
-                {
-                    "id": row[0],
-                    "car_id": row[1],
-                    "title": row[2],
-                    "price": row[3],
-                    "year": row[4],
-                    "mileage": row[5],
-                    "engine": row[6],
-                    "url": row[7],
-                    "image_url": row[8],
-                    "city": row[9],
-                    "brand": row[10],
-                    "model": row[11],
-                    "body_type": row[12],
-                    "color": row[13],
-                    "engine_details": row[14],
-                    "transmission": row[15],
-                    "drivetrain": row[16],
-                    "is_new": row[17],
-                    "seats": row[18],
-                    "owners": row[19],
-                    "condition_info": row[20],
-                    "market": row[21],
-                    "description": row[22],
-                    "all_images": all_images,
-                    "specifications": specifications,
-                    "found_at": row[25],
-                    "notified": row[26],
-                }
-            )
-
-        conn.close()
-        return cars
+    # Today's and this week's counts roll over with the date
+    return cached_page(render, is_monitoring, date.today())
 
-    def get_stats(self):
-        """Get monitoring statistics."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
 
-        # Total cars found
-        cursor.execute("SELECT COUNT(*) FROM found_cars")
-        total_cars = cursor.fetchone()[0]
+@app.route("/cars")
+def cars_page():
+    """Cars listing page."""
+    page = request.args.get("page", 1, type=int)
+    per_page = 20
 
-        # Cars found today
-        today = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute(
-            "SELECT COUNT(*) FROM found_cars WHERE DATE(found_at) = ?", (today,)
+    def render():
+        cars = db.get_recent_cars(page * per_page)
+        start_idx = (page - 1) * per_page
+        page_cars = cars[start_idx : start_idx + per_page]
+        return render_template(
+            "cars.html",
+            cars=page_cars,
+            page=page,
+            has_next=len(cars) > page * per_page,
         )
-        today_cars = cursor.fetchone()[0]
 
-        # Cars found this week
-        week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-        cursor.execute(
-            "SELECT COUNT(*) FROM found_cars WHERE DATE(found_at) >= ?", (week_ago,)
-        )
-        week_cars = cursor.fetchone()[0]
+    return cached_page(render)
 
-        conn.close()
 
-        return {
-            "total_cars": total_cars,
-            "today_cars": today_cars,
-            "week_cars": week_cars,
-        }
+@app.route("/car/<car_id>")
+def car_detail(car_id):
+    """Individual car detail page."""
 
-    def log_message(self, level, message):
-        """Log a message to the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            INSERT INTO app_logs (level, message)
-            VALUES (?, ?)
-        """,
-            (level, message),
+    def render():
+        car = db.get_car(car_id)
+        if not car:
+            flash("Car not found", "error")
+            return redirect(url_for("cars_page"))
+
+        price_history = db.get_price_history(car_id)
+        return render_template(
+            "car_detail.html",
+            car=car,
+            price_history=price_history,
+            similar=find_similar(car_id),
         )
 
-        conn.commit()
-        conn.close()
+    return cached_page(render)
 
-        # Emit to connected clients
-        socketio.emit(
-            "new_log",
-            {
-                "level": level,
-                "message": message,
-                "timestamp": datetime.now().isoformat(),
-            },
-        )
 
-    def get_setting(self, key: str, default_value: str = None):
-        """Get a setting value from the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+def find_similar(car_id, limit=SIMILAR_LIMIT, fields=CAR_RECORD_COLUMNS):
+    """Stored cars nearest to `car_id`, nearest first (none without numpy)."""
+    if similar_cars is None:
+        return []
+    similar_cars.refresh(db)
+    nearest = similar_cars.similar(car_id, limit)
+    return db.get_cars([other for other, _ in nearest], fields)
 
-        cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
-        result = cursor.fetchone()
-        conn.close()
 
-        return result[0] if result else default_value
+@app.route("/img/<size>/<key>")
+def cached_photo(size, key):
+    """A listing photo from the thumbnail cache, or a redirect to the original."""
+    photo = image_cache.lookup(key, size) if image_cache else None
+    if photo is None:
+        return jsonify({"success": False, "message": "Not found"}), 404
 
-    def save_setting(self, key: str, value: str):
-        """Save a setting value to the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)",
-            (key, value),
+    if photo.path is not None:
+        try:
+            response = send_file(
+                photo.path,
+                mimetype=photo.mimetype,
+                etag=photo.etag,
+                max_age=CACHE_MAX_AGE,
+                conditional=True,
+            )
+        except FileNotFoundError:
+            pass  # Evicted since the lookup
+        else:
+            IMAGE_REQUESTS.inc(result="hit")
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+
+    # Not downloaded yet, failed or evicted: the browser must ask again later
+    IMAGE_REQUESTS.inc(result="redirect")
+    response = redirect(photo.url)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/traces")
+def traces_page():
+    """Waterfalls of the latest monitoring cycles."""
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    traces = db.get_recent_traces(limit)
+    for trace in traces:
+        trace["rows"] = waterfall_rows(trace)
+    return render_template("traces.html", traces=traces, span_kinds=SPAN_KINDS)
+
+
+@app.route("/api/traces")
+def get_traces():
+    """Recent cycle traces as JSON; add ?spans=1 for the full span lists."""
+    limit = min(request.args.get("limit", 20, type=int), TRACE_RETENTION)
+    with_spans = request.args.get("spans", 0, type=int) == 1
+    return jsonify(db.get_recent_traces(limit, with_spans=with_spans))
+
+
+@app.route("/api/cars")
+def api_cars():
+    """Found cars, newest first, with cursor paging, filters and projection.
+
+    ?limit=50&cursor=<next_cursor>&order=desc|asc&fields=car_id,title,price
+    plus filters: brand, model, city, body_type, transmission, market,
+    since, until, year_from, year_to, notified
+    """
+    try:
+        fields = car_fields_arg()
+        filters = car_filter_args()
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+        cursor = request.args.get("cursor")
+        after_id = int(cursor) if cursor else None
+        order = request.args.get("order", "desc")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid order: {order!r}")
+        # Validate the filters before the cache check, not inside it
+        car_filter_sql(filters)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    def build():
+        cars, next_after = db.query_cars(
+            fields, filters, after_id, ascending=order == "asc", limit=limit
         )
-        conn.commit()
-        conn.close()
-
-    def get_filter_settings(self):
-        """Get current filter settings with defaults."""
         return {
-            "price_from": self.get_setting("filter_price_from", "17000"),
-            "price_to": self.get_setting("filter_price_to", "22000"),
-            "year_from": self.get_setting("filter_year_from", ""),
-            "year_to": self.get_setting("filter_year_to", "2015"),
-            "engine_from": self.get_setting("filter_engine_from", "2300"),
-            "engine_to": self.get_setting("filter_engine_to", ""),
-            "mileage_to": self.get_setting("filter_mileage_to", "150000"),
-            "condition": self.get_setting(
-                "filter_condition", "used"
-            ),  # new, used, or all
-            "brand": self.get_setting("filter_brand", ""),
-            "city": self.get_setting("filter_city", ""),
-            "currency": self.get_setting("filter_currency", "azn"),
-            "crashed": self.get_setting("filter_crashed", "1"),  # Include crashed cars
-            "painted": self.get_setting("filter_painted", "1"),  # Include painted cars
-            "for_spare_parts": self.get_setting(
-                "filter_for_spare_parts", "0"
-            ),  # Exclude spare parts
-            "gear": self.get_setting("filter_gear", "3"),  # Manual transmission (3)
-            "transmission": self.get_setting(
-                "filter_transmission", "2"
-            ),  # Front wheel drive (2)
+            "cars": cars,
+            "next_cursor": str(next_after) if next_after is not None else None,
         }
 
-    def save_filter_settings(self, filters):
-        """Save filter settings to database."""
-        for key, value in filters.items():
-            self.save_setting(f"filter_{key}", str(value))
-
-    def build_turbo_az_url(self, filters=None):
-        """Build Turbo.az URL from filter settings using the detailed query format."""
-        if filters is None:
-            filters = self.get_filter_settings()
-
-        base_url = "https://turbo.az/autos"
-
-        # Build query parameters using the exact format from the provided URL
-        params = []
-
-        # Sorting and basic filters
-        params.append("q%5Bsort%5D=")  # Empty sort
-        params.append(
-            "q%5Bmake%5D%5B%5D="
-        )  # Empty make (brand will be handled separately if needed)
-        params.append("q%5Bmodel%5D%5B%5D=")  # Empty model
-
-        # Condition (new/used)
-        condition = filters.get("condition", "used")
-        if condition == "used":
-            params.append("q%5Bused%5D=1")
-        elif condition == "new":
-            params.append("q%5Bused%5D=0")
-        else:  # all
-            params.append("q%5Bused%5D=1")  # Default to used for 'all'
-
-        params.append("q%5Bregion%5D%5B%5D=")  # Empty region
-
-        # Price range
-        if filters.get("price_from"):
-            params.append(f"q%5Bprice_from%5D={filters['price_from']}")
-        else:
-            params.append("q%5Bprice_from%5D=")
-
-        if filters.get("price_to"):
-            params.append(f"q%5Bprice_to%5D={filters['price_to']}")
-        else:
-            params.append("q%5Bprice_to%5D=")
-
-        # Currency
-        currency = filters.get("currency", "azn")
-        params.append(f"q%5Bcurrency%5D={currency}")
-
-        # Loan and barter (default to 0)
-        params.append("q%5Bloan%5D=0")
-        params.append("q%5Bbarter%5D=0")
-
-        # Category (21 seems to be a specific category from the URL)
-        params.append("q%5Bcategory%5D%5B%5D=")
-        params.append("q%5Bcategory%5D%5B%5D=21")
-
-        # Year range
-        if filters.get("year_from"):
-            params.append(f"q%5Byear_from%5D={filters['year_from']}")
-        else:
-            params.append("q%5Byear_from%5D=")
-
-        if filters.get("year_to"):
-            params.append(f"q%5Byear_to%5D={filters['year_to']}")
-        else:
-            params.append("q%5Byear_to%5D=")
-
-        # Color (empty for now)
-        params.append("q%5Bcolor%5D%5B%5D=")
-
-        # Fuel type (empty for now)
-        params.append("q%5Bfuel_type%5D%5B%5D=")
+    return versioned_json(build)
 
-        # Gear (transmission type)
-        params.append("q%5Bgear%5D%5B%5D=")
-        gear = filters.get("gear", "3")
-        params.append(f"q%5Bgear%5D%5B%5D={gear}")
 
-        # Transmission (drivetrain)
-        params.append("q%5Btransmission%5D%5B%5D=")
-        transmission = filters.get("transmission", "2")
-        params.append(f"q%5Btransmission%5D%5B%5D={transmission}")
-
-        # Engine volume (in cc, so 2300 = 2.3L)
-        if filters.get("engine_from"):
-            # Convert from liters to cc if needed
-            engine_from = filters["engine_from"]
-            if "." in str(engine_from):
-                engine_from = str(int(float(engine_from) * 1000))
-            params.append(f"q%5Bengine_volume_from%5D={engine_from}")
-        else:
-            params.append("q%5Bengine_volume_from%5D=")
-
-        if filters.get("engine_to"):
-            engine_to = filters["engine_to"]
-            if "." in str(engine_to):
-                engine_to = str(int(float(engine_to) * 1000))
-            params.append(f"q%5Bengine_volume_to%5D={engine_to}")
-        else:
-            params.append("q%5Bengine_volume_to%5D=")
-
-        # Power (empty for now)
-        params.append("q%5Bpower_from%5D=")
-        params.append("q%5Bpower_to%5D=")
-
-        # Mileage
-        params.append("q%5Bmileage_from%5D=")
-        if filters.get("mileage_to"):
-            params.append(f"q%5Bmileage_to%5D={filters['mileage_to']}")
-        else:
-            params.append("q%5Bmileage_to%5D=")
-
-        # Shop filters
-        params.append("q%5Bonly_shops%5D=")
-        params.append("q%5Bprior_owners_count%5D%5B%5D=")
-        params.append("q%5Bseats_count%5D%5B%5D=")
-        params.append("q%5Bmarket%5D%5B%5D=")
-
-        # Condition filters (crashed, painted, spare parts)
-        crashed = filters.get("crashed", "1")
-        params.append(f"q%5Bcrashed%5D={crashed}")
-
-        painted = filters.get("painted", "1")
-        params.append(f"q%5Bpainted%5D={painted}")
-
-        for_spare_parts = filters.get("for_spare_parts", "0")
-        params.append(f"q%5Bfor_spare_parts%5D={for_spare_parts}")
-
-        # Availability status
-        params.append("q%5Bavailability_status%5D=")
-
-        return f"{base_url}?{'&'.join(params)}"
-
-
-# Initialize database
-db = DatabaseManager()
-
-
-class AppCarMonitor(CarMonitor):
-    """Car monitor with app integration."""
-
-    def __init__(self):
-        super().__init__()
-
-    def update_url_from_filters(self):
-        """Update the monitoring URL from current filter settings."""
-        filters = db.get_filter_settings()
-        new_url = db.build_turbo_az_url(filters)
-        self.set_url(new_url)
+@app.route("/api/cars/<car_id>")
+def api_car(car_id):
+    """One found car; ?fields= picks columns."""
+    try:
+        fields = car_fields_arg()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return versioned_json(lambda: db.get_car(car_id, fields))
 
-        # Update the config as well for backwards compatibility
-        import config
 
-        config.TURBO_AZ_URL = new_url
+@app.route("/api/cars/<car_id>/similar")
+def api_similar_cars(car_id):
+    """The stored cars most like this one; ?limit= (max 50) and ?fields=."""
+    try:
+        fields = car_fields_arg()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    limit = min(max(request.args.get("limit", SIMILAR_LIMIT, type=int), 1), 50)
 
-        logger.info(f"Updated scraper URL: {new_url}")
+    def build():
+        if not db.get_car(car_id, ("car_id",)):
+            return None
+        return {"cars": find_similar(car_id, limit, fields)}
 
-    async def check_for_new_cars(self) -> int:
-        """Check for new cars using current filter settings and save to database."""
-        db.log_message("INFO", "Checking for new cars...")
+    return versioned_json(build)
 
-        try:
-            # Get current cars from website using current filter settings
-            filters = db.get_filter_settings()
-            current_url = db.build_turbo_az_url(filters)
-
-            # Make sure monitor knows about the current URL
-            self.set_url(current_url)
-
-            # Get cars using the scraper directly with our URL
-            current_cars = self.scraper.get_new_cars(current_url)
-
-            if not current_cars:
-                db.log_message("WARNING", "No cars found on the website")
-                return 0
-
-            # Filter out cars we've already seen
-            new_cars = self.filter_new_cars(current_cars)
-
-            if new_cars:
-                db.log_message("INFO", f"Found {len(new_cars)} new cars!")
-
-                # Save cars to database
-                for car in new_cars:
-                    db.save_car(car, notified=False)
-
-                    # Emit real-time update with enhanced data
-                    socketio.emit(
-                        "new_car",
-                        {
-                            "car_id": car.car_id,
-                            "title": car.title,
-                            "price": car.price,
-                            "year": car.year,
-                            "mileage": car.mileage,
-                            "engine": car.engine,
-                            "url": car.url,
-                            "image_url": car.image_url,
-                            "city": car.city,
-                            "brand": car.brand,
-                            "color": car.color,
-                            "transmission": car.transmission,
-                            "found_at": datetime.now().isoformat(),
-                        },
-                    )
-
-                # Send telegram notifications if configured
-                if BOT_TOKEN and CHAT_ID:
-                    try:
-                        successful = await self.bot.send_multiple_cars(new_cars)
-                        db.log_message(
-                            "INFO",
-                            f"Successfully sent {successful}/{len(new_cars)} Telegram notifications",
-                        )
-
-                        # Mark as notified in database
-                        conn = sqlite3.connect(db.db_path)
-                        cur = conn.cursor()
-                        try:
-                            cur.executemany(
-                                "UPDATE found_cars SET notified=1 WHERE car_id=?",
-                                [(car.car_id,) for car in new_cars],
-                            )
-                            conn.commit()
-                        except Exception as e:
-                            logger.error(f"Failed to mark cars as notified: {e}")
-                        finally:
-                            conn.close()
-
-                    except Exception as e:
-                        db.log_message(
-                            "ERROR", f"Failed to send Telegram notifications: {str(e)}"
-                        )
-                else:
-                    db.log_message(
-                        "INFO", "Telegram not configured - cars saved to database only"
-                    )
-
-                return len(new_cars)
-            else:
-                db.log_message("INFO", "No new cars found")
-                return 0
-
-        except Exception as e:
-            error_msg = f"Error checking for new cars: {str(e)}"
-            db.log_message("ERROR", error_msg)
-            logger.error(error_msg)
-            return 0
-
-
-def run_monitoring_loop():
-    """Run the monitoring loop in a separate thread."""
-    global is_monitoring
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    async def monitor_loop():
-        global is_monitoring, monitor
-
-        while is_monitoring:
-            try:
-                if monitor:
-                    await monitor.check_for_new_cars()
-
-                # Wait for next check
-                await asyncio.sleep(CHECK_INTERVAL_MINUTES * 60)
-
-            except Exception as e:
-                db.log_message("ERROR", f"Error in monitoring loop: {str(e)}")
-                await asyncio.sleep(60)  # Wait 1 minute before retrying
-
-    loop.run_until_complete(monitor_loop())
 
+@app.route("/api/export")
+def export_cars():
+    """Stream found cars as CSV, NDJSON, Parquet or Arrow.
 
-@app.route("/")
-def dashboard():
-    """Main dashboard page."""
-    stats = db.get_stats()
-    recent_cars = db.get_recent_cars(10)
-    filters = db.get_filter_settings()
-    current_url = db.build_turbo_az_url(filters)
+    ?format=csv|ndjson|parquet|arrow plus the /api/cars filters
+    """
+    try:
+        export = CarExport(
+            db.db_path, request.args.get("format", "csv"), filters=car_filter_args()
+        )
+    except ExportError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
 
-    return render_template(
-        "dashboard.html",
-        stats=stats,
-        recent_cars=recent_cars,
-        is_monitoring=is_monitoring,
-        bot_configured=bool(BOT_TOKEN and CHAT_ID),
-        filters=filters,
-        current_url=current_url,
+    return Response(
+        stream_with_context(export.stream()),
+        mimetype=export.mimetype,
+        headers={"Content-Disposition": f"attachment; filename={export.filename}"},
     )
 
 
-@app.route("/cars")
-def cars_page():
-    """Cars listing page."""
-    page = request.args.get("page", 1, type=int)
-    per_page = 20
-
-    cars = db.get_recent_cars(page * per_page)
-    start_idx = (page - 1) * per_page
-    page_cars = cars[start_idx : start_idx + per_page]
-
-    return render_template(
-        "cars.html", cars=page_cars, page=page, has_next=len(cars) > page * per_page
-    )
-
+@app.route("/api/admin/profile", methods=["GET", "POST"])
+def profile_monitor():
+    """Profile the next N monitoring cycles or a time window; GET returns status."""
+    if not ADMIN_TOKEN:
+        return (
+            jsonify({"success": False, "message": "Set ADMIN_TOKEN to enable"}),
+            404,
+        )
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
 
-@app.route("/car/<car_id>")
-def car_detail(car_id):
-    """Individual car detail page."""
-    cars = db.get_recent_cars(1000)  # Get more cars to find the specific one
-    car = next((c for c in cars if c["car_id"] == car_id), None)
+    if request.method == "GET":
+        return jsonify(supervisor.call("profile_status"))
 
-    if not car:
-        flash("Car not found", "error")
-        return redirect(url_for("cars_page"))
+    data = request.get_json(silent=True) or {}
+    try:
+        cycles = int(data.get("cycles") or 0)
+        seconds = float(data.get("seconds") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Invalid cycles or seconds"}), 400
+
+    # Cycles run in the worker process, so that is where the profiler runs
+    status = supervisor.call("profile", cycles=cycles or 1, seconds=seconds or None)
+    if not status.get("success"):
+        return jsonify(
+            {
+                "success": False,
+                "message": status.get("message", "A profile is already running"),
+            }
+        )
 
-    return render_template("car_detail.html", car=car)
+    if seconds:
+        message = f"Profiling all threads for {seconds:g}s"
+    else:
+        message = f"Profiling the next {cycles or 1} monitoring cycle(s)"
+    db.log_message("INFO", message)
+    return jsonify({**status, "message": message})
 
 
 @app.route("/settings")
@@ -700,18 +425,11 @@ def settings_page():
 @app.route("/api/start_monitoring", methods=["POST"])
 def start_monitoring():
     """Start the monitoring process."""
-    global monitor, monitoring_thread, is_monitoring
-
-    if is_monitoring:
+    if supervisor.want_monitoring:
         return jsonify({"success": False, "message": "Monitoring is already running"})
 
     try:
-        monitor = AppCarMonitor()
-        is_monitoring = True
-
-        # Start monitoring in a separate thread
-        monitoring_thread = threading.Thread(target=run_monitoring_loop, daemon=True)
-        monitoring_thread.start()
+        supervisor.start_monitoring()
 
         db.log_message("INFO", "Monitoring started")
         return jsonify({"success": True, "message": "Monitoring started successfully"})
@@ -725,12 +443,10 @@ def start_monitoring():
 @app.route("/api/stop_monitoring", methods=["POST"])
 def stop_monitoring():
     """Stop the monitoring process."""
-    global is_monitoring
-
-    if not is_monitoring:
+    if not supervisor.want_monitoring:
         return jsonify({"success": False, "message": "Monitoring is not running"})
 
-    is_monitoring = False
+    supervisor.stop_monitoring()
     db.log_message("INFO", "Monitoring stopped")
 
     return jsonify({"success": True, "message": "Monitoring stopped successfully"})
@@ -808,11 +524,10 @@ def save_filters():
         if transmission in ["1", "2", "3"]:  # 1=rear, 2=front, 3=4wd
             filters["transmission"] = transmission
 
-        # Brand and city (for future filtering)
-        if data.get("brand"):
-            filters["brand"] = str(data["brand"]).strip()
-        if data.get("city"):
-            filters["city"] = str(data["city"]).strip()
+        # Brand and city aren't URL filters; filter_rules applies them locally,
+        # so an empty value must be saved too to clear them
+        filters["brand"] = str(data.get("brand") or "").strip()
+        filters["city"] = str(data.get("city") or "").strip()
 
         # Save to database
         db.save_filter_settings(filters)
@@ -821,9 +536,8 @@ def save_filters():
         new_url = db.build_turbo_az_url(filters)
 
         # Update the monitor if it's running
-        global monitor
-        if monitor:
-            monitor.update_url_from_filters()
+        if supervisor.want_monitoring:
+            supervisor.send("reload_filters")
 
         db.log_message("INFO", f"Filter settings updated. New URL: {new_url}")
 
@@ -841,38 +555,40 @@ def save_filters():
         return jsonify({"success": False, "message": error_msg})
 
 
-@app.route("/api/test_scraper")
-def test_scraper():
-    """Test the scraper functionality."""
+@app.route("/api/filter_rules", methods=["GET", "POST"])
+def filter_rules_api():
+    """Get or replace the post-filter rules (a JSON list, see filter_rules.py)."""
+    if request.method == "GET":
+        try:
+            rules = parse_rules(db.get_setting(RULES_SETTING, ""))
+        except RuleError as e:
+            return jsonify({"success": False, "message": str(e), "rules": []})
+        return jsonify({"success": True, "rules": rules})
+
+    data = request.get_json(silent=True)
+    rules = data.get("rules") if isinstance(data, dict) else data
     try:
-        from car_scraper import TurboAzScraper
+        ruleset = compile_rules(rules or [])
+    except RuleError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    db.save_setting(RULES_SETTING, json.dumps(rules or [], ensure_ascii=False))
+    db.log_message("INFO", f"Post-filter rules updated ({len(ruleset)} rules)")
+    return jsonify(
+        {"success": True, "message": f"Saved {len(ruleset)} post-filter rules"}
+    )
 
-        scraper = TurboAzScraper()
-        # Use current filter settings for testing
-        filters = db.get_filter_settings()
-        current_url = db.build_turbo_az_url(filters)
-        cars = scraper.get_new_cars(current_url)
 
-        return jsonify(
-            {
-                "success": True,
-                "message": f"Found {len(cars)} cars with detailed information",
-                "sample_cars": [
-                    {
-                        "title": car.title,
-                        "price": car.price,
-                        "year": car.year,
-                        "city": car.city,
-                        "brand": car.brand,
-                        "color": car.color,
-                        "url": car.url,
-                    }
-                    for car in cars[:3]  # First 3 cars
-                ],
-            }
-        )
-    except Exception as e:
-        return jsonify({"success": False, "message": f"Scraper test failed: {str(e)}"})
+@app.route("/api/test_scraper")
+def test_scraper():
+    """Start a scraper test; the result arrives as a scraper_test Socket.IO event."""
+    # A full scrape can take minutes, so the worker runs it in the background
+    # instead of this request waiting on the reply
+    job_id = uuid.uuid4().hex
+    supervisor.send("test_scraper", job_id=job_id)
+    return jsonify(
+        {"success": True, "job_id": job_id, "message": "Scraper test started"}
+    )
 
 
 @app.route("/api/test_telegram")
@@ -916,7 +632,23 @@ def test_telegram():
 @app.route("/api/status")
 def get_status():
     """Get current monitoring status."""
-    return jsonify({"is_monitoring": is_monitoring})
+    return jsonify(
+        {
+            "is_monitoring": supervisor.want_monitoring,
+            "worker_monitoring": supervisor.is_monitoring,
+            "worker_alive": supervisor.process is not None
+            and supervisor.process.is_alive(),
+            "worker_restarts": supervisor.restarts,
+        }
+    )
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics for the scraper, database, Telegram and monitor loop."""
+    # Counters from the monitor worker are summed with the web process's own
+    body = REGISTRY.render([supervisor.metrics_snapshot])
+    return Response(body, content_type=METRICS_CONTENT_TYPE)
 
 
 @socketio.on("connect")
@@ -926,6 +658,8 @@ def handle_connect():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     print("🚗 Starting Turbo.az Car Monitor Web App")
     print("🌐 Open your browser to http://localhost:5000")
 
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Resumable historical backfill: every result page of a search, stored the way
+the monitor stores cars.
+
+    python backfill.py plan --split year:2005-2015          # saved filters, a partition per year
+    python backfill.py plan --url "<search url>" --split price:10000-30000:2500
+    python backfill.py run                                  # crawl until every partition is done
+    python backfill.py run --retry-failed                   # resume partitions that kept failing
+    python backfill.py status
+
+turbo.az stops paging deep into a large result set, so a search can be split
+into partitions by year or price range (q[year_from]/q[year_to] or
+q[price_from]/q[price_to]), each paged separately up to BACKFILL_MAX_PAGES.
+A partition ends at the first page with no cards, or one that only repeats
+the previous page.
+
+Progress is checkpointed per page in the backfill_partitions table of the
+results database, after the page's cars are stored. A run that is stopped or
+crashes resumes at the page it was on, and redoing a page is harmless
+because every write is an upsert.
+
+Each page goes through the monitor's ingest path: listing prices and market
+columns (track_listing_prices), fingerprints for repost detection, and a
+save_car for cars not stored yet, hydrated from their detail page unless
+--cards-only. With RATE_BUDGET_FILE set to the same absolute path as the
+monitor's, requests go through a shared rate budget, so a backfill running
+next to the monitor slows both down instead of doubling the request rate. Stored cars count as known to the web monitor,
+so backfilled listings never trigger alerts.
+"""
+import argparse
+import logging
+import signal
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from car_scraper import CarListing, TurboAzScraper
+from config import BACKFILL_MAX_PAGES
+from crawl_worker import page_url
+from database import DatabaseManager
+from fingerprint import Fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Partition statuses
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Failed fetches of the same page before its partition is given up on, and
+# the pause before failed pages are tried again
+MAX_PAGE_ATTEMPTS = 5
+RETRY_DELAY_SECONDS = 60
+
+# Detail cache of the backfill's own scraper; entries are dropped once stored
+BACKFILL_CACHE_FILE = "backfill_details_cache.json"
+
+# --split dimensions: query parameters and default step
+SPLITS = {
+    "year": ("q[year_from]", "q[year_to]", 1),
+    "price": ("q[price_from]", "q[price_to]", 1000),
+}
+
+
+@dataclass
+class Partition:
+    """One search slice and how far it has been crawled."""
+
+    id: int
+    label: str
+    url: str
+    next_page: int
+    pages: int
+    cars: int
+    saved: int
+    attempts: int
+    status: str
+    error: Optional[str]
+
+
+PARTITION_COLUMNS = (
+    "id, label, url, next_page, pages, cars, saved, attempts, status, error"
+)
+
+
+def search_url(url: str, params: Dict[str, str]) -> str:
+    """The same search URL with `params` set, replacing existing values."""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key not in params]
+    query.extend(params.items())
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def parse_split(spec: str) -> List[Tuple[str, Dict[str, str]]]:
+    """(label, query params) per partition of a --split spec such as
+    "year:2005-2015" or "price:10000-30000:2500"."""
+    try:
+        name, _, bounds = spec.partition(":")
+        low_param, high_param, step = SPLITS[name]
+        values = bounds.split(":")
+        low, high = (int(value) for value in values[0].split("-"))
+        if len(values) > 1:
+            step = int(values[1])
+    except (KeyError, ValueError):
+        raise ValueError(
+            f"Invalid split {spec!r} (e.g. year:2005-2015 or price:10000-30000:2500)"
+        ) from None
+    if step < 1 or low > high:
+        raise ValueError(f"Invalid split {spec!r}: empty range")
+
+    partitions = []
+    for start in range(low, high + 1, step):
+        end = min(start + step - 1, high)
+        label = f"{name} {start}" if start == end else f"{name} {start}-{end}"
+        partitions.append((label, {low_param: str(start), high_param: str(end)}))
+    return partitions
+
+
+class BackfillStore:
+    """Partitions and their checkpoints, in the results database."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def init_database(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS backfill_partitions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT NOT NULL,
+                    url TEXT NOT NULL UNIQUE,
+                    next_page INTEGER NOT NULL DEFAULT 1,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    cars INTEGER NOT NULL DEFAULT 0,
+                    saved INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def plan(self, partitions: List[Tuple[str, str]], restart: bool = False) -> int:
+        """Add (label, url) partitions; ones already planned keep their
+        progress unless `restart`. Returns how many were added or reset."""
+        conn = self._connect()
+        try:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO backfill_partitions (label, url) VALUES (?, ?)",
+                partitions,
+            )
+            changed = cursor.rowcount
+            if restart:
+                cursor = conn.executemany(
+                    """
+                    UPDATE backfill_partitions SET
+                        next_page=1, pages=0, cars=0, saved=0, attempts=0,
+                        status='pending', error=NULL, updated_at=CURRENT_TIMESTAMP
+                    WHERE url=?
+                """,
+                    [(url,) for _, url in partitions],
+                )
+                changed = cursor.rowcount
+            conn.commit()
+            return changed
+        finally:
+            conn.close()
+
+    def retry_failed(self) -> int:
+        """Put failed partitions back in line at the page they stopped on."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE backfill_partitions SET status='pending', attempts=0 "
+                "WHERE status='failed'"
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def partitions(self, status: Optional[str] = None) -> List[Partition]:
+        conn = self._connect()
+        try:
+            where, params = ("WHERE status=?", (status,)) if status else ("", ())
+            rows = conn.execute(
+                f"SELECT {PARTITION_COLUMNS} FROM backfill_partitions {where} ORDER BY id",
+                params,
+            ).fetchall()
+        finally:
+            conn.close()
+        return [Partition(*row) for row in rows]
+
+    def checkpoint(self, partition: Partition, cars: int, saved: int):
+        """Record a finished page and move on to the next one."""
+        partition.next_page += 1
+        partition.pages += 1
+        partition.cars += cars
+        partition.saved += saved
+        partition.attempts = 0
+        partition.error = None
+        self._save(partition)
+
+    def finish(self, partition: Partition):
+        """Close a partition whose current page turned out to be past the end."""
+        partition.status = DONE
+        partition.attempts = 0
+        partition.error = None
+        self._save(partition)
+
+    def fail(self, partition: Partition, error: str):
+        """Record a failed page; it is retried, up to MAX_PAGE_ATTEMPTS times."""
+        partition.attempts += 1
+        partition.error = error
+        if partition.attempts >= MAX_PAGE_ATTEMPTS:
+            partition.status = FAILED
+        self._save(partition)
+
+    def _save(self, partition: Partition):
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                UPDATE backfill_partitions SET
+                    next_page=?, pages=?, cars=?, saved=?, attempts=?, status=?,
+                    error=?, updated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+            """,
+                (
+                    partition.next_page,
+                    partition.pages,
+                    partition.cars,
+                    partition.saved,
+                    partition.attempts,
+                    partition.status,
+                    partition.error,
+                    partition.id,
+                ),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class Backfill:
+    """Crawls planned partitions page by page into the results database."""
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        store: BackfillStore,
+        details: bool = True,
+        max_pages: int = BACKFILL_MAX_PAGES,
+    ):
+        self.db = db
+        self.store = store
+        self.details = details
+        self.max_pages = max(1, max_pages)
+        self.scraper = TurboAzScraper()
+        # The monitor's detail cache file is its own; stored cars need no cache
+        self.scraper.cache_file = BACKFILL_CACHE_FILE
+        self.scraper.cache = self.scraper.load_cache()
+        self.running = True
+
+    def run(self) -> int:
+        """Crawl until every partition is done or failed; returns the number
+        of cars stored."""
+        saved = 0
+        try:
+            while self.running:
+                partitions = self.store.partitions(PENDING)
+                if not partitions:
+                    break
+                for partition in partitions:
+                    if not self.running:
+                        break
+                    saved += self.crawl(partition)
+                # Pages that failed are retried after a pause, unless the
+                # last failure gave the partition up
+                retry = self.store.partitions(PENDING)
+                if self.running and any(p.attempts for p in retry):
+                    self.pause(RETRY_DELAY_SECONDS)
+        finally:
+            self.scraper.close()
+        return saved
+
+    def pause(self, seconds: float):
+        deadline = time.monotonic() + seconds
+        while self.running and time.monotonic() < deadline:
+            time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def crawl(self, partition: Partition) -> int:
+        logger.info(f"📚 Backfilling {partition.label} from page {partition.next_page}")
+        saved = 0
+        previous: Set[str] = set()
+        while self.running and partition.status == PENDING:
+            if partition.next_page > self.max_pages:
+                logger.info(f"{partition.label}: stopped at the page cap")
+                self.store.finish(partition)
+                break
+
+            url = page_url(partition.url, partition.next_page)
+            soup = self.scraper.get_page_content(url, page_type="listing")
+            if soup is None:
+                self.store.fail(partition, f"page {partition.next_page} not fetched")
+                logger.warning(f"{partition.label}: {partition.error}")
+                break
+
+            cards = self.scraper.extract_car_listings(soup)
+            ids = {car.car_id for car in cards}
+            if not cards or ids <= previous:
+                self.store.finish(partition)
+                break
+            previous = ids
+
+            stored, error = self.ingest(cards)
+            if error:
+                self.store.fail(partition, error)
+                logger.warning(f"{partition.label}: {error}")
+                break
+            saved += stored
+            self.store.checkpoint(partition, len(cards), stored)
+            logger.info(
+                f"📄 {partition.label} page {partition.next_page - 1}: "
+                f"{len(cards)} cars, {stored} stored"
+            )
+
+        if partition.status == DONE:
+            logger.info(
+                f"✅ {partition.label}: {partition.pages} pages, "
+                f"{partition.saved} cars stored"
+            )
+        return saved
+
+    def ingest(self, cards: List[CarListing]) -> Tuple[int, Optional[str]]:
+        """Store one page of cards as the monitor would; returns the number of
+        cars stored and an error if the page has to be redone."""
+        self.db.track_listing_prices(cards)
+        self.db.save_fingerprints([Fingerprint.from_car(car).to_row() for car in cards])
+
+        stored = self.db.get_stored_ids([car.car_id for car in cards])
+        new_cars = [car for car in cards if car.car_id not in stored]
+        missing = []
+        if self.details and new_cars:
+            self.scraper.hydrate_cars(new_cars)
+            missing = [car for car in new_cars if car.car_id not in self.scraper.cache]
+            new_cars = [car for car in new_cars if car.car_id in self.scraper.cache]
+
+        for car in new_cars:
+            self.db.save_car(car, notified=False)
+            self.scraper.cache.pop(car.car_id, None)
+        if new_cars and self.details:
+            self.scraper.save_cache()
+
+        if missing:
+            return len(new_cars), f"{len(missing)} detail pages not fetched"
+        return len(new_cars), None
+
+
+def print_status(store: BackfillStore):
+    partitions = store.partitions()
+    if not partitions:
+        print("Nothing planned (python backfill.py plan ...)")
+        return
+    for partition in partitions:
+        line = (
+            f"{partition.label:<24} {partition.status:<8} next page "
+            f"{partition.next_page:<4} {partition.pages} pages, "
+            f"{partition.cars} cards, {partition.saved} stored"
+        )
+        if partition.error:
+            line += f" ({partition.error}, attempt {partition.attempts})"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Historical turbo.az backfill")
+    parser.add_argument("--db", default="app_data.db", help="Results database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = commands.add_parser("plan", help="Add search partitions")
+    plan_parser.add_argument("--url", help="Search URL (default: saved filters)")
+    plan_parser.add_argument(
+        "--split", help="year:FROM-TO[:STEP] or price:FROM-TO[:STEP]"
+    )
+    plan_parser.add_argument(
+        "--restart", action="store_true", help="Crawl planned partitions again"
+    )
+
+    run_parser = commands.add_parser("run", help="Crawl pending partitions")
+    run_parser.add_argument(
+        "--cards-only",
+        action="store_true",
+        help="Store listing cards without fetching detail pages",
+    )
+    run_parser.add_argument("--max-pages", type=int, default=BACKFILL_MAX_PAGES)
+    run_parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Resume failed partitions at the page they stopped on",
+    )
+
+    commands.add_parser("status", help="Show partition progress")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    options = parse_args(argv)
+    store = BackfillStore(options.db)
+
+    if options.command == "status":
+        print_status(store)
+        return
+
+    db = DatabaseManager(options.db)
+    if options.command == "plan":
+        url = options.url or db.build_turbo_az_url()
+        try:
+            splits = parse_split(options.split) if options.split else [("all", {})]
+        except ValueError as e:
+            sys.exit(f"❌ {e}")
+        partitions = [(label, search_url(url, params)) for label, params in splits]
+        changed = store.plan(partitions, restart=options.restart)
+        print(f"✅ {changed} of {len(partitions)} partitions queued")
+        return
+
+    if options.retry_failed:
+        store.retry_failed()
+    backfill = Backfill(
+        db, store, details=not options.cards_only, max_pages=options.max_pages
+    )
+
+    def stop(signum, frame):
+        logger.info("Finishing the current page, then stopping...")
+        backfill.running = False
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    saved = backfill.run()
+    print(f"✅ Stored {saved} cars")
+    print_status(store)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: single-pass specification extractor vs the old per-field regex scans.
+
+Usage: python benchmarks/bench_spec_extractor.py [iterations]
+"""
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from car_scraper import (
+    DESCRIPTION_SELECTORS,
+    IMAGE_SELECTORS,
+    SPEC_FIELD_MAPPINGS,
+    extract_specifications_from_text,
+    parse_detail_page,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_specifications_from_text(prop_text):
+    """The previous text fallback: one non-compiled DOTALL scan per field."""
+    field_patterns = list(SPEC_FIELD_MAPPINGS)
+    specifications = {}
+    for i, field in enumerate(field_patterns):
+        if i < len(field_patterns) - 1:
+            pattern = f"{field}(.*?){field_patterns[i + 1]}"
+        else:
+            pattern = f"{field}(.*?)$"
+        match = re.search(pattern, prop_text, re.DOTALL)
+        if match:
+            value = match.group(1).strip()
+            if value:
+                specifications[field] = value
+    return specifications
+
+
+def legacy_parse_detail_page(soup):
+    """The previous detail parse: per-field regex scans and one CSS scan per selector."""
+    specifications = {}
+    product_props = soup.find("div", class_="product-properties")
+    if product_props:
+        for item in product_props.find_all("div", class_="product-properties-i"):
+            label_elem = item.find("label")
+            value_elem = item.find("div", class_="product-properties-i-value")
+            if label_elem and value_elem:
+                specifications[label_elem.get_text(strip=True)] = value_elem.get_text(
+                    strip=True
+                )
+        if not specifications:
+            specifications = legacy_specifications_from_text(product_props.get_text())
+
+    details = {
+        eng_field: specifications[az_field]
+        for az_field, eng_field in SPEC_FIELD_MAPPINGS.items()
+        if az_field in specifications
+    }
+    details["specifications"] = specifications
+
+    details["description"] = None
+    for selector in DESCRIPTION_SELECTORS:
+        description_elem = soup.select_one(selector)
+        if description_elem:
+            details["description"] = description_elem.get_text(strip=True)
+            break
+
+    all_images = []
+    for selector in IMAGE_SELECTORS:
+        for img in soup.select(selector):
+            img_src = img.get("src") or img.get("data-src") or img.get("data-lazy")
+            if img_src:
+                if not img_src.startswith("http"):
+                    img_src = "https://turbo.az" + img_src
+                if img_src not in all_images:
+                    all_images.append(img_src)
+    details["all_images"] = all_images
+    return details
+
+
+def timed(func, arg, iterations):
+    """Return the mean time per call in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pages = sorted(glob.glob(os.path.join(FIXTURES_DIR, "detail_*.html")))
+    if not pages:
+        print("❌ No detail fixtures found")
+        sys.exit(1)
+
+    for path in pages:
+        with open(path, "r", encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), "html.parser")
+        prop_text = soup.find("div", class_="product-properties").get_text()
+
+        legacy = legacy_parse_detail_page(soup)
+        current = parse_detail_page(soup)
+        if legacy != current:
+            print(f"❌ {os.path.basename(path)}: extractors disagree")
+            sys.exit(1)
+
+        print(
+            f"📄 {os.path.basename(path)} "
+            f"({len(current['specifications'])} specifications, "
+            f"{len(current['all_images'])} images)"
+        )
+
+        old_us = timed(legacy_specifications_from_text, prop_text, iterations)
+        new_us = timed(extract_specifications_from_text, prop_text, iterations)
+        print(
+            f"  text specs: legacy {old_us:9.1f} µs  single-pass {new_us:9.1f} µs  "
+            f"x{old_us / new_us:.1f}"
+        )
+
+        page_iterations = max(1, iterations // 20)
+        old_us = timed(legacy_parse_detail_page, soup, page_iterations)
+        new_us = timed(parse_detail_page, soup, page_iterations)
+        print(
+            f"  full page:  legacy {old_us:9.1f} µs  single-pass {new_us:9.1f} µs  "
+            f"x{old_us / new_us:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
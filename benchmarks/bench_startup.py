@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the CLI monitor, the web app and the scraper module.
+
+Each scenario runs in a fresh interpreter (so nothing is already imported) from
+a temporary working directory, and is reported next to a bare `python -c pass`.
+
+Usage:
+    python benchmarks/bench_startup.py              # 10 runs per scenario
+    python benchmarks/bench_startup.py --runs 20 --budget-ms 400
+    python benchmarks/bench_startup.py --top 15     # slowest imports per scenario
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "python": "pass",
+    "import car_scraper": "import car_scraper",
+    "main.py": "import main; main.TurboAzMonitorApp()",
+    "run_app.py": (
+        "import logging; logging.basicConfig(level=logging.INFO); "
+        "import app; app.app.test_client().get('/api/status')"
+    ),
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run_python(code: str, cwd: str, env: dict, *extra_args: str) -> str:
+    """Run code in a fresh interpreter and return its stderr."""
+    result = subprocess.run(
+        [sys.executable, *extra_args, "-c", code],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+def run_scenario(code: str, cwd: str, env: dict) -> float:
+    """Wall time of one fresh-interpreter run in milliseconds."""
+    start = time.perf_counter()
+    run_python(code, cwd, env)
+    return (time.perf_counter() - start) * 1000
+
+
+def slowest_imports(code: str, cwd: str, env: dict, limit: int):
+    """Top-level-ish modules by cumulative import time, from -X importtime."""
+    stderr = run_python(code, cwd, env, "-X", "importtime")
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            depth = len(match.group(3)) // 2
+            rows.append((int(match.group(2)) / 1000, depth, match.group(4)))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turbo.az startup benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("-k", "--filter", default="", help="Run matching scenarios")
+    parser.add_argument("--top", type=int, default=0, help="Show N slowest imports")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=0,
+        help="Exit non-zero if any scenario's median exceeds this",
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+
+    over_budget = []
+    with tempfile.TemporaryDirectory() as cwd:
+        # One untimed run per scenario warms the OS file cache and .pyc files
+        scenarios = {
+            name: code
+            for name, code in SCENARIOS.items()
+            if name == "python" or args.filter in name
+        }
+        for code in scenarios.values():
+            run_scenario(code, cwd, env)
+
+        print(f"{'scenario':<22} {'median ms':>10} {'min ms':>8} {'over python':>12}")
+        baseline = None
+        for name, code in scenarios.items():
+            samples = [run_scenario(code, cwd, env) for _ in range(args.runs)]
+            median = statistics.median(samples)
+            if baseline is None:
+                baseline = median
+            print(
+                f"{name:<22} {median:>10.1f} {min(samples):>8.1f} "
+                f"{median - baseline:>12.1f}"
+            )
+            if args.budget_ms and name != "python" and median > args.budget_ms:
+                over_budget.append(name)
+
+            if args.top and name != "python":
+                for cumulative_ms, depth, module in slowest_imports(
+                    code, cwd, env, args.top
+                ):
+                    print(f"    {cumulative_ms:>8.1f} ms  {'  ' * depth}{module}")
+
+    if over_budget:
+        print(f"\n❌ Over the {args.budget_ms:g} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the scraping, storage and notification hot paths.
+
+Runs against the HTML fixtures in benchmarks/fixtures, never touches the network,
+and compares p50 latencies with benchmarks/baseline.json.
+
+Usage:
+    python benchmarks/run_benchmarks.py                  # run and compare
+    python benchmarks/run_benchmarks.py --save-baseline  # record a new baseline
+    python benchmarks/run_benchmarks.py -k db_ --iterations 500
+"""
+import argparse
+import gc
+import glob
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+sys.path.insert(0, REPO_DIR)
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def fixture_transport(pages):
+    """httpx transport that serves fixture pages instead of hitting turbo.az."""
+    import httpx
+
+    def handle(request):
+        return httpx.Response(200, html=pages.get(str(request.url), pages["default"]))
+
+    return httpx.MockTransport(handle)
+
+
+def measure(func, iterations: int, warmup: int):
+    """Run func repeatedly and return per-call latencies in microseconds."""
+    for _ in range(warmup):
+        func()
+
+    # Collector pauses would otherwise land on random samples
+    gc.collect()
+    gc.disable()
+    try:
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            func()
+            samples.append((time.perf_counter_ns() - start) / 1000)
+    finally:
+        gc.enable()
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p99_index = min(len(ordered) - 1, int(len(ordered) * 0.99))
+    mean = statistics.fmean(ordered)
+    return {
+        "iterations": len(ordered),
+        "ops_per_sec": round(1e6 / mean, 1) if mean else 0.0,
+        "p50_us": round(ordered[len(ordered) // 2], 1),
+        "p99_us": round(ordered[p99_index], 1),
+    }
+
+
+def build_benchmarks(workdir: str):
+    """Set up fixtures and return {name: (callable, iteration_scale)}."""
+    from bs4 import BeautifulSoup
+
+    from analytics import MarketIndex
+    from bot import TurboAzBot
+    from car_scraper import CarListing, TurboAzScraper
+    from database import DatabaseManager
+    from fingerprint import Fingerprint, FingerprintIndex
+    from identity_pool import IdentityPool
+    from similar_cars import SimilarCars
+
+    listing_html = read_fixture("listing_page.html")
+    detail_pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "detail_*.html"))):
+        car_id = os.path.basename(path)[len("detail_") : -len(".html")]
+        detail_pages[car_id] = read_fixture(os.path.basename(path))
+
+    listing_url = "https://turbo.az/autos?page=1"
+    pages = {"default": listing_html, listing_url: listing_html}
+    for car_id, html in detail_pages.items():
+        pages[f"https://turbo.az/autos/{car_id}"] = html
+
+    scraper = TurboAzScraper()
+    scraper.identities = IdentityPool(
+        scraper.ua_manager, transport=fixture_transport(pages)
+    )
+    scraper.enforce_rate_limit = lambda: None
+    scraper.cache = {}
+
+    listing_soup = BeautifulSoup(listing_html, "html.parser")
+    listing_cars = scraper.extract_car_listings(listing_soup)
+
+    detail_car_id = next(iter(detail_pages))
+    detail_car = CarListing(
+        detail_car_id,
+        "Toyota Camry",
+        "19 500 AZN",
+        "2012",
+        "137 000 km",
+        "2.5 L",
+        f"https://turbo.az/autos/{detail_car_id}",
+        "https://turbo.azstatic.com/uploads/f460x343/2024/05/8712345.jpg",
+    )
+
+    def fetch_detail():
+        scraper.cache.pop(detail_car_id, None)
+        scraper.extract_detailed_info(detail_car)
+
+    hydrated_car = scraper.extract_detailed_info(detail_car)
+
+    db = DatabaseManager(os.path.join(workdir, "bench.db"))
+    for i, car in enumerate(listing_cars * 30):
+        car.car_id = str(9000000 + i)
+        db.save_car(car)
+    save_counter = [0]
+
+    def save_car():
+        save_counter[0] += 1
+        hydrated_car.car_id = str(1000000 + save_counter[0] % 200)
+        db.save_car(hydrated_car)
+
+    filters = db.get_filter_settings()
+
+    # Repost lookups against 100 000 indexed listings with photo hashes
+    fingerprints = FingerprintIndex()
+    for i in range(100_000):
+        car = listing_cars[i % len(listing_cars)]
+        fingerprints.add(
+            Fingerprint.from_fields(
+                str(i),
+                car.title,
+                str(1990 + i % 35),
+                car.mileage,
+                car.engine,
+                car.city,
+                (i * 0x9E3779B97F4A7C15) & (2**64 - 1),
+            )
+        )
+    repost = Fingerprint.from_car(hydrated_car, 0x0123456789ABCDEF)
+
+    # Deal scores against 300 000 priced listings
+    market = MarketIndex()
+    market.load(
+        [
+            (
+                str(i),
+                f"model {i % 200}",
+                2000 + i % 16,
+                i * 7919 % 300_000,
+                2.0,
+                5000 + i * 13 % 60_000,
+                "AZN",
+            )
+            for i in range(300_000)
+        ]
+    )
+    scored_car = CarListing(
+        "market", "Model 7", "15 000 AZN", "2007", "90 000 km", "2.0 L", "", ""
+    )
+
+    # Similar-listing queries over 100 000 stored cars
+    similar = SimilarCars()
+    similar.add(
+        [
+            {
+                "id": i,
+                "car_id": str(i),
+                "title": f"Brand{i % 40} Model",
+                "price": f"{5000 + i * 13 % 60_000} AZN",
+                "year": str(2000 + i % 21),
+                "mileage": f"{i * 7919 % 300_000} km",
+                "engine": f"{1.4 + i % 20 / 10} L",
+                "brand": "",
+                "body_type": ("Sedan", "SUV", "Hatchback")[i % 3],
+                "transmission": ("Avtomat", "Mexaniki")[i % 2],
+            }
+            for i in range(100_000)
+        ]
+    )
+
+    os.environ.setdefault("BOT_TOKEN", "000000:benchmark")
+    os.environ.setdefault("CHAT_ID", "0")
+    bot = TurboAzBot()
+
+    return {
+        "get_page_content[listing]": (
+            lambda: scraper.get_page_content(listing_url),
+            0.2,
+        ),
+        "extract_car_listings": (
+            lambda: scraper.extract_car_listings(listing_soup),
+            0.2,
+        ),
+        "extract_detailed_info": (fetch_detail, 0.2),
+        "db_save_car": (save_car, 1.0),
+        "db_get_recent_cars[50]": (lambda: db.get_recent_cars(50), 1.0),
+        "db_get_stats": (db.get_stats, 1.0),
+        "build_turbo_az_url": (lambda: db.build_turbo_az_url(filters), 10.0),
+        "format_car_message": (lambda: bot.format_car_message(hydrated_car), 10.0),
+        "fingerprint_find": (lambda: fingerprints.find(repost), 10.0),
+        "market_score": (lambda: market.score(scored_car), 10.0),
+        "similar_cars[100k]": (lambda: similar.similar("12345"), 0.2),
+    }
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """Print a comparison table; return True when no benchmark regressed."""
+    ok = True
+    print()
+    print(
+        f"{'benchmark':<28} {'ops/s':>10} {'p50 µs':>10} {'p99 µs':>10} {'base p50':>10}  status"
+    )
+    print("-" * 84)
+    for name, result in results.items():
+        base = baseline.get("benchmarks", {}).get(name)
+        status = "new"
+        base_p50 = "-"
+        if base:
+            base_p50 = f"{base['p50_us']:.1f}"
+            ratio = result["p50_us"] / base["p50_us"] if base["p50_us"] else 1.0
+            if ratio > 1 + tolerance:
+                status = f"❌ REGRESSION x{ratio:.2f}"
+                ok = False
+            elif ratio < 1 - tolerance:
+                status = f"🚀 faster x{1 / ratio:.2f}"
+            else:
+                status = "✅ ok"
+        print(
+            f"{name:<28} {result['ops_per_sec']:>10.1f} {result['p50_us']:>10.1f} "
+            f"{result['p99_us']:>10.1f} {base_p50:>10}  {status}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Turbo.az benchmarks")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("-k", "--filter", default="", help="Run matching benchmarks")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    args.baseline = os.path.abspath(args.baseline)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    # Keep the app's DB and caches out of the repository
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="turboaz-bench-")
+    os.chdir(workdir)
+    try:
+        benchmarks = build_benchmarks(workdir)
+        results = {}
+        for name, (func, scale) in benchmarks.items():
+            if args.filter and args.filter not in name:
+                continue
+            iterations = max(10, int(args.iterations * scale))
+            results[name] = summarize(measure(func, iterations, args.warmup))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    ok = compare(results, baseline, args.tolerance)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        if baseline and args.filter:
+            baseline.setdefault("benchmarks", {}).update(results)
+            report["benchmarks"] = baseline["benchmarks"]
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\n💾 Saved baseline to {args.baseline}")
+        return
+
+    if not ok:
+        print(f"\n❌ Regressions above {args.tolerance:.0%} of baseline p50")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,30 @@
 import asyncio
 import logging
 import os
-from typing import List
-
-import httpx
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from car_scraper import CarListing
-from config import BOT_TOKEN, CHAT_ID
+from config import BOT_TOKEN, CHAT_ID, TELEGRAM_API_URL
+from metrics import TELEGRAM_RATE_LIMITED, TELEGRAM_SEND_SECONDS
+from tracing import span
+
+# httpx is imported on first send to keep startup fast
+if TYPE_CHECKING:
+    import httpx
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class SentAlert:
+    """A car alert in the chat, kept to edit it once the car's details are in."""
+
+    message_id: int
+    photo: bool
+
+
 class TurboAzBot:
     def __init__(self):
         self.bot_token = os.getenv("BOT_TOKEN")
@@ -24,14 +36,47 @@ class TurboAzBot:
         if not self.chat_id:
             raise ValueError("CHAT_ID environment variable is required")
 
-    def format_car_message(self, car: CarListing) -> str:
-        """Format a comprehensive car message with all available specifications."""
+        self.api_url = f"{TELEGRAM_API_URL}/bot{self.bot_token}"
+
+    async def _post(self, url: str, data: Dict) -> "httpx.Response":
+        """POST to the Bot API, recording latency and 429 responses."""
+        import httpx
+
+        method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        with span(f"telegram.{method}", "notify") as telegram_span:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(url, data=data)
+            telegram_span.set(status=response.status_code)
+        TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - start, method=method)
+
+        if response.status_code == 429:
+            TELEGRAM_RATE_LIMITED.inc(method=method)
+        response.raise_for_status()
+        return response
+
+    def format_car_message(self, car: CarListing, pending: bool = False) -> str:
+        """Format a comprehensive car message with all available specifications.
+
+        pending marks an alert sent from the listing card alone; it is edited
+        once the detail page has been fetched.
+        """
 
         # Header with car emoji and basic info
         message = f"🚗 **New Car Alert!**\n\n"
         message += f"**{car.title}**\n"
         message += f"💰 **{car.price}**\n\n"
 
+        if car.repost_of:
+            message += f"🔁 Possible repost of listing {car.repost_of}\n\n"
+
+        if car.deal:
+            median = f"{car.deal['median']:,}".replace(",", " ")
+            message += (
+                f"📊 Deal: {car.deal['label']}, priced above {car.deal['percentile']}% "
+                f"of {car.deal['comparables']} comparable cars (median {median} AZN)\n\n"
+            )
+
         # Essential details section
         message += "📋 **Essential Details:**\n"
         if car.year and car.year != "N/A":
@@ -93,17 +138,23 @@ class TurboAzBot:
         if car.specifications and len(car.specifications) > 5:
             message += f"\n📊 **Complete Specs:** {len(car.specifications)} details available\n"
 
+        if pending:
+            message += "\n⏳ _Fetching full details..._\n"
+
         # Link to the listing
         message += f"\n🔗 [View on Turbo.az]({car.url})"
 
         return message
 
-    async def send_car_notification(self, car: CarListing) -> bool:
-        """Send a detailed car notification via Telegram."""
+    async def send_car_notification(
+        self, car: CarListing, pending: bool = False
+    ) -> Optional[SentAlert]:
+        """Send a detailed car notification via Telegram; returns the sent
+        message, or None if it failed."""
         try:
-            message = self.format_car_message(car)
+            message = self.format_car_message(car, pending)
 
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendPhoto"
+            url = f"{self.api_url}/sendPhoto"
 
             # Prepare the data
             data = {
@@ -117,7 +168,7 @@ class TurboAzBot:
                 data["photo"] = car.image_url
             else:
                 # If no image, send as text message instead
-                url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+                url = f"{self.api_url}/sendMessage"
                 data = {
                     "chat_id": self.chat_id,
                     "text": message,
@@ -125,45 +176,140 @@ class TurboAzBot:
                     "disable_web_page_preview": False,
                 }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, data=data)
-                response.raise_for_status()
+            response = await self._post(url, data)
 
             logger.info(f"Sent enhanced notification for car: {car.car_id}")
-            return True
+            return SentAlert(
+                message_id=response.json()["result"]["message_id"],
+                photo="photo" in data,
+            )
 
         except Exception as e:
             logger.error(f"Failed to send notification for car {car.car_id}: {e}")
-            return False
+            return None
 
-    async def send_multiple_cars(self, cars: List[CarListing]) -> int:
-        """Send notifications for multiple cars with enhanced details."""
-        successful = 0
+    async def send_alerts(
+        self, cars: List[CarListing], pending: bool = False
+    ) -> Dict[str, SentAlert]:
+        """Send a notification for each car; returns the sent ones by car ID."""
+        sent = {}
 
         for car in cars:
             try:
-                if await self.send_car_notification(car):
-                    successful += 1
+                alert = await self.send_car_notification(car, pending)
+                if alert:
+                    sent[car.car_id] = alert
                 # Small delay between messages to avoid rate limiting
-                await asyncio.sleep(1)
+                with span("sleep.telegram", "throttle"):
+                    await asyncio.sleep(1)
             except Exception as e:
                 logger.error(f"Error sending notification for car {car.car_id}: {e}")
 
-        return successful
+        return sent
+
+    async def send_multiple_cars(self, cars: List[CarListing]) -> int:
+        """Send notifications for multiple cars with enhanced details."""
+        return len(await self.send_alerts(cars))
+
+    async def update_car_notification(self, car: CarListing, alert: SentAlert) -> bool:
+        """Replace a sent alert's text with the car's full details."""
+        message = self.format_car_message(car)
+        data = {
+            "chat_id": self.chat_id,
+            "message_id": alert.message_id,
+            "parse_mode": "Markdown",
+        }
+        if alert.photo:
+            url = f"{self.api_url}/editMessageCaption"
+            data["caption"] = message
+        else:
+            url = f"{self.api_url}/editMessageText"
+            data["text"] = message
+            data["disable_web_page_preview"] = False
+
+        try:
+            await self._post(url, data)
+            logger.info(f"Updated notification for car: {car.car_id}")
+            return True
+        except Exception as e:
+            # Telegram refuses an edit that changes nothing
+            response = getattr(e, "response", None)
+            if response is not None and "message is not modified" in response.text:
+                return True
+            logger.error(f"Failed to update notification for car {car.car_id}: {e}")
+            return False
+
+    async def update_alerts(
+        self, cars: List[CarListing], sent: Dict[str, SentAlert]
+    ) -> int:
+        """Edit the sent alerts of the given cars; returns how many were updated."""
+        updated = 0
+
+        for car in cars:
+            alert = sent.get(car.car_id)
+            if alert is None:
+                continue
+            if await self.update_car_notification(car, alert):
+                updated += 1
+            # Edits count against the same rate limit as sends
+            with span("sleep.telegram", "throttle"):
+                await asyncio.sleep(1)
+
+        return updated
+
+    def format_price_drop_message(self, drop: Dict) -> str:
+        """Format a price drop alert for a listing we have seen before."""
+        message = "📉 **Price Drop!**\n\n"
+        message += f"**{drop['title']}**\n"
+        message += f"💰 {drop['old_price']} → **{drop['new_price']}**\n"
+        if drop.get("drop"):
+            message += f"🔻 Down by {drop['drop']} {drop.get('currency') or ''}\n"
+        message += f"\n🔗 [View on Turbo.az]({drop['url']})"
+        return message
+
+    async def send_price_drop(self, drop: Dict) -> bool:
+        """Send a price drop notification via Telegram."""
+        try:
+            message = self.format_price_drop_message(drop)
+
+            if drop.get("image_url"):
+                url = f"{self.api_url}/sendPhoto"
+                data = {
+                    "chat_id": self.chat_id,
+                    "photo": drop["image_url"],
+                    "caption": message,
+                    "parse_mode": "Markdown",
+                }
+            else:
+                url = f"{self.api_url}/sendMessage"
+                data = {
+                    "chat_id": self.chat_id,
+                    "text": message,
+                    "parse_mode": "Markdown",
+                }
+
+            await self._post(url, data)
+
+            logger.info(f"Sent price drop notification for car: {drop['car_id']}")
+            return True
+
+        except Exception as e:
+            logger.error(
+                f"Failed to send price drop notification for car {drop['car_id']}: {e}"
+            )
+            return False
 
     async def send_status_message(self, message: str):
         """Send a status message to the chat."""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+            url = f"{self.api_url}/sendMessage"
             data = {
                 "chat_id": self.chat_id,
                 "text": f"🤖 *Bot Status:* {message}",
                 "parse_mode": "Markdown",
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, data=data)
-                response.raise_for_status()
+            await self._post(url, data)
 
             logger.info(f"Sent status message: {message}")
         except Exception as e:
@@ -218,7 +364,7 @@ class TurboAzBot:
             message += "─" * 30 + "\n"
             message += self.format_car_message(test_car)
 
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+            url = f"{self.api_url}/sendMessage"
             data = {
                 "chat_id": self.chat_id,
                 "text": message,
@@ -226,9 +372,7 @@ class TurboAzBot:
                 "disable_web_page_preview": True,
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, data=data)
-                response.raise_for_status()
+            await self._post(url, data)
 
             logger.info("Enhanced bot connection test successful")
             return True
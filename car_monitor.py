@@ -1,18 +1,38 @@
 import asyncio
+import contextvars
 import logging
 import os
-from typing import List, Set
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import replace
+from typing import Dict, List, Optional, Set
 
-from bot import TurboAzBot
+from bot import SentAlert
 from car_scraper import CarListing, TurboAzScraper
-from config import BOT_TOKEN, CHAT_ID, KNOWN_CARS_FILE
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+from config import (
+    BOT_TOKEN,
+    CHAT_ID,
+    KNOWN_CARS_FILE,
+    POST_FILTER_RULES,
+    REPOST_IMAGE_HASH,
+    REPOST_IMAGE_TIMEOUT,
+    REPOST_POLICY,
 )
+from filter_rules import load_rules
+from fingerprint import PILLOW_AVAILABLE, Fingerprint, FingerprintIndex, dhash
+from metrics import NEW_CARS, REPOSTS
+from profiler import PROFILER
+from tracing import span
+
 logger = logging.getLogger(__name__)
 
+# Photos of new cars downloaded at once for repost hashing
+PHOTO_FETCH_WORKERS = 8
+
+
+def listing_age(car: CarListing):
+    """Sort key putting older listings first; turbo.az IDs only grow."""
+    return (0, int(car.car_id)) if car.car_id.isdigit() else (1, 0)
+
 
 class CarMonitor:
     def __init__(self):
@@ -20,6 +40,8 @@ class CarMonitor:
         # Telegram is optional: only initialize when credentials are provided
         if BOT_TOKEN and CHAT_ID:
             try:
+                from bot import TurboAzBot
+
                 self.bot = TurboAzBot()
             except Exception as e:
                 logger.warning(f"Telegram disabled due to configuration error: {e}")
@@ -29,6 +51,11 @@ class CarMonitor:
             self.bot = None
         self.known_cars: Set[str] = set()
         self.current_url = None  # Store the current URL
+        self.rules = load_rules(POST_FILTER_RULES)
+        self.fingerprints = FingerprintIndex()
+        self.hash_images = REPOST_IMAGE_HASH and PILLOW_AVAILABLE
+        if REPOST_POLICY != "off" and REPOST_IMAGE_HASH and not PILLOW_AVAILABLE:
+            logger.info("Pillow not installed; reposts are matched on attributes only")
         self.load_known_cars()
 
     def set_url(self, url: str):
@@ -50,7 +77,7 @@ class CarMonitor:
             logger.info("No previous car data found, starting fresh")
 
     def save_known_cars(self):
-        """Save current known car IDs to file."""
+        """Rewrite the known car IDs file from the in-memory set."""
         try:
             with open(KNOWN_CARS_FILE, "w") as f:
                 for car_id in sorted(self.known_cars):
@@ -61,19 +88,207 @@ class CarMonitor:
 
     def add_known_car(self, car_id: str):
         """Add a car ID to the known cars set and save to file."""
-        self.known_cars.add(car_id)
-        self.save_known_cars()
+        self.add_known_cars([car_id])
+
+    def add_known_cars(self, car_ids: List[str]) -> int:
+        """Add car IDs to the known cars set, appending the new ones to the
+        file in one write; returns how many were new."""
+        added = [
+            car_id for car_id in dict.fromkeys(car_ids) if car_id not in self.known_cars
+        ]
+        if not added:
+            return 0
+        self.known_cars.update(added)
+        try:
+            with open(KNOWN_CARS_FILE, "a") as f:
+                f.writelines(f"{car_id}\n" for car_id in added)
+            logger.info(f"Saved {len(added)} new known car IDs")
+        except Exception as e:
+            logger.error(f"Error saving known cars: {e}")
+        return len(added)
 
     def filter_new_cars(self, cars: List[CarListing]) -> List[CarListing]:
         """Filter out cars that we've already seen."""
-        new_cars = []
-        for car in cars:
-            if car.car_id not in self.known_cars:
-                new_cars.append(car)
-                self.add_known_car(car.car_id)
+        new_cars = [car for car in cars if car.car_id not in self.known_cars]
+        self.add_known_cars([car.car_id for car in new_cars])
+        return new_cars
+
+    def bootstrap(self, cars: List[CarListing]):
+        """Mark the current listing cards known without alerts or detail
+        requests, so a first run is ready after one listing page."""
+        added = self.add_known_cars([car.car_id for car in cars])
+        self.index_cards(cars)
+        logger.info(f"Bootstrap: {added} current listings marked as known")
+        self.hydrate_in_background(cars)
+
+    def hydrate_in_background(self, cars: List[CarListing]):
+        """Fetch the details of bootstrapped cars; the command-line monitor
+        stores no cars, so there is nothing to fetch them for."""
+
+    def store_fingerprints(self, fingerprints: List[Fingerprint]):
+        """Persist newly indexed fingerprints (kept in memory only here)."""
+
+    def index_cards(self, cars: List[CarListing]):
+        """Fingerprint listing cards not indexed yet, so their reposts are caught."""
+        fingerprints = [
+            Fingerprint.from_car(car)
+            for car in cars
+            if car.car_id not in self.fingerprints
+        ]
+        for fingerprint in fingerprints:
+            self.fingerprints.add(fingerprint)
+        self.store_fingerprints(fingerprints)
+
+    async def hash_photos(self, cars: List[CarListing]) -> Dict[str, int]:
+        """Difference hashes of the cars' first photos, by car ID.
+
+        The photos are downloaded in parallel off the event loop. Those not in
+        after REPOST_IMAGE_TIMEOUT are left out, so their cars are matched on
+        attributes only rather than holding up the alerts.
+        """
+        if REPOST_POLICY == "off" or not self.hash_images or not cars:
+            return {}
+        with span("hash_photos", "network", cars=len(cars)):
+            return await asyncio.to_thread(self._hash_photos, cars)
+
+    def _hash_photos(self, cars: List[CarListing]) -> Dict[str, int]:
+        cars = [car for car in cars if car.image_url]
+        if not cars:
+            return {}
+        executor = ThreadPoolExecutor(
+            min(len(cars), PHOTO_FETCH_WORKERS), thread_name_prefix="photo-hash"
+        )
+        # Each task runs in a copy of this context so its spans join the trace
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run, self._photo_hash, car.image_url
+            ): car.car_id
+            for car in cars
+        }
+        done, late = wait(futures, timeout=REPOST_IMAGE_TIMEOUT)
+        # Downloads still running finish in the background and are discarded
+        executor.shutdown(wait=False, cancel_futures=True)
+        if late:
+            logger.info(
+                f"{len(late)} photos not in after {REPOST_IMAGE_TIMEOUT:g}s; "
+                "matching those cars on attributes only"
+            )
+        hashes = {futures[future]: future.result() for future in done}
+        return {car_id: value for car_id, value in hashes.items() if value is not None}
+
+    def _photo_hash(self, url: str) -> Optional[int]:
+        return dhash(self.scraper.fetch_image(url))
+
+    def flag_reposts(
+        self, new_cars: List[CarListing], image_hashes: Optional[Dict[str, int]] = None
+    ) -> List[CarListing]:
+        """Set repost_of on new cars that relist an earlier one.
 
+        image_hashes (from hash_photos) adds photo matching for the cars in it.
+        With REPOST_POLICY=suppress reposts are dropped instead.
+        """
+        if REPOST_POLICY == "off":
+            return new_cars
+        suppress = REPOST_POLICY == "suppress"
+        image_hashes = image_hashes or {}
+        reposts = set()
+        fingerprints = []
+        # Oldest first, so of a car and its repost on one page, the repost is
+        # the one flagged
+        for car in sorted(new_cars, key=listing_age):
+            fingerprint = Fingerprint.from_car(car, image_hashes.get(car.car_id))
+            match = self.fingerprints.find(fingerprint)
+            # Indexed straight away: a page can show a car and its repost
+            if self.fingerprints.add(fingerprint):
+                fingerprints.append(fingerprint)
+            if match is None:
+                continue
+
+            car.repost_of, matched_on = match
+            reposts.add(car.car_id)
+            REPOSTS.inc(
+                match=matched_on, action="suppressed" if suppress else "labelled"
+            )
+            logger.info(
+                f"🔁 {car.car_id} ({car.title}) looks like a repost of "
+                f"{car.repost_of} (same {matched_on})"
+            )
+        self.store_fingerprints(fingerprints)
+        if suppress:
+            return [car for car in new_cars if car.car_id not in reposts]
         return new_cars
 
+    async def screen_cards(self, new_cars: List[CarListing]) -> List[CarListing]:
+        """The new cars that pass the card rules and repost check.
+
+        Cards that already fail a rule, or suppressed reposts, never cost a
+        detail request; the rest are checked again once their details are in.
+        """
+        new_cars = self.rules.apply(new_cars, "card")
+        return self.flag_reposts(new_cars, await self.hash_photos(new_cars))
+
+    async def enrich(self, cars: List[CarListing]) -> List[CarListing]:
+        """Copies of the cars with their detail pages applied.
+
+        The fetch runs on a thread, so alerts sent from the cards meanwhile
+        never see a car half updated.
+        """
+        with span("hydrate", "other", cars=len(cars)):
+            return await asyncio.to_thread(
+                self._hydrate, [replace(car) for car in cars]
+            )
+
+    def _hydrate(self, cars: List[CarListing]) -> List[CarListing]:
+        # Sampled with the cycle when it is being profiled
+        with PROFILER.attach():
+            return self.scraper.hydrate_cars(cars)
+
+    async def announce(
+        self, new_cars: List[CarListing], pending: bool = False
+    ) -> Dict[str, SentAlert]:
+        """Send notifications for new cars; returns the sent alerts by car ID."""
+        logger.info(f"Found {len(new_cars)} new cars!")
+        NEW_CARS.inc(len(new_cars))
+
+        # Send notifications for new cars (if Telegram is enabled)
+        if not self.bot:
+            logger.info("Telegram disabled; skipping notifications")
+            return {}
+        sent = await self.bot.send_alerts(new_cars, pending)
+        logger.info(f"Successfully sent {len(sent)}/{len(new_cars)} notifications")
+        return sent
+
+    async def publish_details(self, cars: List[CarListing], sent: Dict[str, SentAlert]):
+        """Update the alerts sent from listing cards with the cars' details."""
+        if sent:
+            updated = await self.bot.update_alerts(cars, sent)
+            logger.info(f"Updated {updated}/{len(sent)} notifications with details")
+
+    async def deliver(self, new_cars: List[CarListing]) -> int:
+        """Alert on new cars and fetch their details; returns how many were
+        alerted on.
+
+        When the cards settle every post-filter rule, alerts go out from the
+        cards straight away while detail pages are fetched alongside, and are
+        updated in place once those are in. Otherwise the detail rules have
+        to pass first.
+        """
+        if not self.rules.on_card:
+            new_cars = self.rules.apply(await self.enrich(new_cars), "detail")
+            if new_cars:
+                await self.announce(new_cars)
+            return len(new_cars)
+
+        enriching = asyncio.create_task(self.enrich(new_cars))
+        try:
+            sent = await self.announce(new_cars, pending=True)
+        finally:
+            enriched = await enriching
+        # Cars whose detail page could not be fetched keep their card alert
+        enriched = [car for car in enriched if car.car_id in self.scraper.cache]
+        await self.publish_details(enriched, sent)
+        return len(new_cars)
+
     async def check_for_new_cars(self, url: str = None) -> int:
         """Check for new cars and send notifications."""
         logger.info("Checking for new cars...")
@@ -82,8 +297,8 @@ class CarMonitor:
             # Use provided URL or fallback to current URL
             search_url = url or self.current_url
 
-            # Get current cars from website
-            current_cars = self.scraper.get_new_cars(search_url)
+            # Listing cards only; details are fetched for new cars below
+            current_cars = self.scraper.get_listings(search_url)
 
             if not current_cars:
                 logger.warning("No cars found on the website")
@@ -91,23 +306,13 @@ class CarMonitor:
 
             # Filter out cars we've already seen
             new_cars = self.filter_new_cars(current_cars)
+            new_cars = await self.screen_cards(new_cars)
+            self.index_cards(current_cars)
 
-            if new_cars:
-                logger.info(f"Found {len(new_cars)} new cars!")
-
-                # Send notifications for new cars (if Telegram is enabled)
-                if self.bot:
-                    successful = await self.bot.send_multiple_cars(new_cars)
-                    logger.info(
-                        f"Successfully sent {successful}/{len(new_cars)} notifications"
-                    )
-                else:
-                    logger.info("Telegram disabled; skipping notifications")
-
-                return len(new_cars)
-            else:
+            delivered = await self.deliver(new_cars) if new_cars else 0
+            if not delivered:
                 logger.info("No new cars found")
-                return 0
+            return delivered
 
         except Exception as e:
             logger.error(f"Error checking for new cars: {e}")
@@ -136,13 +341,13 @@ class CarMonitor:
         if not self.known_cars:
             logger.info("First run - populating known cars without notifications...")
             search_url = url or self.current_url
-            current_cars = self.scraper.get_new_cars(search_url)
-            for car in current_cars:
-                self.add_known_car(car.car_id)
+            current_cars = self.scraper.get_listings(search_url)
+            self.bootstrap(current_cars)
 
-            await self.bot.send_status_message(
-                f"Monitoring initialized with {len(current_cars)} existing cars. "
-                "I'll now monitor for new listings!"
-            )
+            if self.bot:
+                await self.bot.send_status_message(
+                    f"Monitoring initialized with {len(current_cars)} existing cars. "
+                    "I'll now monitor for new listings!"
+                )
 
         return True
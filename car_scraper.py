@@ -1,67 +1,144 @@
+import contextvars
+import hashlib
+import importlib.util
 import json
 import logging
 import os
 import random
 import re
+import sys
+import threading
 import time
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import (
+    DETAIL_BATCH_PAUSE_RANGE,
+    MAX_REQUESTS_PER_MINUTE,
+    MAX_RETRIES,
+    MIN_REQUEST_DELAY,
+    PROXY_URLS,
+    RATE_BUDGET_FILE,
+    REQUEST_JITTER_RANGE,
+    TURBO_AZ_BASE_URL,
+    TURBO_AZ_URL,
+)
+from identity_pool import IdentityPool
+from metrics import (
+    DETAIL_CACHE_REQUESTS,
+    FETCH_BYTES,
+    FETCH_SECONDS,
+    PARSE_SECONDS,
+    throttle_sleep,
+)
+from parse_pool import ParsePool
+from proxy_pool import ProxyPool
+from rate_budget import RateBudget
+from tracing import span
+
+# httpx, bs4 and fake_useragent are imported on first use to keep startup fast
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+FAKE_UA_AVAILABLE = importlib.util.find_spec("fake_useragent") is not None
 
-import requests
-from bs4 import BeautifulSoup
-
-from config import MAX_RETRIES, REQUEST_TIMEOUT
-
-try:
-    from fake_useragent import UserAgent
+logger = logging.getLogger(__name__)
 
-    FAKE_UA_AVAILABLE = True
-except ImportError:
-    FAKE_UA_AVAILABLE = False
-    logging.warning("fake-useragent not available, using static user agents")
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+def intern_spec(value):
+    """Intern a repeated spec string (city, brand, ...) so equal values share memory."""
+    return sys.intern(value) if type(value) is str else value
 
 
+@dataclass(slots=True)
 class CarListing:
-    def __init__(
-        self,
-        car_id: str,
-        title: str,
-        price: str,
-        year: str,
-        mileage: str,
-        engine: str,
-        url: str,
-        image_url: str = None,
-    ):
-        self.car_id = car_id
-        self.title = title
-        self.price = price
-        self.year = year
-        self.mileage = mileage
-        self.engine = engine
-        self.url = url
-        self.image_url = image_url
-
-        # Additional detailed information
-        self.city = None
-        self.brand = None
-        self.model = None
-        self.body_type = None
-        self.color = None
-        self.engine_details = None
-        self.transmission = None
-        self.drivetrain = None
-        self.is_new = None
-        self.seats = None
-        self.owners = None
-        self.condition = None
-        self.market = None
-        self.description = None
-        self.all_images = []
-        self.specifications = {}
+    """A car listing; field order matches the found_cars table columns.
+
+    Fields marked ``column`` in their metadata are stored under a different
+    column name, ``persist=False`` fields are never stored and ``intern``
+    fields hold low-cardinality spec strings shared between listings.
+    """
+
+    car_id: str
+    title: str
+    price: str
+    year: str
+    mileage: str
+    engine: str
+    url: str
+    image_url: Optional[str] = None
+
+    # Additional detailed information
+    city: Optional[str] = field(default=None, metadata={"intern": True})
+    brand: Optional[str] = field(default=None, metadata={"intern": True})
+    model: Optional[str] = field(default=None, metadata={"intern": True})
+    body_type: Optional[str] = field(default=None, metadata={"intern": True})
+    color: Optional[str] = field(default=None, metadata={"intern": True})
+    engine_details: Optional[str] = None
+    transmission: Optional[str] = field(default=None, metadata={"intern": True})
+    drivetrain: Optional[str] = field(default=None, metadata={"intern": True})
+    is_new: Optional[str] = field(default=None, metadata={"intern": True})
+    seats: Optional[str] = field(default=None, metadata={"intern": True})
+    owners: Optional[str] = field(default=None, metadata={"intern": True})
+    condition: Optional[str] = field(
+        default=None, metadata={"column": "condition_info", "intern": True}
+    )
+    market: Optional[str] = field(default=None, metadata={"intern": True})
+    description: Optional[str] = None
+    all_images: List[str] = field(default_factory=list, metadata={"json": True})
+    specifications: Dict[str, str] = field(
+        default_factory=dict, metadata={"json": True}
+    )
+    # car_id of the earlier listing this one reposts (see fingerprint.py)
+    repost_of: Optional[str] = None
+    # Price percentile among comparable cars (see analytics.py)
+    deal: Dict[str, Any] = field(default_factory=dict, metadata={"json": True})
+
+    # Fingerprint of the listing-card fields, used to skip unchanged cards
+    card_hash: Optional[str] = field(default=None, metadata={"persist": False})
+
+    def to_row(self) -> tuple:
+        """Values for CAR_COLUMNS, with list/dict fields encoded as JSON."""
+        row = list(_ROW_GETTER(self))
+        for index in _JSON_INDEXES:
+            value = row[index]
+            row[index] = _json_encode(value) if value else None
+        return tuple(row)
+
+    @classmethod
+    def from_row(cls, row) -> "CarListing":
+        """Build a listing from values in CAR_COLUMNS order."""
+        values = list(row)
+        for index in _JSON_INDEXES:
+            values[index] = _json_decode(values[index], _JSON_EMPTY[index])
+        for index in _INTERN_INDEXES:
+            values[index] = intern_spec(values[index])
+        return cls(*values)
+
+    def to_dict(self) -> Dict:
+        """Persisted fields keyed by their column name."""
+        return dict(zip(CAR_COLUMNS, _ROW_GETTER(self)))
+
+    def to_json(self) -> str:
+        """Compact JSON encoding of to_dict()."""
+        return _json_encode(self.to_dict())
+
+    def compute_card_hash(self) -> str:
+        """Hash the fields shown on the listing card."""
+        card_fields = (
+            self.title,
+            self.price,
+            self.year,
+            self.mileage,
+            self.engine,
+            self.image_url or "",
+        )
+        digest = hashlib.blake2b(
+            "\x1f".join(card_fields).encode("utf-8"), digest_size=8
+        )
+        return digest.hexdigest()
 
     def __str__(self):
         details = f"{self.title}\n💰 {self.price}\n📅 {self.year}\n🔄 {self.mileage}\n⚙️ {self.engine}"
@@ -75,18 +152,291 @@ class CarListing:
         return details
 
 
+def _json_encode(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _json_decode(value, empty):
+    if not value or not value.strip():
+        return empty()
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return empty()
+
+
+# The found_cars schema, derived once from the CarListing fields
+_PERSISTED_FIELDS = tuple(
+    f for f in fields(CarListing) if f.metadata.get("persist", True)
+)
+CAR_FIELDS = tuple(f.name for f in _PERSISTED_FIELDS)
+CAR_COLUMNS = tuple(f.metadata.get("column", f.name) for f in _PERSISTED_FIELDS)
+_ROW_GETTER = attrgetter(*CAR_FIELDS)
+_JSON_INDEXES = tuple(
+    i for i, f in enumerate(_PERSISTED_FIELDS) if f.metadata.get("json")
+)
+_JSON_EMPTY = {i: _PERSISTED_FIELDS[i].default_factory for i in _JSON_INDEXES}
+_INTERN_INDEXES = tuple(
+    i for i, f in enumerate(_PERSISTED_FIELDS) if f.metadata.get("intern")
+)
+
+
+CURRENCY_MARKERS = {
+    "AZN": "AZN",
+    "₼": "AZN",
+    "USD": "USD",
+    "$": "USD",
+    "EUR": "EUR",
+    "€": "EUR",
+}
+
+
+def parse_price(price_text: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+    """Split a listing price like '17 500 AZN' into (17500, 'AZN')."""
+    if not price_text:
+        return None, None
+
+    digits = re.sub(r"\D", "", price_text)
+    if not digits:
+        return None, None
+
+    currency = None
+    for marker, code in CURRENCY_MARKERS.items():
+        if marker in price_text:
+            currency = code
+            break
+
+    return int(digits), currency
+
+
+ENGINE_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def normalize_card(
+    title: Optional[str],
+    year: Optional[str],
+    mileage: Optional[str],
+    engine: Optional[str],
+) -> Tuple[Optional[str], Optional[int], Optional[int], Optional[float]]:
+    """Card text as (model, year, km, litres): 'Toyota Camry', '2012',
+    '137 000 km', '2.5 L' -> ('toyota camry', 2012, 137000, 2.5)."""
+    model = " ".join(title.casefold().split()) if title else ""
+    year_digits = re.sub(r"\D", "", year or "")
+    km_digits = re.sub(r"\D", "", mileage or "")
+    litres = ENGINE_PATTERN.search(engine or "")
+    return (
+        model or None,
+        int(year_digits) if len(year_digits) == 4 else None,
+        int(km_digits) if km_digits else None,
+        float(litres.group().replace(",", ".")) if litres else None,
+    )
+
+
+# Map Azerbaijani field names to our attributes, in the order the page lists them
+SPEC_FIELD_MAPPINGS = {
+    "Şəhər": "city",
+    "Marka": "brand",
+    "Model": "model",
+    "Buraxılış ili": "year",
+    "Ban növü": "body_type",
+    "Rəng": "color",
+    "Mühərrik": "engine_details",
+    "Yürüş": "mileage",
+    "Sürətlər qutusu": "transmission",
+    "Ötürücü": "drivetrain",
+    "Yeni": "is_new",
+    "Yerlәrin sayı": "seats",
+    "Sahiblәr": "owners",
+    "Vәziyyәti": "condition",
+    "Hansi bazar üçün yığılıb": "market",
+}
+
+# One alternation over every label, longest first so no label shadows another
+SPEC_LABEL_PATTERN = re.compile(
+    "|".join(re.escape(label) for label in sorted(SPEC_FIELD_MAPPINGS, key=len)[::-1])
+)
+
+DESCRIPTION_SELECTORS = (
+    "div.product-description",
+    "div.product-text",
+    "div.description",
+    "div.auto-description",
+)
+
+# Image selectors in priority order; mirrored by _image_rank for a single-pass scan
+IMAGE_SELECTORS = (
+    "img.slider-img",
+    "img.product-photo",
+    "div.product-photos img",
+    "div.slider img",
+    'img[src*="cars/"]',
+    'img[src*="autos/"]',
+)
+
+
+def _image_rank(img) -> Optional[int]:
+    """Index of the first IMAGE_SELECTORS entry matching img, or None."""
+    classes = img.get("class") or ()
+    if "slider-img" in classes:
+        return 0
+    if "product-photo" in classes:
+        return 1
+
+    in_photos = in_slider = False
+    for parent in img.parents:
+        if parent.name == "div":
+            parent_classes = parent.get("class") or ()
+            in_photos = in_photos or "product-photos" in parent_classes
+            in_slider = in_slider or "slider" in parent_classes
+    if in_photos:
+        return 2
+    if in_slider:
+        return 3
+
+    src = img.get("src") or ""
+    if "cars/" in src:
+        return 4
+    if "autos/" in src:
+        return 5
+    return None
+
+
+def extract_specifications_from_text(prop_text: str) -> Dict[str, str]:
+    """Split flattened property text on the known field labels in one pass."""
+    specifications = {}
+    matches = list(SPEC_LABEL_PATTERN.finditer(prop_text))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(prop_text)
+        value = prop_text[match.end() : end].strip()
+        if value and match.group() not in specifications:
+            specifications[match.group()] = value
+
+    return specifications
+
+
+def parse_detail_page(soup: "BeautifulSoup") -> Dict:
+    """Extract specifications, description and images from a car detail page."""
+    specifications = {}
+
+    # Find the product-properties div
+    product_props = soup.find("div", class_="product-properties")
+    if product_props:
+        # Each property item should have a label and value
+        for item in product_props.find_all("div", class_="product-properties-i"):
+            label_elem = item.find("label")
+            value_elem = item.find("div", class_="product-properties-i-value")
+
+            if label_elem and value_elem:
+                key = label_elem.get_text(strip=True)
+                specifications[key] = value_elem.get_text(strip=True)
+
+        # If the above doesn't work, split the raw text on known labels
+        if not specifications:
+            specifications = extract_specifications_from_text(product_props.get_text())
+
+    # Also try finding specifications in a table format (backup method)
+    if not specifications:
+        for row in soup.find_all("tr"):
+            cells = row.find_all(["td", "th"])
+            if len(cells) >= 2:
+                key = cells[0].get_text(strip=True)
+                value = cells[1].get_text(strip=True)
+                if key and value:
+                    specifications[key] = value
+
+    details = {
+        eng_field: specifications[az_field]
+        for az_field, eng_field in SPEC_FIELD_MAPPINGS.items()
+        if az_field in specifications
+    }
+    details["specifications"] = specifications
+
+    details["description"] = None
+    for selector in DESCRIPTION_SELECTORS:
+        description_elem = soup.select_one(selector)
+        if description_elem:
+            details["description"] = description_elem.get_text(strip=True)
+            break
+
+    # One pass over <img> tags, ordered as if IMAGE_SELECTORS ran one by one
+    ranked_images = []
+    for position, img in enumerate(soup.find_all("img")):
+        rank = _image_rank(img)
+        if rank is not None:
+            ranked_images.append((rank, position, img))
+    ranked_images.sort(key=lambda entry: entry[:2])
+
+    # Ordered set: keeps first-seen order with O(1) duplicate checks
+    images = {}
+    for _, _, img in ranked_images:
+        img_src = img.get("src") or img.get("data-src") or img.get("data-lazy")
+        if img_src:
+            if not img_src.startswith("http"):
+                img_src = TURBO_AZ_BASE_URL + img_src
+            images[img_src] = None
+    details["all_images"] = list(images)
+
+    return details
+
+
+def apply_details(car: CarListing, details: Dict) -> CarListing:
+    """Copy parsed or cached detail fields onto a listing."""
+    for key, value in details.items():
+        if hasattr(car, key):
+            setattr(car, key, intern_spec(value))
+    return car
+
+
+@dataclass(slots=True)
+class RawPage:
+    """Undecoded response body, cheap to send to a parse worker process."""
+
+    url: str
+    content: bytes
+    encoding: Optional[str]
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def parse_detail_content(
+    content: bytes, encoding: Optional[str]
+) -> Optional[Tuple[Dict, float, float]]:
+    """Parse a raw detail page; returns (details, html_seconds, extract_seconds).
+
+    Runs in parse pool workers, so it only takes and returns picklable values
+    and never raises.
+    """
+    from bs4 import BeautifulSoup
+
+    try:
+        start = time.perf_counter()
+        soup = BeautifulSoup(
+            content.decode(encoding or "utf-8", errors="replace"), "html.parser"
+        )
+        parsed = time.perf_counter()
+        details = parse_detail_page(soup)
+        return details, parsed - start, time.perf_counter() - parsed
+    except Exception as e:
+        logger.warning(f"Error parsing detail page: {e}")
+        return None
+
+
 class AdvancedUserAgentManager:
     """Advanced user agent management with multiple strategies."""
 
     def __init__(self):
+        # Static agents are used until fake-useragent has loaded its dataset,
+        # which happens in the background so it never delays startup
         self.ua_generator = None
         if FAKE_UA_AVAILABLE:
-            try:
-                self.ua_generator = UserAgent()
-                logger.info("✅ Advanced user agent generator initialized")
-            except Exception as e:
-                logger.warning(f"Failed to initialize UserAgent: {e}")
-                self.ua_generator = None
+            threading.Thread(
+                target=self._load_generator, name="useragent-loader", daemon=True
+            ).start()
+        else:
+            logger.warning("fake-useragent not available, using static user agents")
 
         # Fallback static user agents (high-quality, recent versions)
         self.static_desktop_agents = [
@@ -121,6 +471,15 @@ class AdvancedUserAgentManager:
         self.current_ua = None
         self.request_count = 0
 
+    def _load_generator(self):
+        try:
+            from fake_useragent import UserAgent
+
+            self.ua_generator = UserAgent()
+            logger.info("✅ Advanced user agent generator initialized")
+        except Exception as e:
+            logger.warning(f"Failed to initialize UserAgent: {e}")
+
     def get_random_desktop_ua(self) -> str:
         """Get a random desktop user agent."""
         if self.ua_generator:
@@ -175,7 +534,6 @@ class AdvancedUserAgentManager:
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.9,az;q=0.8,tr;q=0.7",
             "DNT": "1",
-            "Connection": "keep-alive",
             "Upgrade-Insecure-Requests": "1",
         }
 
@@ -215,7 +573,6 @@ class AdvancedUserAgentManager:
 
 class TurboAzScraper:
     def __init__(self):
-        self.session = requests.Session()
         self.cache_file = "car_details_cache.json"
         self.cache = self.load_cache()
         self.request_count = 0
@@ -224,14 +581,26 @@ class TurboAzScraper:
         # Initialize advanced user agent manager
         self.ua_manager = AdvancedUserAgentManager()
 
-        # Update with initial headers
-        self.update_headers()
+        # Requests rotate over identities, each with its own connection
+        self.identities = IdentityPool(self.ua_manager)
+        # Photos come from the image CDN; downloads get a client of their own
+        # so they neither use up page identities nor count toward rotation
+        self.image_identities = IdentityPool(self.ua_manager, size=1)
+
+        # With proxies configured, each has its own budget and identities
+        self.proxies = ProxyPool(PROXY_URLS, self.ua_manager) if PROXY_URLS else None
+        if self.proxies:
+            logger.info(f"🔀 Routing requests through {len(self.proxies)} proxies")
 
         # Rate limiting settings
-        self.min_delay_between_requests = 2.0  # Minimum 2 seconds between requests
-        self.max_delay_between_requests = 5.0  # Maximum 5 seconds
-        self.max_requests_per_minute = 15  # Limit to 15 requests per minute
+        self.min_delay_between_requests = MIN_REQUEST_DELAY
+        self.max_requests_per_minute = MAX_REQUESTS_PER_MINUTE
         self.request_timestamps = []
+        # Shared with other processes on this host when RATE_BUDGET_FILE is set
+        self.budget = RateBudget() if RATE_BUDGET_FILE and not self.proxies else None
+
+        # Detail pages are parsed in worker processes for large batches
+        self.parse_pool = ParsePool()
 
     def load_cache(self) -> Dict:
         """Load cached car details to avoid re-scraping."""
@@ -253,66 +622,125 @@ class TurboAzScraper:
         except Exception as e:
             logger.warning(f"Could not save cache: {e}")
 
-    def update_headers(self):
-        """Update session headers with advanced user agent rotation."""
-        user_agent = self.ua_manager.get_user_agent()
-        headers = self.ua_manager.get_headers_for_ua(user_agent)
-
-        self.session.headers.update(headers)
-        logger.debug(f"Updated headers with UA: {user_agent[:50]}...")
+    def close(self):
+        """Close open connections and the parse pool."""
+        self.identities.close()
+        self.image_identities.close()
+        if self.proxies:
+            self.proxies.close()
+        self.parse_pool.shutdown()
 
     def enforce_rate_limit(self):
         """Enforce rate limiting to avoid being banned."""
         current_time = time.time()
 
-        # Remove timestamps older than 1 minute
-        self.request_timestamps = [
-            ts for ts in self.request_timestamps if current_time - ts < 60
-        ]
+        # The shared budget covers both limits below for every process
+        wait = self.budget.reserve() if self.budget else None
+        if wait is not None:
+            throttle_sleep(wait, "rate_budget")
+        else:
+            # Remove timestamps older than 1 minute
+            self.request_timestamps = [
+                ts for ts in self.request_timestamps if current_time - ts < 60
+            ]
 
-        # Check if we're at the rate limit
-        if len(self.request_timestamps) >= self.max_requests_per_minute:
-            sleep_time = 60 - (current_time - self.request_timestamps[0]) + 1
-            logger.info(f"Rate limit reached, sleeping for {sleep_time:.1f} seconds")
-            time.sleep(sleep_time)
-            self.request_timestamps = []
+            # Check if we're at the rate limit
+            if len(self.request_timestamps) >= self.max_requests_per_minute:
+                sleep_time = 60 - (current_time - self.request_timestamps[0]) + 1
+                logger.info(
+                    f"Rate limit reached, sleeping for {sleep_time:.1f} seconds"
+                )
+                throttle_sleep(sleep_time, "rate_limit")
+                self.request_timestamps = []
 
-        # Enforce minimum delay between requests
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_delay_between_requests:
-            sleep_time = self.min_delay_between_requests - time_since_last
-            time.sleep(sleep_time)
+            # Enforce minimum delay between requests
+            time_since_last = current_time - self.last_request_time
+            if time_since_last < self.min_delay_between_requests:
+                sleep_time = self.min_delay_between_requests - time_since_last
+                throttle_sleep(sleep_time, "min_delay")
 
         # Add random delay to appear more human-like
-        random_delay = random.uniform(0.5, 2.0)
-        time.sleep(random_delay)
+        random_delay = random.uniform(*REQUEST_JITTER_RANGE)
+        throttle_sleep(random_delay, "jitter")
 
         # Record this request
         self.request_timestamps.append(time.time())
         self.last_request_time = time.time()
         self.request_count += 1
 
-        # Rotate user agent more frequently for better stealth
-        if self.request_count % random.randint(3, 7) == 0:
-            self.update_headers()
-            logger.debug(f"Rotated user agent after {self.request_count} requests")
+    def backoff(self, seconds: float, reason: str):
+        """Wait before a retry; through proxies the retry just goes to another one."""
+        if self.proxies is None:
+            throttle_sleep(seconds, reason)
+
+    def fetch_raw(self, url: str, page_type: str = "page") -> Optional[RawPage]:
+        """Fetch a page with anti-detection measures and return its raw bytes."""
+        import httpx
 
-    def get_page_content(self, url: str) -> Optional[BeautifulSoup]:
-        """Fetch and parse the HTML content from the given URL with anti-detection measures."""
-        self.enforce_rate_limit()
+        # Proxies carry their own budgets; the single-address limits apply otherwise
+        if self.proxies is None:
+            self.enforce_rate_limit()
+        else:
+            self.request_count += 1
 
         for attempt in range(MAX_RETRIES):
+            proxy = None
+            if self.proxies is not None:
+                proxy = self.proxies.acquire()
+                if proxy is None:
+                    logger.error(f"All proxies are evicted, not fetching {url}")
+                    return None
+            identities = proxy.identities if proxy is not None else self.identities
+            identity = identities.next()
             try:
                 logger.debug(f"Requesting: {url} (attempt {attempt + 1})")
-                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+                fetch_start = time.perf_counter()
+                with span(
+                    f"fetch.{page_type}", "network", url=url, attempt=attempt + 1
+                ) as fetch_span:
+                    if proxy is not None:
+                        fetch_span.set(proxy=proxy.label)
+                    try:
+                        response = identity.get(url)
+                    except httpx.TimeoutException:
+                        FETCH_SECONDS.observe(
+                            time.perf_counter() - fetch_start, status="timeout"
+                        )
+                        if proxy is not None:
+                            self.proxies.record(proxy, None)
+                        raise
+                    except httpx.HTTPError:
+                        FETCH_SECONDS.observe(
+                            time.perf_counter() - fetch_start, status="error"
+                        )
+                        if proxy is not None:
+                            self.proxies.record(proxy, None)
+                        raise
+                    fetch_span.set(
+                        status=response.status_code,
+                        bytes=len(response.content),
+                        http_version=response.http_version,
+                    )
+                elapsed = time.perf_counter() - fetch_start
+                FETCH_SECONDS.observe(elapsed, status=str(response.status_code))
+                FETCH_BYTES.inc(len(response.content))
+
+                retry_after = None
+                if response.headers.get("Retry-After", "").isdigit():
+                    retry_after = int(response.headers["Retry-After"])
+                if proxy is not None:
+                    self.proxies.record(
+                        proxy, response.status_code, elapsed, retry_after
+                    )
 
                 # Handle rate limiting responses
                 if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
-                    logger.warning(f"Rate limited, waiting {retry_after} seconds")
-                    time.sleep(retry_after)
-                    # Change user agent after being rate limited
-                    self.update_headers()
+                    # Come back as a different client after being rate limited
+                    identities.retire(identity)
+                    if proxy is None:
+                        retry_after = retry_after or 60
+                        logger.warning(f"Rate limited, waiting {retry_after} seconds")
+                        throttle_sleep(retry_after, "retry_after")
                     continue
 
                 # Handle temporary server errors
@@ -321,45 +749,44 @@ class TurboAzScraper:
                     logger.warning(
                         f"Server error {response.status_code}, waiting {wait_time:.1f}s"
                     )
-                    time.sleep(wait_time)
+                    self.backoff(wait_time, "server_error")
                     continue
 
                 response.raise_for_status()
 
-                # Ensure proper text decoding by using response.text instead of response.content
-                # This handles encoding detection and decompression automatically
-                soup = BeautifulSoup(response.text, "html.parser")
+                # response.text handles encoding detection and decompression
+                text = response.text
 
                 # Verify we got proper HTML content
-                logger.debug(f"Content length: {len(response.text)} chars")
-                logger.debug(f"Content preview: {response.text[:200]}...")
+                logger.debug(f"Content length: {len(text)} chars")
+                logger.debug(f"Content preview: {text[:200]}...")
 
                 # Check for basic HTML indicators
-                has_html = soup.find("html") is not None
-                has_body = soup.find("body") is not None
-                has_turbo = "turbo.az" in response.text.lower()
-                has_products = "products-i" in response.text
+                lowered = text.lower()
+                has_html = "<html" in lowered
+                has_body = "<body" in lowered
+                has_turbo = "turbo.az" in lowered
+                has_products = "products-i" in text
 
                 logger.debug(
                     f"HTML validation: html={has_html}, body={has_body}, turbo={has_turbo}, products={has_products}"
                 )
 
-                if has_html or has_body or has_turbo or len(response.text) > 10000:
-                    logger.debug(f"Successfully parsed HTML content")
-                    return soup
+                if has_html or has_body or has_turbo or len(text) > 10000:
+                    return RawPage(url, response.content, response.encoding)
                 else:
                     logger.warning(f"Content validation failed")
                     continue
 
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 logger.warning(f"Timeout on attempt {attempt + 1} for {url}")
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(2**attempt)
+                    self.backoff(2**attempt, "backoff")
 
-            except requests.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(2**attempt)
+                    self.backoff(2**attempt, "backoff")
                 else:
                     logger.error(
                         f"Failed to fetch page after {MAX_RETRIES} attempts: {url}"
@@ -369,11 +796,71 @@ class TurboAzScraper:
             except Exception as e:
                 logger.warning(f"Parsing error on attempt {attempt + 1}: {e}")
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(2**attempt)
+                    self.backoff(2**attempt, "backoff")
 
         return None
 
-    def extract_car_listings(self, soup: BeautifulSoup) -> List[CarListing]:
+    def fetch_raw_many(
+        self, urls: List[str], page_type: str = "page"
+    ) -> List[Optional[RawPage]]:
+        """Fetch several pages, one thread per proxy when proxies are configured."""
+        if self.proxies is None or len(urls) < 2:
+            return [self.fetch_raw(url, page_type) for url in urls]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = min(len(self.proxies), len(urls))
+        with ThreadPoolExecutor(workers, thread_name_prefix="proxy-fetch") as executor:
+            # Each task runs in a copy of this context so its spans join the trace
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self.fetch_raw, url, page_type
+                )
+                for url in urls
+            ]
+            return [future.result() for future in futures]
+
+    def fetch_image(self, url: Optional[str]) -> Optional[bytes]:
+        """Download a listing photo, or None if that fails.
+
+        Photos come from the image CDN, not the site, so the page rate limit
+        and retries do not apply.
+        """
+        import httpx
+
+        if not url:
+            return None
+        fetch_start = time.perf_counter()
+        try:
+            with span("fetch.image", "network", url=url):
+                response = self.image_identities.next().get(url)
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            FETCH_SECONDS.observe(time.perf_counter() - fetch_start, status="error")
+            logger.debug(f"Could not fetch image {url}: {e}")
+            return None
+        FETCH_SECONDS.observe(
+            time.perf_counter() - fetch_start, status=str(response.status_code)
+        )
+        FETCH_BYTES.inc(len(response.content))
+        return response.content
+
+    def get_page_content(
+        self, url: str, page_type: str = "page"
+    ) -> Optional["BeautifulSoup"]:
+        """Fetch and parse the HTML content from the given URL."""
+        from bs4 import BeautifulSoup
+
+        page = self.fetch_raw(url, page_type)
+        if page is None:
+            return None
+
+        with PARSE_SECONDS.time(page_type=page_type, stage="html"), span(
+            f"parse.{page_type}.html", "parse"
+        ):
+            return BeautifulSoup(page.text, "html.parser")
+
+    def extract_car_listings(self, soup: "BeautifulSoup") -> List[CarListing]:
         """Extract car listings from the parsed HTML."""
         cars = []
 
@@ -389,10 +876,10 @@ class TurboAzScraper:
 
                 car_url = link_elem.get("href")
                 if car_url and not car_url.startswith("http"):
-                    car_url = "https://turbo.az" + car_url
+                    car_url = TURBO_AZ_BASE_URL + car_url
 
-                # Extract car ID from URL
-                car_id_match = re.search(r"/(\d+)", car_url)
+                # Extract car ID from the URL path (the host may contain digits)
+                car_id_match = re.search(r"/(\d+)", urlsplit(car_url).path)
                 if not car_id_match:
                     continue
                 car_id = car_id_match.group(1)
@@ -425,11 +912,26 @@ class TurboAzScraper:
                 img_elem = item.find("img")
                 image_url = img_elem.get("src") if img_elem else None
                 if image_url and not image_url.startswith("http"):
-                    image_url = "https://turbo.az" + image_url
+                    image_url = TURBO_AZ_BASE_URL + image_url
+
+                # "Bakı, bugün 10:00": the card names the city before the date
+                city = None
+                datetime_elem = item.find("div", class_="products-i__datetime")
+                if datetime_elem:
+                    city = datetime_elem.get_text(strip=True).split(",")[0] or None
 
                 car = CarListing(
-                    car_id, title, price, year, mileage, engine, car_url, image_url
+                    car_id,
+                    title,
+                    price,
+                    year,
+                    mileage,
+                    engine,
+                    car_url,
+                    image_url,
+                    intern_spec(city),
                 )
+                car.card_hash = car.compute_card_hash()
                 cars.append(car)
 
             except Exception as e:
@@ -443,237 +945,141 @@ class TurboAzScraper:
 
         # Check cache first
         if car.car_id in self.cache:
-            cached_data = self.cache[car.car_id]
-            # Apply cached data to car object
-            for key, value in cached_data.items():
-                if hasattr(car, key):
-                    setattr(car, key, value)
+            DETAIL_CACHE_REQUESTS.inc(result="hit")
+            apply_details(car, self.cache[car.car_id])
             logger.debug(f"Used cached data for car {car.car_id}")
             return car
 
+        DETAIL_CACHE_REQUESTS.inc(result="miss")
+
         try:
             logger.info(f"Fetching detailed info for car {car.car_id}")
-            soup = self.get_page_content(car.url)
-
-            if not soup:
+            page = self.fetch_raw(car.url, page_type="detail")
+            if not page:
                 return car
 
-            # Extract specifications from the product-properties section
-            specifications = {}
+            self.store_details(car, parse_detail_content(page.content, page.encoding))
+            return car
 
-            # Find the product-properties div
-            product_props = soup.find("div", class_="product-properties")
-            if product_props:
-                # Get all the property items within product-properties
-                prop_items = product_props.find_all(
-                    "div", class_="product-properties-i"
-                )
+        except Exception as e:
+            logger.error(f"Error extracting detailed info for car {car.car_id}: {e}")
+            return car
 
-                for item in prop_items:
-                    # Each item should have a label and value
-                    label_elem = item.find("label")
-                    value_elem = item.find("div", class_="product-properties-i-value")
-
-                    if label_elem and value_elem:
-                        key = label_elem.get_text(strip=True)
-                        value = value_elem.get_text(strip=True)
-                        specifications[key] = value
-
-                # If the above doesn't work, try extracting from the raw text
-                if not specifications:
-                    prop_text = product_props.get_text()
-                    # Split by common Azerbaijani field names
-                    field_patterns = [
-                        "Şəhər",
-                        "Marka",
-                        "Model",
-                        "Buraxılış ili",
-                        "Ban növü",
-                        "Rəng",
-                        "Mühərrik",
-                        "Yürüş",
-                        "Sürətlər qutusu",
-                        "Ötürücü",
-                        "Yeni",
-                        "Yerlәrin sayı",
-                        "Sahiblәr",
-                        "Vәziyyәti",
-                        "Hansi bazar üçün yığılıb",
-                    ]
-
-                    # Try to extract values using regex patterns
-                    import re
-
-                    for i, field in enumerate(field_patterns):
-                        if i < len(field_patterns) - 1:
-                            next_field = field_patterns[i + 1]
-                            pattern = f"{field}(.*?){next_field}"
-                        else:
-                            pattern = f"{field}(.*?)$"
-
-                        match = re.search(pattern, prop_text, re.DOTALL)
-                        if match:
-                            value = match.group(1).strip()
-                            if value:
-                                specifications[field] = value
-
-            # Also try finding specifications in a table format (backup method)
-            if not specifications:
-                spec_rows = soup.find_all("tr")
-                for row in spec_rows:
-                    cells = row.find_all(["td", "th"])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True)
-                        value = cells[1].get_text(strip=True)
-                        if key and value:
-                            specifications[key] = value
-
-            # Map Azerbaijani field names to our attributes
-            field_mappings = {
-                "Şəhər": "city",
-                "Marka": "brand",
-                "Model": "model",
-                "Buraxılış ili": "year",
-                "Ban növü": "body_type",
-                "Rəng": "color",
-                "Mühərrik": "engine_details",
-                "Yürüş": "mileage",
-                "Sürətlər qutusu": "transmission",
-                "Ötürücü": "drivetrain",
-                "Yeni": "is_new",
-                "Yerlәrin sayı": "seats",
-                "Sahiblәr": "owners",
-                "Vәziyyәti": "condition",
-                "Hansi bazar üçün yığılıb": "market",
-            }
-
-            # Apply mappings
-            for az_field, eng_field in field_mappings.items():
-                if az_field in specifications:
-                    setattr(car, eng_field, specifications[az_field])
-
-            car.specifications = specifications
-
-            # Extract description - try multiple selectors
-            description_selectors = [
-                "div.product-description",
-                "div.product-text",
-                "div.description",
-                "div.auto-description",
-            ]
+    def store_details(self, car: CarListing, parsed: Optional[Tuple]) -> CarListing:
+        """Apply a parse_detail_content() result to the car and cache it."""
+        if parsed is None:
+            logger.error(f"Could not parse detail page for car {car.car_id}")
+            return car
 
-            for selector in description_selectors:
-                description_elem = soup.select_one(selector)
-                if description_elem:
-                    car.description = description_elem.get_text(strip=True)
-                    break
-
-            # Extract all images
-            car.all_images = []
-
-            # Try different image selectors
-            image_selectors = [
-                "img.slider-img",
-                "img.product-photo",
-                "div.product-photos img",
-                "div.slider img",
-                'img[src*="cars/"]',
-                'img[src*="autos/"]',
-            ]
+        details, html_seconds, extract_seconds = parsed
+        PARSE_SECONDS.observe(html_seconds, page_type="detail", stage="html")
+        PARSE_SECONDS.observe(extract_seconds, page_type="detail", stage="extract")
+        apply_details(car, details)
 
-            for selector in image_selectors:
-                images = soup.select(selector)
-                for img in images:
-                    img_src = (
-                        img.get("src") or img.get("data-src") or img.get("data-lazy")
-                    )
-                    if img_src:
-                        if not img_src.startswith("http"):
-                            img_src = "https://turbo.az" + img_src
-                        if img_src not in car.all_images:
-                            car.all_images.append(img_src)
-
-            # Cache the extracted data
-            cache_data = {}
-            for field in [
-                "city",
-                "brand",
-                "model",
-                "body_type",
-                "color",
-                "engine_details",
-                "transmission",
-                "drivetrain",
-                "is_new",
-                "seats",
-                "owners",
-                "condition",
-                "market",
-                "description",
-                "all_images",
-                "specifications",
-            ]:
-                if hasattr(car, field):
-                    cache_data[field] = getattr(car, field)
-
-            self.cache[car.car_id] = cache_data
-
-            # If we found specifications, log them for debugging
-            if specifications:
-                logger.info(
-                    f"Extracted {len(specifications)} specifications for car {car.car_id}"
-                )
-                for key, value in list(specifications.items())[:3]:  # Log first 3
-                    logger.info(f"  {key}: {value}")
-            else:
-                logger.warning(f"No specifications found for car {car.car_id}")
+        # Cache the extracted data
+        self.cache[car.car_id] = details
 
-            logger.info(f"Successfully extracted detailed info for car {car.car_id}")
-            return car
+        # If we found specifications, log them for debugging
+        specifications = details["specifications"]
+        if specifications:
+            logger.info(
+                f"Extracted {len(specifications)} specifications for car {car.car_id}"
+            )
+            for key, value in list(specifications.items())[:3]:  # Log first 3
+                logger.info(f"  {key}: {value}")
+        else:
+            logger.warning(f"No specifications found for car {car.car_id}")
 
-        except Exception as e:
-            logger.error(f"Error extracting detailed info for car {car.car_id}: {e}")
-            return car
+        logger.info(f"Successfully extracted detailed info for car {car.car_id}")
+        return car
 
-    def get_new_cars(self, url: str = None) -> List[CarListing]:
-        """Fetch all current car listings from Turbo.az with detailed information and rate limiting."""
+    def get_listings(self, url: str = None) -> List[CarListing]:
+        """Fetch the listing page and return cards without detail hydration."""
         if url is None:
             # Fallback URL if none provided
-            url = "https://turbo.az/autos?page=1&price_from=17000&price_to=22000&used=1&year_to=2015&engine_from=2.3&kilometers_to=150000"
+            url = TURBO_AZ_URL
 
         logger.info("Fetching car listings from Turbo.az...")
 
-        soup = self.get_page_content(url)
+        soup = self.get_page_content(url, page_type="listing")
         if not soup:
             return []
 
-        cars = self.extract_car_listings(soup)
-        logger.info(
-            f"Found {len(cars)} car listings, extracting detailed information..."
-        )
+        with PARSE_SECONDS.time(page_type="listing", stage="extract"), span(
+            "parse.listing.extract", "parse"
+        ) as extract_span:
+            cars = self.extract_car_listings(soup)
+            extract_span.set(cards=len(cars))
+        return cars
 
-        # Extract detailed information for each car with intelligent throttling
-        detailed_cars = []
+    def hydrate_cars(self, cars: List[CarListing]) -> List[CarListing]:
+        """Fetch detail pages for the given cars with intelligent throttling."""
         total_cars = len(cars)
+        fetched = []  # (car, RawPage) still to be parsed
+        misses = []  # cars to fetch through the proxy pool
 
+        # Fetch stage: network and throttling only, no parsing on this thread
         for i, car in enumerate(cars):
             logger.info(f"Processing car {i+1}/{total_cars}: {car.title}")
 
-            # Check if we should throttle more aggressively
-            if i > 0 and i % 5 == 0:
-                pause_time = random.uniform(10, 20)
+            # Check if we should throttle more aggressively (proxies have budgets)
+            if self.proxies is None and i > 0 and i % 5 == 0:
+                pause_time = random.uniform(*DETAIL_BATCH_PAUSE_RANGE)
                 logger.info(f"Taking a {pause_time:.1f}s break after processing 5 cars")
-                time.sleep(pause_time)
+                throttle_sleep(pause_time, "batch_pause")
 
-            detailed_car = self.extract_detailed_info(car)
-            detailed_cars.append(detailed_car)
+            with span(f"car {car.car_id}", "other", title=car.title) as car_span:
+                if car.car_id in self.cache:
+                    car_span.set(cached=True)
+                    DETAIL_CACHE_REQUESTS.inc(result="hit")
+                    apply_details(car, self.cache[car.car_id])
+                    continue
+
+                DETAIL_CACHE_REQUESTS.inc(result="miss")
+                if self.proxies is not None:
+                    misses.append(car)
+                    continue
+                logger.info(f"Fetching detailed info for car {car.car_id}")
+                page = self.fetch_raw(car.url, page_type="detail")
+                if page:
+                    fetched.append((car, page))
+
+        # Through proxies the misses are fetched in parallel, one thread per proxy
+        if misses:
+            logger.info(f"Fetching {len(misses)} detail pages through proxies")
+            with span("fetch.detail.proxied", "other", pages=len(misses)):
+                pages = self.fetch_raw_many(
+                    [car.url for car in misses], page_type="detail"
+                )
+            fetched.extend((car, page) for car, page in zip(misses, pages) if page)
+
+        # Parse stage: raw bytes go to the process pool, dicts come back
+        if fetched:
+            with span("parse.detail.batch", "parse", pages=len(fetched)):
+                results = self.parse_pool.map(
+                    parse_detail_content,
+                    [page.content for _, page in fetched],
+                    [page.encoding for _, page in fetched],
+                )
+            for (car, _), parsed in zip(fetched, results):
+                self.store_details(car, parsed)
 
         # Save cache after processing all cars
-        self.save_cache()
+        with span("save_cache", "storage", entries=len(self.cache)):
+            self.save_cache()
 
-        logger.info(
-            f"Completed processing {len(detailed_cars)} cars with detailed information"
-        )
+        logger.info(f"Completed processing {total_cars} cars with detailed information")
         logger.info(f"Total requests made: {self.request_count}")
         logger.info(f"User agent rotations: {self.ua_manager.request_count}")
-        return detailed_cars
+        return cars
+
+    def get_new_cars(self, url: str = None) -> List[CarListing]:
+        """Fetch all current car listings from Turbo.az with detailed information and rate limiting."""
+        cars = self.get_listings(url)
+        if not cars:
+            return []
+
+        logger.info(
+            f"Found {len(cars)} car listings, extracting detailed information..."
+        )
+        return self.hydrate_cars(cars)
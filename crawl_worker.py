@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Crawl worker: pulls listing and detail jobs from the shared work queue.
+
+    python crawl_worker.py seed --pages 5     # queue listing pages for the saved filters
+    python crawl_worker.py work               # lease and process jobs until stopped
+    python crawl_worker.py stats              # job counts by kind and status
+
+Run `work` on as many hosts (or IPs / PROXY_URLS) as needed. Every worker uses
+WORK_QUEUE_URL for jobs and the same results database. Listing jobs record
+prices and queue one detail job per car, deduplicated by car ID. Detail jobs
+fetch and parse the page and save the full car.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from car_scraper import CarListing, TurboAzScraper
+from config import WORK_QUEUE_URL
+from database import DatabaseManager
+from work_queue import Job, WorkQueue, open_queue
+
+logger = logging.getLogger(__name__)
+
+LISTING = "listing"
+DETAIL = "detail"
+
+# Listing pages first: they discover the cars that detail jobs hydrate
+LISTING_PRIORITY = 10
+DETAIL_PRIORITY = 5
+
+# Base delay before a failed job is retried; grows with each attempt
+RETRY_DELAY_SECONDS = 60
+
+
+def page_url(url: str, page: int) -> str:
+    """The same search URL with its page parameter set to `page`."""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "page"]
+    query.insert(0, ("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class CrawlWorker:
+    """Leases jobs in batches and processes them with one scraper."""
+
+    def __init__(
+        self, queue: WorkQueue, db: DatabaseManager, worker_id: str, batch: int
+    ):
+        self.queue = queue
+        self.db = db
+        self.worker_id = worker_id
+        self.batch = batch
+        self.scraper = TurboAzScraper()
+        self.running = True
+
+    def run(self, kinds: List[str], once: bool = False, idle_sleep: float = 5.0):
+        logger.info(f"👷 Worker {self.worker_id} pulling {', '.join(kinds)} jobs")
+        try:
+            while self.running:
+                jobs = self.queue.lease(self.worker_id, kinds, limit=self.batch)
+                if not jobs:
+                    if once:
+                        break
+                    time.sleep(idle_sleep)
+                    continue
+
+                for job in jobs:
+                    if job.kind == LISTING:
+                        self.process_listing(job)
+                details = [job for job in jobs if job.kind == DETAIL]
+                if details:
+                    self.process_details(details)
+        finally:
+            self.scraper.close()
+
+    def retry_later(self, job: Job, error: str):
+        logger.warning(
+            f"{job.kind} job {job.key} failed (attempt {job.attempts}): {error}"
+        )
+        self.queue.fail(job, error, retry_in=RETRY_DELAY_SECONDS * job.attempts)
+
+    def finish(self, job: Job):
+        if not self.queue.ack(job):
+            # The lease ran out and another worker may have redone the job;
+            # results are upserts, so that is harmless
+            logger.warning(f"Lease lost for {job.kind} job {job.key}")
+
+    def process_listing(self, job: Job):
+        try:
+            cars = self.scraper.get_listings(job.payload["url"])
+        except Exception as e:
+            self.retry_later(job, str(e))
+            return
+        if not cars:
+            self.retry_later(job, "no listings")
+            return
+
+        self.db.track_listing_prices(cars)
+        queued = self.queue.enqueue_many(
+            DETAIL,
+            [
+                (car.car_id, {"card": list(car.to_row())}, DETAIL_PRIORITY)
+                for car in cars
+            ],
+        )
+        logger.info(f"📄 {len(cars)} cars on {job.key}, {queued} new detail jobs")
+        self.finish(job)
+
+    def process_details(self, jobs: List[Job]):
+        cars = [CarListing.from_row(job.payload["card"]) for job in jobs]
+        try:
+            # Detail cache, throttling or proxies, and the parse pool all apply
+            self.scraper.hydrate_cars(cars)
+        except Exception as e:
+            for job in jobs:
+                self.retry_later(job, str(e))
+            return
+
+        for job, car in zip(jobs, cars):
+            if car.car_id not in self.scraper.cache:
+                self.retry_later(job, "detail page not fetched")
+                continue
+            self.db.save_car(car, notified=False)
+            self.finish(job)
+
+
+def seed(queue: WorkQueue, db: DatabaseManager, url: str, pages: int) -> int:
+    """Queue listing jobs for the first `pages` result pages of `url`."""
+    url = url or db.build_turbo_az_url()
+    jobs = []
+    for page in range(1, pages + 1):
+        target = page_url(url, page)
+        jobs.append((target, {"url": target}, LISTING_PRIORITY))
+    # Listing pages change, so finished ones are queued again
+    return queue.enqueue_many(LISTING, jobs, refresh=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Turbo.az crawl worker")
+    parser.add_argument("--queue", default=WORK_QUEUE_URL, help="Work queue URL")
+    parser.add_argument("--db", default="app_data.db", help="Results database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Queue listing pages")
+    seed_parser.add_argument("--url", help="Search URL (default: saved filters)")
+    seed_parser.add_argument("--pages", type=int, default=1)
+
+    work_parser = commands.add_parser("work", help="Process jobs")
+    work_parser.add_argument(
+        "--worker-id", default=f"{socket.gethostname()}-{os.getpid()}"
+    )
+    work_parser.add_argument("--kinds", default=f"{LISTING},{DETAIL}")
+    work_parser.add_argument("--batch", type=int, default=5, help="Jobs per lease")
+    work_parser.add_argument(
+        "--once", action="store_true", help="Exit when the queue is empty"
+    )
+
+    commands.add_parser("stats", help="Show job counts")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    options = parse_args(argv)
+    queue = open_queue(options.queue)
+
+    if options.command == "stats":
+        stats = queue.stats()
+        if not stats:
+            print("Queue is empty")
+        for kind, counts in sorted(stats.items()):
+            summary = ", ".join(
+                f"{status}={count}" for status, count in sorted(counts.items())
+            )
+            print(f"{kind:<8} {summary}")
+        return
+
+    db = DatabaseManager(options.db)
+    if options.command == "seed":
+        queued = seed(queue, db, options.url, options.pages)
+        print(f"✅ Queued {queued} listing pages")
+        return
+
+    worker = CrawlWorker(queue, db, options.worker_id, max(1, options.batch))
+
+    def stop(signum, frame):
+        logger.info("Finishing the current batch, then stopping...")
+        worker.running = False
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    worker.run([kind.strip() for kind in options.kinds.split(",")], once=options.once)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
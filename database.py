@@ -0,0 +1,1033 @@
+#!/usr/bin/env python3
+"""
+SQLite storage shared by the web app and the monitor worker process.
+"""
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from car_scraper import CAR_COLUMNS, CarListing, normalize_card, parse_price
+from config import TRACE_RETENTION, TURBO_AZ_BASE_URL
+from metrics import DB_WRITE_SECONDS
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+# Every insert or update of a found_cars row gives it the next revision, so
+# readers can page through changed rows as well as new ones
+NEXT_REVISION_SQL = "(SELECT COALESCE(MAX(revision), 0) + 1 FROM found_cars)"
+
+# SQL generated from the CarListing schema so the columns cannot drift
+_CAR_COLUMN_DEFS = ",\n        ".join(f"{column} TEXT" for column in CAR_COLUMNS[1:])
+CREATE_FOUND_CARS_SQL = f"""
+    CREATE TABLE IF NOT EXISTS found_cars (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        {CAR_COLUMNS[0]} TEXT UNIQUE,
+        {_CAR_COLUMN_DEFS},
+        found_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notified BOOLEAN DEFAULT FALSE,
+        revision INTEGER
+    )
+"""
+SAVE_CAR_SQL = f"""
+    INSERT INTO found_cars ({", ".join(CAR_COLUMNS)}, notified, revision)
+    VALUES ({", ".join("?" for _ in CAR_COLUMNS)}, ?, {NEXT_REVISION_SQL})
+    ON CONFLICT(car_id) DO UPDATE SET
+    {", ".join(f"{column}=excluded.{column}" for column in CAR_COLUMNS[1:])},
+    notified=excluded.notified, revision=excluded.revision
+"""
+CAR_RECORD_COLUMNS = ("id",) + CAR_COLUMNS + ("found_at", "notified")
+CAR_SELECT_COLUMNS = ", ".join(CAR_RECORD_COLUMNS)
+
+# Columns stored as JSON text, and the value an empty one decodes to
+CAR_JSON_COLUMNS = {"all_images": list, "specifications": dict, "deal": dict}
+
+# Filters accepted by car_filter_sql: exact matches, and ranges or flags
+CAR_FILTER_COLUMNS = ("brand", "model", "city", "body_type", "transmission", "market")
+CAR_RANGE_FILTERS = ("since", "until", "year_from", "year_to", "notified")
+
+# Normalized listing_state columns read by analytics.py, from normalize_card()
+MARKET_COLUMNS = {
+    "model": "TEXT",
+    "year": "INTEGER",
+    "mileage_km": "INTEGER",
+    "engine_l": "REAL",
+}
+
+# car_fingerprints columns, in fingerprint.Fingerprint.to_row() order
+FINGERPRINT_COLUMNS = "car_id, title, year, mileage_bucket, engine, city, image_hash"
+
+# Every change to found_cars bumps this counter; API ETags are derived from it
+BUMP_DATA_VERSION_SQL = """
+    INSERT INTO app_settings (key, value) VALUES ('data_version', '1')
+    ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+"""
+BUMP_SETTINGS_VERSION_SQL = BUMP_DATA_VERSION_SQL.replace(
+    "data_version", "settings_version"
+)
+SET_DATA_MODIFIED_SQL = (
+    "INSERT OR REPLACE INTO app_settings (key, value) VALUES ('data_modified', ?)"
+)
+
+
+def car_row_to_dict(row):
+    """Turn a row selected with CAR_SELECT_COLUMNS into a template-ready dict."""
+    car = CarListing.from_row(row[1:-2]).to_dict()
+    car["id"] = row[0]
+    car["found_at"] = row[-2]
+    car["notified"] = row[-1]
+    return car
+
+
+# Search filters and their defaults, stored as filter_<name> in app_settings
+FILTER_DEFAULTS = {
+    "price_from": "17000",
+    "price_to": "22000",
+    "year_from": "",
+    "year_to": "2015",
+    "engine_from": "2300",
+    "engine_to": "",
+    "mileage_to": "150000",
+    "condition": "used",  # new, used, or all
+    "brand": "",
+    "city": "",
+    "currency": "azn",
+    "crashed": "1",  # Include crashed cars
+    "painted": "1",  # Include painted cars
+    "for_spare_parts": "0",  # Exclude spare parts
+    "gear": "3",  # Manual transmission (3)
+    "transmission": "2",  # Front wheel drive (2)
+}
+
+
+def parse_found_at(value: Optional[str], end: bool = False) -> Optional[str]:
+    """Turn an ISO date or datetime into found_at's 'YYYY-MM-DD HH:MM:SS' form.
+
+    A bare date used as the end of a range covers that whole day.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}") from None
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def car_filter_sql(filters: Dict[str, str]) -> Tuple[str, List]:
+    """Turn filter parameters into ' AND ...' conditions on found_cars.
+
+    Raises ValueError for unknown filters or malformed values.
+    """
+    conditions: List[str] = []
+    params: List = []
+    for name, value in filters.items():
+        if name not in CAR_FILTER_COLUMNS and name not in CAR_RANGE_FILTERS:
+            raise ValueError(f"Cannot filter on {name!r}")
+        if value is None or value == "":
+            continue
+        if name in CAR_FILTER_COLUMNS:
+            conditions.append(f"{name} = ?")
+            params.append(value)
+        elif name in ("since", "until"):
+            # found_at is stored as text, which sorts chronologically
+            conditions.append("found_at >= ?" if name == "since" else "found_at < ?")
+            params.append(parse_found_at(value, end=name == "until"))
+        elif name in ("year_from", "year_to"):
+            try:
+                year = int(value)
+            except ValueError:
+                raise ValueError(f"Invalid {name}: {value!r}") from None
+            operator = ">=" if name == "year_from" else "<="
+            conditions.append(f"CAST(year AS INTEGER) {operator} ?")
+            params.append(year)
+        else:
+            if str(value).lower() not in ("0", "1", "true", "false"):
+                raise ValueError(f"Invalid notified: {value!r}")
+            conditions.append("notified = ?")
+            params.append(str(value).lower() in ("1", "true"))
+    return "".join(f" AND {condition}" for condition in conditions), params
+
+
+def car_record(columns, row) -> Dict:
+    """A row of CAR_RECORD_COLUMNS (or a subset) as a JSON-ready dict."""
+    record = dict(zip(columns, row))
+    for column, empty in CAR_JSON_COLUMNS.items():
+        if column in record:
+            record[column] = json.loads(record[column]) if record[column] else empty()
+    if "notified" in record:
+        record["notified"] = bool(record["notified"])
+    return record
+
+
+class DatabaseManager:
+    def __init__(
+        self,
+        db_path="app_data.db",
+        on_log: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.db_path = db_path
+        # Called with every log entry; the web app fans these out over Socket.IO
+        self.on_log = on_log
+        self.init_database()
+
+    def init_database(self):
+        """Initialize the SQLite database."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Create enhanced cars table with all details
+        cursor.execute(CREATE_FOUND_CARS_SQL)
+
+        # Databases created before a CarListing column was added get it here
+        existing = {row[1] for row in cursor.execute("PRAGMA table_info(found_cars)")}
+        for column in CAR_COLUMNS:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE found_cars ADD COLUMN {column} TEXT")
+        if "revision" not in existing:
+            cursor.execute("ALTER TABLE found_cars ADD COLUMN revision INTEGER")
+            cursor.execute("UPDATE found_cars SET revision = id")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_found_cars_revision "
+            "ON found_cars (revision)"
+        )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS app_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                level TEXT,
+                message TEXT
+            )
+        """
+        )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """
+        )
+
+        # Last seen listing-card state per car, fed from listing pages only
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS listing_state (
+                car_id TEXT PRIMARY KEY,
+                card_hash TEXT,
+                price TEXT,
+                price_value INTEGER,
+                currency TEXT,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_changed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                model TEXT,
+                year INTEGER,
+                mileage_km INTEGER,
+                engine_l REAL
+            )
+        """
+        )
+
+        # Older databases get the market columns, filled in for stored cars;
+        # other rows get them the next time their card is seen
+        existing = {
+            row[1] for row in cursor.execute("PRAGMA table_info(listing_state)")
+        }
+        missing = [column for column in MARKET_COLUMNS if column not in existing]
+        for column in missing:
+            cursor.execute(
+                f"ALTER TABLE listing_state ADD COLUMN {column} {MARKET_COLUMNS[column]}"
+            )
+        if missing:
+            cars = cursor.execute(
+                "SELECT car_id, title, year, mileage, engine FROM found_cars"
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE listing_state SET model=?, year=?, mileage_km=?, engine_l=? "
+                "WHERE car_id=?",
+                [(*normalize_card(*car[1:]), car[0]) for car in cars],
+            )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS price_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                car_id TEXT,
+                price TEXT,
+                price_value INTEGER,
+                currency TEXT,
+                recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_price_history_car
+            ON price_history (car_id, recorded_at)
+        """
+        )
+
+        # One row per monitoring cycle; spans are stored as a JSON list
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cycle_traces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TIMESTAMP,
+                duration_ms REAL,
+                new_cars INTEGER,
+                span_count INTEGER,
+                breakdown TEXT,
+                spans TEXT
+            )
+        """
+        )
+
+        # Repost detection fingerprints (see fingerprint.py), one per car seen
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS car_fingerprints (
+                car_id TEXT PRIMARY KEY,
+                title TEXT,
+                year TEXT,
+                mileage_bucket INTEGER,
+                engine TEXT,
+                city TEXT,
+                image_hash TEXT,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+
+        conn.commit()
+        conn.close()
+
+    def save_car(self, car: CarListing, notified=False):
+        """Save a found car to the database with all details."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            # Upsert keeps found_at of an existing row intact
+            with DB_WRITE_SECONDS.time(operation="save_car"):
+                cursor.execute(SAVE_CAR_SQL, car.to_row() + (notified,))
+                self._bump_data_version(cursor)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error saving car: {e}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump_data_version(cursor):
+        """Record a change to found_cars, inside the caller's transaction."""
+        cursor.execute(BUMP_DATA_VERSION_SQL)
+        cursor.execute(SET_DATA_MODIFIED_SQL, (str(time.time()),))
+
+    def _get_settings(self, keys) -> Dict[str, str]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(
+                conn.execute(
+                    f"SELECT key, value FROM app_settings "
+                    f"WHERE key IN ({','.join('?' for _ in keys)})",
+                    keys,
+                ).fetchall()
+            )
+        finally:
+            conn.close()
+
+    def get_data_version(self) -> Tuple[int, Optional[float]]:
+        """Change counter of found_cars and the time of the last change."""
+        rows = self._get_settings(("data_version", "data_modified"))
+        modified = rows.get("data_modified")
+        return int(rows.get("data_version", 0)), float(modified) if modified else None
+
+    def get_page_version(self) -> Tuple[int, int]:
+        """Change counters of found_cars and of the settings, for page caching."""
+        rows = self._get_settings(("data_version", "settings_version"))
+        return int(rows.get("data_version", 0)), int(rows.get("settings_version", 0))
+
+    def track_listing_prices(self, cars):
+        """Record listing-card prices and return the price drops among them."""
+        if not cars:
+            return []
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        drops = []
+        write_start = time.perf_counter()
+
+        try:
+            placeholders = ",".join("?" for _ in cars)
+            cursor.execute(
+                f"""
+                SELECT car_id, card_hash, price, price_value, currency,
+                    model IS NULL
+                FROM listing_state WHERE car_id IN ({placeholders})
+            """,
+                [car.car_id for car in cars],
+            )
+            known = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            new_states = []
+            changed_states = []
+            history_rows = []
+            market_rows = []
+
+            for car in cars:
+                card_hash = car.card_hash or car.compute_card_hash()
+                state = known.get(car.car_id)
+
+                market = normalize_card(car.title, car.year, car.mileage, car.engine)
+
+                # Unchanged card: nothing to write, unless it predates the
+                # market columns
+                if state and state[0] == card_hash:
+                    if state[4]:
+                        market_rows.append((*market, car.car_id))
+                    continue
+
+                price_value, currency = parse_price(car.price)
+
+                if state is None:
+                    new_states.append(
+                        (car.car_id, card_hash, car.price, price_value, currency)
+                        + market
+                    )
+                    history_rows.append((car.car_id, car.price, price_value, currency))
+                    continue
+
+                changed_states.append(
+                    (card_hash, car.price, price_value, currency, car.car_id)
+                )
+                market_rows.append((*market, car.car_id))
+
+                _, old_price, old_value, old_currency, _ = state
+                if price_value is None or price_value == old_value:
+                    continue
+
+                history_rows.append((car.car_id, car.price, price_value, currency))
+
+                if (
+                    old_value is not None
+                    and price_value < old_value
+                    and currency == old_currency
+                ):
+                    drops.append(
+                        {
+                            "car_id": car.car_id,
+                            "title": car.title,
+                            "url": car.url,
+                            "image_url": car.image_url,
+                            "old_price": old_price,
+                            "new_price": car.price,
+                            "old_value": old_value,
+                            "new_value": price_value,
+                            "currency": currency,
+                            "drop": old_value - price_value,
+                        }
+                    )
+
+            cursor.executemany(
+                """
+                INSERT INTO listing_state
+                (car_id, card_hash, price, price_value, currency,
+                 model, year, mileage_km, engine_l)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                new_states,
+            )
+            cursor.executemany(
+                """
+                UPDATE listing_state SET
+                    card_hash=?, price=?, price_value=?, currency=?,
+                    last_changed=CURRENT_TIMESTAMP
+                WHERE car_id=?
+            """,
+                changed_states,
+            )
+            cursor.executemany(
+                "UPDATE listing_state SET model=?, year=?, mileage_km=?, engine_l=? "
+                "WHERE car_id=?",
+                market_rows,
+            )
+            cursor.executemany(
+                """
+                INSERT INTO price_history (car_id, price, price_value, currency)
+                VALUES (?, ?, ?, ?)
+            """,
+                history_rows,
+            )
+            # Keep stored cars in sync with the latest listing price
+            cursor.executemany(
+                f"UPDATE found_cars SET price=?, revision={NEXT_REVISION_SQL} "
+                "WHERE car_id=?",
+                [(row[1], row[4]) for row in changed_states],
+            )
+            if cursor.rowcount > 0:
+                self._bump_data_version(cursor)
+            conn.commit()
+            DB_WRITE_SECONDS.observe(
+                time.perf_counter() - write_start, operation="track_listing_prices"
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Error tracking listing prices: {e}")
+            drops = []
+        finally:
+            conn.close()
+
+        return drops
+
+    def mark_notified(self, car_ids: List[str]):
+        """Flag cars whose Telegram notification went out."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            with DB_WRITE_SECONDS.time(operation="mark_notified"):
+                cursor.executemany(
+                    "UPDATE found_cars SET notified=1 WHERE car_id=?",
+                    [(car_id,) for car_id in car_ids],
+                )
+                if cursor.rowcount:
+                    self._bump_data_version(cursor)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to mark cars as notified: {e}")
+        finally:
+            conn.close()
+
+    def get_changed_cars(
+        self, fields, after_revision: int = 0, limit: int = 5000
+    ) -> Tuple[List[Dict], int]:
+        """Cars inserted or updated after `after_revision`, in revision order,
+        and the revision to continue after."""
+        columns = ("revision",) + tuple(
+            field for field in fields if field != "revision"
+        )
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT {", ".join(columns)} FROM found_cars
+                WHERE revision > ? ORDER BY revision LIMIT ?
+            """,
+                (after_revision, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        last_revision = rows[-1][0] if rows else after_revision
+        cars = []
+        for row in rows:
+            record = car_record(columns, row)
+            if "revision" not in fields:
+                del record["revision"]
+            cars.append(record)
+        return cars, last_revision
+
+    def get_market_rows(self) -> List[Tuple]:
+        """(car_id, model, year, mileage_km, engine_l, price_value, currency) of
+        every priced listing card seen, for analytics.MarketIndex."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(
+                """
+                SELECT car_id, model, year, mileage_km, engine_l, price_value, currency
+                FROM listing_state
+                WHERE model IS NOT NULL AND year IS NOT NULL AND price_value IS NOT NULL
+            """
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def get_fingerprints(self) -> List[Tuple]:
+        """All stored fingerprints, oldest first, as fingerprint.Fingerprint rows."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(
+                f"SELECT {FINGERPRINT_COLUMNS} FROM car_fingerprints ORDER BY rowid"
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def save_fingerprints(self, rows: List[Tuple]):
+        """Store fingerprint rows; a photo hash is added to an existing row."""
+        if not rows:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with DB_WRITE_SECONDS.time(operation="save_fingerprints"):
+                conn.executemany(
+                    f"""
+                    INSERT INTO car_fingerprints ({FINGERPRINT_COLUMNS})
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(car_id) DO UPDATE SET
+                    image_hash = COALESCE(excluded.image_hash, image_hash)
+                """,
+                    rows,
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error saving fingerprints: {e}")
+        finally:
+            conn.close()
+
+    def get_price_history(self, car_id):
+        """Get the recorded price changes for a car, oldest first."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT price, price_value, currency, recorded_at
+            FROM price_history WHERE car_id = ?
+            ORDER BY recorded_at, id
+        """,
+            (car_id,),
+        )
+
+        history = [
+            {
+                "price": row[0],
+                "price_value": row[1],
+                "currency": row[2],
+                "recorded_at": row[3],
+            }
+            for row in cursor.fetchall()
+        ]
+
+        conn.close()
+        return history
+
+    def save_trace(self, trace, retention: int = TRACE_RETENTION):
+        """Persist a finished cycle trace and drop the oldest beyond retention."""
+        data = trace.to_dict()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            with DB_WRITE_SECONDS.time(operation="save_trace"):
+                cursor.execute(
+                    """
+                    INSERT INTO cycle_traces
+                    (started_at, duration_ms, new_cars, span_count, breakdown, spans)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                    (
+                        data["started_at"],
+                        data["duration_ms"],
+                        data["spans"][0]["attrs"].get("new_cars", 0),
+                        len(data["spans"]),
+                        json.dumps(data["breakdown"]),
+                        json.dumps(data["spans"], ensure_ascii=False),
+                    ),
+                )
+                cursor.execute(
+                    """
+                    DELETE FROM cycle_traces WHERE id <= (
+                        SELECT id FROM cycle_traces ORDER BY id DESC LIMIT 1 OFFSET ?
+                    )
+                """,
+                    (retention,),
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error saving cycle trace: {e}")
+        finally:
+            conn.close()
+
+    def get_recent_traces(self, limit=10, with_spans=True):
+        """Get the latest cycle traces, newest first."""
+        spans_column = "spans" if with_spans else "NULL"
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            f"""
+            SELECT id, started_at, duration_ms, new_cars, span_count, breakdown,
+                   {spans_column}
+            FROM cycle_traces ORDER BY id DESC LIMIT ?
+        """,
+            (limit,),
+        )
+
+        traces = [
+            {
+                "id": row[0],
+                "started_at": row[1],
+                "duration_ms": row[2],
+                "new_cars": row[3],
+                "span_count": row[4],
+                "breakdown": json.loads(row[5]),
+                "spans": json.loads(row[6]) if row[6] else [],
+            }
+            for row in cursor.fetchall()
+        ]
+
+        conn.close()
+        return traces
+
+    def get_recent_cars(self, limit=50):
+        """Get recently found cars with all details."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            f"""
+            SELECT {CAR_SELECT_COLUMNS} FROM found_cars
+            ORDER BY found_at DESC
+            LIMIT ?
+        """,
+            (limit,),
+        )
+
+        cars = [car_row_to_dict(row) for row in cursor.fetchall()]
+
+        conn.close()
+        return cars
+
+    def get_car(self, car_id: str, fields=CAR_RECORD_COLUMNS) -> Optional[Dict]:
+        """One stored car by listing ID, or None."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(fields)} FROM found_cars WHERE car_id = ?",
+                (car_id,),
+            ).fetchone()
+        finally:
+            conn.close()
+        return car_record(fields, row) if row else None
+
+    def get_stored_ids(self, car_ids: List[str]) -> Set[str]:
+        """The listing IDs among `car_ids` already in found_cars."""
+        if not car_ids:
+            return set()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT car_id FROM found_cars "
+                f"WHERE car_id IN ({', '.join('?' for _ in car_ids)})",
+                list(car_ids),
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row[0] for row in rows}
+
+    def get_cars(self, car_ids: List[str], fields=CAR_RECORD_COLUMNS) -> List[Dict]:
+        """Stored cars by listing ID, in the order given; unknown IDs are skipped."""
+        if not car_ids:
+            return []
+        columns = ("car_id",) + tuple(field for field in fields if field != "car_id")
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM found_cars "
+                f"WHERE car_id IN ({', '.join('?' for _ in car_ids)})",
+                list(car_ids),
+            ).fetchall()
+        finally:
+            conn.close()
+        records = {row[0]: car_record(columns, row) for row in rows}
+        cars = []
+        for car_id in car_ids:
+            record = records.get(car_id)
+            if record is None:
+                continue
+            if "car_id" not in fields:
+                del record["car_id"]
+            cars.append(record)
+        return cars
+
+    def query_cars(
+        self,
+        fields=CAR_RECORD_COLUMNS,
+        filters: Optional[Dict[str, str]] = None,
+        after_id: Optional[int] = None,
+        ascending: bool = False,
+        limit: int = 50,
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """One page of cars in id order, newest first unless `ascending`.
+
+        Continues after `after_id` (keyset paging, so deep pages cost the same
+        as the first). Returns the cars and the id to continue after, or None
+        on the last page.
+        """
+        where, params = car_filter_sql(filters or {})
+        if after_id is not None:
+            where += " AND id > ?" if ascending else " AND id < ?"
+            params.append(after_id)
+        columns = ("id",) + tuple(field for field in fields if field != "id")
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT {", ".join(columns)} FROM found_cars
+                WHERE 1=1{where}
+                ORDER BY id {"ASC" if ascending else "DESC"}
+                LIMIT ?
+            """,
+                params + [limit + 1],
+            ).fetchall()
+        finally:
+            conn.close()
+
+        next_after = rows[limit - 1][0] if len(rows) > limit else None
+        cars = []
+        for row in rows[:limit]:
+            record = car_record(columns, row)
+            if "id" not in fields:
+                del record["id"]
+            cars.append(record)
+        return cars, next_after
+
+    def get_stats(self):
+        """Get monitoring statistics."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Total cars found
+        cursor.execute("SELECT COUNT(*) FROM found_cars")
+        total_cars = cursor.fetchone()[0]
+
+        # Cars found today
+        today = datetime.now().strftime("%Y-%m-%d")
+        cursor.execute(
+            "SELECT COUNT(*) FROM found_cars WHERE DATE(found_at) = ?", (today,)
+        )
+        today_cars = cursor.fetchone()[0]
+
+        # Cars found this week
+        week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+        cursor.execute(
+            "SELECT COUNT(*) FROM found_cars WHERE DATE(found_at) >= ?", (week_ago,)
+        )
+        week_cars = cursor.fetchone()[0]
+
+        conn.close()
+
+        return {
+            "total_cars": total_cars,
+            "today_cars": today_cars,
+            "week_cars": week_cars,
+        }
+
+    def log_message(self, level, message):
+        """Log a message to the database."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        with DB_WRITE_SECONDS.time(operation="log_message"), span(
+            "log_message", "storage"
+        ):
+            cursor.execute(
+                """
+                INSERT INTO app_logs (level, message)
+                VALUES (?, ?)
+            """,
+                (level, message),
+            )
+            conn.commit()
+        conn.close()
+
+        # Emit to connected clients
+        if self.on_log:
+            self.on_log(
+                {
+                    "level": level,
+                    "message": message,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            )
+
+    def get_setting(self, key: str, default_value: str = None):
+        """Get a setting value from the database."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
+        result = cursor.fetchone()
+        conn.close()
+
+        return result[0] if result else default_value
+
+    def save_setting(self, key: str, value: str):
+        """Save a setting value to the database."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+        cursor.execute(BUMP_SETTINGS_VERSION_SQL)
+        conn.commit()
+        conn.close()
+
+    def get_filter_settings(self):
+        """Get current filter settings with defaults."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            stored = dict(
+                conn.execute(
+                    "SELECT substr(key, 8), value FROM app_settings "
+                    "WHERE key LIKE 'filter\\_%' ESCAPE '\\'"
+                ).fetchall()
+            )
+        finally:
+            conn.close()
+        return {
+            key: stored.get(key, default) for key, default in FILTER_DEFAULTS.items()
+        }
+
+    def save_filter_settings(self, filters):
+        """Save filter settings to database."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)",
+                [(f"filter_{key}", str(value)) for key, value in filters.items()],
+            )
+            conn.execute(BUMP_SETTINGS_VERSION_SQL)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def build_turbo_az_url(self, filters=None):
+        """Build Turbo.az URL from filter settings using the detailed query format."""
+        if filters is None:
+            filters = self.get_filter_settings()
+
+        base_url = f"{TURBO_AZ_BASE_URL}/autos"
+
+        # Build query parameters using the exact format from the provided URL
+        params = []
+
+        # Sorting and basic filters
+        params.append("q%5Bsort%5D=")  # Empty sort
+        params.append(
+            "q%5Bmake%5D%5B%5D="
+        )  # Empty make (brand will be handled separately if needed)
+        params.append("q%5Bmodel%5D%5B%5D=")  # Empty model
+
+        # Condition (new/used)
+        condition = filters.get("condition", "used")
+        if condition == "used":
+            params.append("q%5Bused%5D=1")
+        elif condition == "new":
+            params.append("q%5Bused%5D=0")
+        else:  # all
+            params.append("q%5Bused%5D=1")  # Default to used for 'all'
+
+        params.append("q%5Bregion%5D%5B%5D=")  # Empty region
+
+        # Price range
+        if filters.get("price_from"):
+            params.append(f"q%5Bprice_from%5D={filters['price_from']}")
+        else:
+            params.append("q%5Bprice_from%5D=")
+
+        if filters.get("price_to"):
+            params.append(f"q%5Bprice_to%5D={filters['price_to']}")
+        else:
+            params.append("q%5Bprice_to%5D=")
+
+        # Currency
+        currency = filters.get("currency", "azn")
+        params.append(f"q%5Bcurrency%5D={currency}")
+
+        # Loan and barter (default to 0)
+        params.append("q%5Bloan%5D=0")
+        params.append("q%5Bbarter%5D=0")
+
+        # Category (21 seems to be a specific category from the URL)
+        params.append("q%5Bcategory%5D%5B%5D=")
+        params.append("q%5Bcategory%5D%5B%5D=21")
+
+        # Year range
+        if filters.get("year_from"):
+            params.append(f"q%5Byear_from%5D={filters['year_from']}")
+        else:
+            params.append("q%5Byear_from%5D=")
+
+        if filters.get("year_to"):
+            params.append(f"q%5Byear_to%5D={filters['year_to']}")
+        else:
+            params.append("q%5Byear_to%5D=")
+
+        # Color (empty for now)
+        params.append("q%5Bcolor%5D%5B%5D=")
+
+        # Fuel type (empty for now)
+        params.append("q%5Bfuel_type%5D%5B%5D=")
+
+        # Gear (transmission type)
+        params.append("q%5Bgear%5D%5B%5D=")
+        gear = filters.get("gear", "3")
+        params.append(f"q%5Bgear%5D%5B%5D={gear}")
+
+        # Transmission (drivetrain)
+        params.append("q%5Btransmission%5D%5B%5D=")
+        transmission = filters.get("transmission", "2")
+        params.append(f"q%5Btransmission%5D%5B%5D={transmission}")
+
+        # Engine volume (in cc, so 2300 = 2.3L)
+        if filters.get("engine_from"):
+            # Convert from liters to cc if needed
+            engine_from = filters["engine_from"]
+            if "." in str(engine_from):
+                engine_from = str(int(float(engine_from) * 1000))
+            params.append(f"q%5Bengine_volume_from%5D={engine_from}")
+        else:
+            params.append("q%5Bengine_volume_from%5D=")
+
+        if filters.get("engine_to"):
+            engine_to = filters["engine_to"]
+            if "." in str(engine_to):
+                engine_to = str(int(float(engine_to) * 1000))
+            params.append(f"q%5Bengine_volume_to%5D={engine_to}")
+        else:
+            params.append("q%5Bengine_volume_to%5D=")
+
+        # Power (empty for now)
+        params.append("q%5Bpower_from%5D=")
+        params.append("q%5Bpower_to%5D=")
+
+        # Mileage
+        params.append("q%5Bmileage_from%5D=")
+        if filters.get("mileage_to"):
+            params.append(f"q%5Bmileage_to%5D={filters['mileage_to']}")
+        else:
+            params.append("q%5Bmileage_to%5D=")
+
+        # Shop filters
+        params.append("q%5Bonly_shops%5D=")
+        params.append("q%5Bprior_owners_count%5D%5B%5D=")
+        params.append("q%5Bseats_count%5D%5B%5D=")
+        params.append("q%5Bmarket%5D%5B%5D=")
+
+        # Condition filters (crashed, painted, spare parts)
+        crashed = filters.get("crashed", "1")
+        params.append(f"q%5Bcrashed%5D={crashed}")
+
+        painted = filters.get("painted", "1")
+        params.append(f"q%5Bpainted%5D={painted}")
+
+        for_spare_parts = filters.get("for_spare_parts", "0")
+        params.append(f"q%5Bfor_spare_parts%5D={for_spare_parts}")
+
+        # Availability status
+        params.append("q%5Bavailability_status%5D=")
+
+        return f"{base_url}?{'&'.join(params)}"
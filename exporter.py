@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Streaming export of found cars as CSV, NDJSON, Parquet or Arrow.
+
+Rows are read in id order, `chunk_size` at a time. Each chunk is its own
+short query continuing after the last id (keyset paging), so memory stays flat
+however large the table is, and the monitor's writes are never blocked by a
+long-running read. The export stops at the highest id present when it started.
+
+Parquet and Arrow need pyarrow (pip install pyarrow). Parquet writes one row
+group per chunk; Arrow is the IPC stream format.
+
+    python exporter.py --format csv --out cars.csv --since 2026-01-01 --brand Toyota
+"""
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import sqlite3
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from database import (
+    CAR_FILTER_COLUMNS,
+    CAR_RANGE_FILTERS,
+    CAR_RECORD_COLUMNS,
+    car_filter_sql,
+    car_record,
+)
+
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+BINARY_FORMATS = ("parquet", "arrow")
+
+EXPORT_COLUMNS = CAR_RECORD_COLUMNS
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class ExportError(ValueError):
+    """Bad export parameters, or a format whose dependency is missing."""
+
+
+class CarExport:
+    """One export: a validated query over found_cars and its output format."""
+
+    def __init__(
+        self,
+        db_path: str,
+        fmt: str = "csv",
+        filters: Optional[Dict[str, str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        if fmt not in FORMATS:
+            raise ExportError(
+                f"Unknown format {fmt!r} (choose from {', '.join(FORMATS)})"
+            )
+        if fmt in BINARY_FORMATS and not PYARROW_AVAILABLE:
+            raise ExportError(f"{fmt} export needs pyarrow (pip install pyarrow)")
+        self.db_path = db_path
+        self.format = fmt
+        self.chunk_size = max(1, chunk_size)
+        try:
+            self.where, self.params = car_filter_sql(filters or {})
+        except ValueError as e:
+            raise ExportError(str(e)) from None
+
+    @property
+    def mimetype(self) -> str:
+        return FORMATS[self.format]
+
+    @property
+    def filename(self) -> str:
+        return f"found_cars.{self.format}"
+
+    def chunks(self) -> Iterator[List[Tuple]]:
+        """Yield lists of up to chunk_size rows in EXPORT_COLUMNS order."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM found_cars")
+            last_id = last_id.fetchone()[0]
+            after = 0
+            while True:
+                rows = conn.execute(
+                    f"""
+                    SELECT {", ".join(EXPORT_COLUMNS)} FROM found_cars
+                    WHERE id > ? AND id <= ?{self.where}
+                    ORDER BY id
+                    LIMIT ?
+                """,
+                    [after, last_id, *self.params, self.chunk_size],
+                ).fetchall()
+                if not rows:
+                    return
+                yield rows
+                after = rows[-1][0]
+        finally:
+            conn.close()
+
+    def stream(self) -> Iterator:
+        """The export as an iterator of str (CSV, NDJSON) or bytes chunks."""
+        writer = {
+            "csv": self._csv,
+            "ndjson": self._ndjson,
+            "parquet": self._parquet,
+            "arrow": self._arrow,
+        }[self.format]
+        return writer()
+
+    def _csv(self) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in self.chunks():
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def _ndjson(self) -> Iterator[str]:
+        # JSON columns are embedded as real lists and objects
+        for rows in self.chunks():
+            lines = [
+                json.dumps(car_record(EXPORT_COLUMNS, row), ensure_ascii=False)
+                for row in rows
+            ]
+            yield "\n".join(lines) + "\n"
+
+    def _record_batches(self):
+        import pyarrow as pa
+
+        schema = arrow_schema()
+        for rows in self.chunks():
+            columns = list(zip(*rows))
+            # SQLite hands booleans back as 0/1
+            columns[-1] = [bool(value) for value in columns[-1]]
+            arrays = [
+                pa.array(values, type=field.type)
+                for field, values in zip(schema, columns)
+            ]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def _parquet(self) -> Iterator[bytes]:
+        import pyarrow.parquet as pq
+
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, arrow_schema(), compression="zstd")
+        try:
+            for batch in self._record_batches():
+                writer.write_batch(batch)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _arrow(self) -> Iterator[bytes]:
+        import pyarrow as pa
+
+        sink = _ChunkSink()
+        writer = pa.ipc.new_stream(sink, arrow_schema())
+        try:
+            for batch in self._record_batches():
+                writer.write_batch(batch)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    fields = [pa.field("id", pa.int64())]
+    fields += [pa.field(column, pa.string()) for column in EXPORT_COLUMNS[1:-1]]
+    fields.append(pa.field("notified", pa.bool_()))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export found cars")
+    parser.add_argument("--db", default="app_data.db")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--out", help="Output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--since", help="Found on or after (ISO date or datetime)")
+    parser.add_argument("--until", help="Found before, or on if a bare date")
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("--notified", choices=["0", "1"])
+    for column in CAR_FILTER_COLUMNS:
+        parser.add_argument(f"--{column.replace('_', '-')}", dest=column)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    filters = {
+        name: getattr(options, name)
+        for name in CAR_FILTER_COLUMNS + CAR_RANGE_FILTERS
+        if getattr(options, name) is not None
+    }
+    try:
+        export = CarExport(
+            options.db, options.format, filters=filters, chunk_size=options.chunk_size
+        )
+    except ExportError as e:
+        sys.exit(f"❌ {e}")
+
+    binary = options.format in BINARY_FORMATS
+    if not options.out:
+        out = sys.stdout.buffer if binary else sys.stdout
+    elif binary:
+        out = open(options.out, "wb")
+    else:
+        out = open(options.out, "w", newline="", encoding="utf-8")
+    try:
+        for chunk in export.stream():
+            out.write(chunk)
+    finally:
+        if options.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
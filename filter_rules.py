@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Local post-filter rules for fields turbo.az cannot filter on server-side.
+
+A rule is {"field": ..., "op": ..., "value": ...}. Every rule must pass (AND).
+Rules are compiled once into small closures. RuleSet.rejects() only judges
+fields that are already known, so the monitor calls it twice. The first call
+is on listing cards, before any detail request, and drops cars whose card
+already fails. The second call is after hydration, for the rest. A field that
+stays unknown (missing on the page) never rejects a car.
+
+Fields are CarListing attributes (city, brand, color, owners, market,
+condition, description, ...) or "spec:<label>" for a raw specification.
+
+Operators:
+- == and != compare case-insensitively.
+- in and not_in take a list.
+- contains and not_contains take a keyword or a list of keywords.
+- matches takes a regular expression.
+- <, <=, > and >= compare the first number in the field ("150 000 km" -> 150000).
+
+    [{"field": "owners", "op": "<=", "value": 2},
+     {"field": "color", "op": "not_in", "value": ["Qırmızı", "Sarı"]},
+     {"field": "description", "op": "not_contains", "value": ["qəzalı", "vuruq"]}]
+"""
+import json
+import logging
+import operator
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from car_scraper import CAR_FIELDS, CarListing
+from metrics import RULE_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+# app_settings key holding the web app's rules as JSON
+RULES_SETTING = "post_filter_rules"
+
+# Fields a listing card already has, so rules on them cost no detail request
+CARD_FIELDS = ("title", "price", "year", "mileage", "engine", "city")
+
+# Placeholders the scraper uses for values it could not find
+MISSING = (None, "", "N/A")
+
+NUMERIC_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+TEXT_OPS = ("==", "!=", "in", "not_in", "contains", "not_contains", "matches")
+
+NUMBER_PATTERN = re.compile(r"\d[\d\s]*(?:[.,]\d+)?")
+
+
+class RuleError(ValueError):
+    """A rule that cannot be compiled."""
+
+
+def first_number(text: str) -> Optional[float]:
+    """First number in a field, ignoring thousands spaces: '150 000 km' -> 150000."""
+    match = NUMBER_PATTERN.search(str(text))
+    if not match:
+        return None
+    return float(re.sub(r"\s", "", match.group()).replace(",", "."))
+
+
+def _words(value) -> Tuple[str, ...]:
+    values = value if isinstance(value, (list, tuple)) else [value]
+    words = tuple(str(item).casefold().strip() for item in values if str(item).strip())
+    if not words:
+        raise RuleError("Rule value is empty")
+    return words
+
+
+@dataclass
+class Rule:
+    """One compiled predicate; test() returns None when it cannot tell."""
+
+    field: str
+    op: str
+    value: Any
+    get: Callable[[CarListing], Any] = field(repr=False, compare=False)
+    test: Callable[[Any], Optional[bool]] = field(repr=False, compare=False)
+    # Checked against the card title while the field itself is still unknown
+    card_hint: Optional[Callable[[str], bool]] = field(
+        default=None, repr=False, compare=False
+    )
+
+    @property
+    def on_card(self) -> bool:
+        """Whether the card settles this rule. A card hint is only a guess
+        from the title, so hinted rules are judged again on the detail page."""
+        return self.field in CARD_FIELDS
+
+    @property
+    def checked_on_card(self) -> bool:
+        return self.on_card or self.card_hint is not None
+
+    def describe(self) -> str:
+        return f"{self.field} {self.op} {self.value!r}"
+
+
+def _getter(name: str) -> Callable[[CarListing], Any]:
+    if name.startswith("spec:"):
+        label = name[len("spec:") :]
+        return lambda car: (car.specifications or {}).get(label)
+    if name not in CAR_FIELDS:
+        raise RuleError(f"Unknown field {name!r}")
+    return operator.attrgetter(name)
+
+
+def _text_test(op: str, value) -> Callable[[Any], Optional[bool]]:
+    if op in ("==", "!="):
+        expected = str(value).casefold().strip()
+        want = op == "=="
+        return lambda text: (str(text).casefold().strip() == expected) == want
+    if op in ("in", "not_in"):
+        choices = frozenset(_words(value))
+        want = op == "in"
+        return lambda text: (str(text).casefold().strip() in choices) == want
+    if op in ("contains", "not_contains"):
+        keywords = _words(value)
+        want = op == "contains"
+
+        def contains(text):
+            folded = str(text).casefold()
+            return any(keyword in folded for keyword in keywords) == want
+
+        return contains
+    try:
+        pattern = re.compile(str(value), re.IGNORECASE)
+    except re.error as e:
+        raise RuleError(f"Invalid pattern {value!r}: {e}") from None
+    return lambda text: pattern.search(str(text)) is not None
+
+
+def _numeric_test(op: str, value) -> Callable[[Any], Optional[bool]]:
+    try:
+        bound = float(value)
+    except (TypeError, ValueError):
+        raise RuleError(f"{op} needs a number, got {value!r}") from None
+    compare = NUMERIC_OPS[op]
+
+    def test(text):
+        number = first_number(text)
+        return None if number is None else compare(number, bound)
+
+    return test
+
+
+def _brand_hint(value) -> Callable[[str], bool]:
+    # Card titles read "<brand> <model>", so a brand allow-list can reject a
+    # car before its detail page is fetched
+    prefixes = tuple(f"{brand} " for brand in _words(value))
+    return lambda title: f"{title.casefold().strip()} ".startswith(prefixes)
+
+
+def compile_rule(spec: Dict) -> Rule:
+    """Validate one rule dict and build its evaluator."""
+    if not isinstance(spec, dict):
+        raise RuleError(f"Rule must be an object, got {spec!r}")
+    name = str(spec.get("field", "")).strip()
+    op = str(spec.get("op", "")).strip()
+    value = spec.get("value")
+    if op in NUMERIC_OPS:
+        test = _numeric_test(op, value)
+    elif op in TEXT_OPS:
+        test = _text_test(op, value)
+    else:
+        raise RuleError(f"Unknown operator {op!r}")
+
+    card_hint = None
+    if name == "brand" and op in ("==", "in"):
+        card_hint = _brand_hint(value)
+    return Rule(name, op, value, _getter(name), test, card_hint)
+
+
+class RuleSet:
+    """Compiled rules, card-checkable ones first."""
+
+    def __init__(self, rules: Sequence[Rule] = ()):
+        self.rules = sorted(rules, key=lambda rule: not rule.checked_on_card)
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @property
+    def on_card(self) -> bool:
+        """Whether listing cards alone settle every rule, so a car can be
+        alerted on before its detail page is fetched."""
+        return all(rule.on_card for rule in self.rules)
+
+    def rejects(self, car: CarListing) -> Optional[Rule]:
+        """The first rule the car's known fields fail, or None."""
+        for rule in self.rules:
+            value = rule.get(car)
+            if value in MISSING:
+                if rule.card_hint and car.title not in MISSING:
+                    if not rule.card_hint(car.title):
+                        return rule
+                continue
+            if rule.test(value) is False:
+                return rule
+        return None
+
+    def apply(self, cars: List[CarListing], stage: str) -> List[CarListing]:
+        """Keep the cars no rule rejects; stage ("card" or "detail") labels metrics."""
+        if not self.rules:
+            return cars
+        kept = []
+        for car in cars:
+            rule = self.rejects(car)
+            if rule is None:
+                kept.append(car)
+                continue
+            RULE_REJECTIONS.inc(stage=stage)
+            logger.info(f"Skipping {car.car_id} ({car.title}): {rule.describe()}")
+        return kept
+
+
+def compile_rules(specs: Sequence[Dict]) -> RuleSet:
+    if not isinstance(specs, (list, tuple)):
+        raise RuleError("Rules must be a list")
+    return RuleSet([compile_rule(spec) for spec in specs])
+
+
+def rules_from_filters(filters: Dict[str, str]) -> List[Dict]:
+    """Rules for the brand and city search settings, e.g. "Toyota, BMW"."""
+    specs = []
+    for name in ("brand", "city"):
+        values = [value.strip() for value in (filters.get(name) or "").split(",")]
+        values = [value for value in values if value]
+        if values:
+            specs.append({"field": name, "op": "in", "value": values})
+    return specs
+
+
+def parse_rules(text: Optional[str]) -> List[Dict]:
+    """Rule dicts from their stored JSON form (empty means no rules)."""
+    if not text or not text.strip():
+        return []
+    try:
+        specs = json.loads(text)
+    except ValueError as e:
+        raise RuleError(f"Rules are not valid JSON: {e}") from None
+    compile_rules(specs)
+    return specs
+
+
+def load_rules(
+    text: Optional[str], filters: Optional[Dict[str, str]] = None
+) -> RuleSet:
+    """Compile stored rules plus the brand and city search settings."""
+    return compile_rules(rules_from_filters(filters or {}) + parse_rules(text))
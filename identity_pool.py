@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Pool of client identities for turbo.az requests.
+
+An identity is a user agent, a header profile computed once for it, and its own
+httpx client (HTTP/2 when h2 is installed). A keep-alive connection therefore
+always carries the same fingerprint: rotation moves between identities, reusing
+each one's open connection, instead of rewriting headers on a shared session.
+"""
+import importlib.util
+import logging
+import random
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import (
+    HTTP2_ENABLED,
+    IDENTITY_POOL_SIZE,
+    IDENTITY_ROTATE_RANGE,
+    REQUEST_TIMEOUT,
+)
+
+# httpx is imported when the first client is opened to keep startup fast
+if TYPE_CHECKING:
+    import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+logger = logging.getLogger(__name__)
+
+_http2_warning_logged = False
+
+
+def _warn_no_http2():
+    global _http2_warning_logged
+    if not _http2_warning_logged:
+        _http2_warning_logged = True
+        logger.warning("h2 not installed, using HTTP/1.1 (pip install 'httpx[http2]')")
+
+
+class ClientIdentity:
+    """A user agent, its fixed headers and the connection pool that uses them."""
+
+    def __init__(
+        self,
+        user_agent: str,
+        headers: Dict[str, str],
+        http2: bool,
+        transport=None,
+        proxy: Optional[str] = None,
+    ):
+        self.user_agent = user_agent
+        self.headers = headers
+        self.http2 = http2
+        self.transport = transport
+        self.proxy = proxy
+        self.request_count = 0
+        self._client = None
+        # Threads share identities (image downloads, proxy fetches, detail
+        # hydration), so the client is opened and closed under this lock
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._closing = False
+
+    @property
+    def client(self) -> "httpx.Client":
+        with self._lock:
+            return self._open_client()
+
+    def _open_client(self) -> "httpx.Client":
+        if self._client is None:
+            import httpx
+
+            transport = self.transport
+            if transport is None and self.proxy:
+                # httpx 0.25 (the pinned version) takes a Proxy here, not a str
+                transport = httpx.HTTPTransport(
+                    http2=self.http2, proxy=httpx.Proxy(self.proxy)
+                )
+            self._client = httpx.Client(
+                http2=self.http2,
+                headers=self.headers,
+                timeout=REQUEST_TIMEOUT,
+                follow_redirects=True,
+                transport=transport,
+            )
+        return self._client
+
+    def get(self, url: str) -> "httpx.Response":
+        with self._lock:
+            self.request_count += 1
+            self._in_flight += 1
+            client = self._open_client()
+        try:
+            return client.get(url)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                if self._closing and not self._in_flight:
+                    self._close_client()
+
+    def close(self):
+        """Close the client, or once the requests in flight on it finish."""
+        with self._lock:
+            self._closing = True
+            if not self._in_flight:
+                self._close_client()
+
+    def _close_client(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class IdentityPool:
+    """Hands out identities, staying on one for a random run of requests."""
+
+    def __init__(
+        self,
+        ua_manager,
+        size: int = IDENTITY_POOL_SIZE,
+        rotate_range: Tuple[int, int] = IDENTITY_ROTATE_RANGE,
+        http2: bool = HTTP2_ENABLED,
+        transport=None,
+        proxy: Optional[str] = None,
+    ):
+        if transport is not None:
+            # A custom transport (tests, benchmarks) decides the protocol itself
+            http2 = False
+        elif http2 and not HTTP2_AVAILABLE:
+            _warn_no_http2()
+            http2 = False
+        self.ua_manager = ua_manager
+        self.size = max(1, size)
+        self.rotate_range = rotate_range
+        self.http2 = http2
+        self.transport = transport
+        self.proxy = proxy
+        self.identities: List[ClientIdentity] = []
+        self._index = 0
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+    def _new_identity(self) -> ClientIdentity:
+        # Identities are built on demand, by which time the fake-useragent
+        # dataset has usually finished loading
+        user_agent = self.ua_manager.get_user_agent()
+        headers = self.ua_manager.get_headers_for_ua(user_agent)
+        logger.debug(f"New client identity: {user_agent[:50]}...")
+        return ClientIdentity(
+            user_agent, headers, self.http2, self.transport, self.proxy
+        )
+
+    def next(self) -> ClientIdentity:
+        """Identity for the next request."""
+        with self._lock:
+            if self._remaining <= 0:
+                if len(self.identities) < self.size:
+                    self.identities.append(self._new_identity())
+                    self._index = len(self.identities) - 1
+                elif len(self.identities) > 1:
+                    others = [
+                        i for i in range(len(self.identities)) if i != self._index
+                    ]
+                    self._index = random.choice(others)
+                self._remaining = random.randint(*self.rotate_range)
+            self._remaining -= 1
+            return self.identities[self._index]
+
+    def retire(self, identity: ClientIdentity):
+        """Replace an identity the site has pushed back on (e.g. with a 429)."""
+        with self._lock:
+            for index, current in enumerate(self.identities):
+                if current is identity:
+                    identity.close()
+                    self.identities[index] = self._new_identity()
+                    self._remaining = 0
+                    logger.debug("Retired client identity")
+                    return
+
+    def close(self):
+        with self._lock:
+            for identity in self.identities:
+                identity.close()
+            self.identities = []
+            self._remaining = 0
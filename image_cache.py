@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Local photo cache: resized thumbnails of listing photos for the web UI.
+
+The monitor worker hands every saved car to ImagePipeline. A thread pool
+downloads its photos concurrently from the photo CDN and resizes each one to
+the THUMBNAIL_SIZES presets (WebP, or JPEG if Pillow was built without WebP).
+Files are content-addressed by the SHA-256 of the original photo, so a photo
+shared by several listings (a repost, say) is stored once. Without Pillow the
+original photo is stored and served for every size.
+
+index.db in the cache directory maps photo URLs to their content and records
+the size and last use of every file. When the files outgrow IMAGE_CACHE_MAX_MB
+the least recently used photos are deleted and served from their original URL
+again.
+
+The web app serves /img/<size>/<key>, where key is derived from the photo URL.
+A cached photo is sent with a year-long immutable Cache-Control; one still
+downloading (or evicted) redirects to the original URL.
+
+    python image_cache.py backfill      # cache photos of cars found earlier
+    python image_cache.py stats
+"""
+import argparse
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_MB,
+    IMAGE_CACHE_PHOTOS,
+    IMAGE_CACHE_WORKERS,
+)
+from metrics import IMAGE_CACHE_BYTES, IMAGE_DOWNLOADS
+
+logger = logging.getLogger(__name__)
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# Bounding box of each thumbnail size; aspect ratio is kept
+THUMBNAIL_SIZES = {"card": (480, 360), "large": (1280, 960)}
+# What is stored, for every size, when Pillow is missing
+ORIGINAL = "original"
+
+# Photo statuses
+PENDING = "pending"
+CACHED = "cached"
+FAILED = "failed"
+EVICTED = "evicted"
+
+MIMETYPES = {
+    "webp": "image/webp",
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "bmp": "image/bmp",
+}
+
+# Cached files never change (another photo gets another key), so browsers may
+# keep them for a year
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+# A file's last use is recorded at most this often, so serving rarely writes
+TOUCH_INTERVAL = 3600
+
+# Eviction frees space down to this share of the cap, not just below it
+EVICT_TO = 0.9
+
+
+def photo_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+
+
+def _sniff_extension(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"GIF":
+        return "gif"
+    if data[:2] == b"BM":
+        return "bmp"
+    return "jpg"
+
+
+def make_thumbnails(data: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """{size: (encoded bytes, extension)} for one photo.
+
+    Raises ValueError if Pillow cannot decode it.
+    """
+    if not PILLOW_AVAILABLE:
+        return {ORIGINAL: (data, _sniff_extension(data))}
+    from PIL import Image, ImageOps, features
+
+    webp = features.check("webp")
+    try:
+        with Image.open(io.BytesIO(data)) as photo:
+            photo = ImageOps.exif_transpose(photo).convert("RGB")
+    except Exception as e:
+        raise ValueError(f"Cannot decode photo: {e}") from None
+
+    thumbnails = {}
+    for size, box in THUMBNAIL_SIZES.items():
+        thumbnail = photo.copy()
+        thumbnail.thumbnail(box, Image.LANCZOS)
+        out = io.BytesIO()
+        if webp:
+            thumbnail.save(out, "WEBP", quality=80, method=4)
+        else:
+            thumbnail.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+        thumbnails[size] = (out.getvalue(), "webp" if webp else "jpg")
+    return thumbnails
+
+
+@dataclass
+class CachedPhoto:
+    """A registered photo; path is None until it is on disk."""
+
+    url: str
+    path: Optional[str] = None
+    mimetype: Optional[str] = None
+    etag: Optional[str] = None
+
+
+class ImageCache:
+    """Thumbnail files on disk and their SQLite index."""
+
+    def __init__(
+        self,
+        root: str = IMAGE_CACHE_DIR,
+        max_bytes: float = IMAGE_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        # Registered photos never leave the index, so known keys stay known
+        self._known: set = set()
+        self._evict_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            os.path.join(self.root, "index.db"), timeout=30, isolation_level=None
+        )
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def init_database(self):
+        conn = self._connect()
+        try:
+            # The worker writes while the web app reads
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS photos (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    car_id TEXT,
+                    digest TEXT,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_photos_digest ON photos (digest)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    digest TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (digest, size)
+                )
+            """
+            )
+        finally:
+            conn.close()
+
+    def register(self, car_id: str, urls: Sequence[str]) -> List[str]:
+        """Record a car's photos; returns the ones that still need downloading."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO photos (key, url, car_id, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(photo_key(url), url, car_id, PENDING, now) for url in urls],
+            )
+            keys = [photo_key(url) for url in urls]
+            cached = {
+                key
+                for (key,) in conn.execute(
+                    f"SELECT key FROM photos WHERE status='{CACHED}' "
+                    f"AND key IN ({','.join('?' for _ in keys)})",
+                    keys,
+                )
+            }
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return [url for url in urls if photo_key(url) not in cached]
+
+    def src(self, url: Optional[str], size: str = "card") -> Optional[str]:
+        """URL to show a photo with: the local route once registered."""
+        if not url:
+            return url
+        key = photo_key(url)
+        if key not in self._known:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT 1 FROM photos WHERE key=?", (key,))
+                if row.fetchone() is None:
+                    return url
+            finally:
+                conn.close()
+            self._known.add(key)
+        return f"/img/{size}/{key}"
+
+    def lookup(self, key: str, size: str) -> Optional[CachedPhoto]:
+        """The photo behind /img/<size>/<key>, or None if unknown."""
+        if size not in THUMBNAIL_SIZES:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT url, digest, status FROM photos WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            url, digest, status = row
+            photo = CachedPhoto(url)
+            if status != CACHED:
+                return photo
+
+            # Thumbnails are stored per size; without Pillow only the original
+            stored = conn.execute(
+                "SELECT size, path, last_used FROM files "
+                "WHERE digest=? AND size IN (?, ?)",
+                (digest, size, ORIGINAL),
+            ).fetchall()
+            if not stored:
+                return photo
+            stored_size, path, last_used = min(stored, key=lambda r: r[0] != size)
+            now = time.time()
+            if now - last_used > TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE files SET last_used=? WHERE digest=?", (now, digest)
+                )
+        finally:
+            conn.close()
+
+        photo.path = os.path.join(self.root, path)
+        photo.mimetype = MIMETYPES.get(path.rsplit(".", 1)[-1], "image/jpeg")
+        photo.etag = f"{digest[:32]}-{stored_size}"
+        return photo
+
+    def store(self, url: str, data: bytes) -> int:
+        """Save a downloaded photo's thumbnails; returns bytes written."""
+        digest = hashlib.sha256(data).hexdigest()
+        conn = self._connect()
+        try:
+            have = conn.execute(
+                "SELECT COUNT(*) FROM files WHERE digest=?", (digest,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+        written = 0
+        rows = []
+        if not have:
+            now = time.time()
+            for size, (encoded, extension) in make_thumbnails(data).items():
+                path = os.path.join(digest[:2], f"{digest}-{size}.{extension}")
+                full_path = os.path.join(self.root, path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                # Written under a temporary name so readers never see half a file
+                with open(full_path + ".tmp", "wb") as f:
+                    f.write(encoded)
+                os.replace(full_path + ".tmp", full_path)
+                rows.append((digest, size, path, len(encoded), now))
+                written += len(encoded)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (digest, size, path, bytes, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                f"UPDATE photos SET digest=?, status='{CACHED}', updated_at=? "
+                "WHERE key=?",
+                (digest, time.time(), photo_key(url)),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return written
+
+    def mark_failed(self, url: str):
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"UPDATE photos SET status='{FAILED}', updated_at=? WHERE key=?",
+                (time.time(), photo_key(url)),
+            )
+        finally:
+            conn.close()
+
+    def total_bytes(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM files").fetchone()[
+                0
+            ]
+        finally:
+            conn.close()
+
+    def evict(self) -> int:
+        """Delete least recently used photos until under the cap; bytes freed."""
+        with self._evict_lock:
+            total = self.total_bytes()
+            IMAGE_CACHE_BYTES.set(total)
+            if total <= self.max_bytes:
+                return 0
+
+            target = total - self.max_bytes * EVICT_TO
+            conn = self._connect()
+            try:
+                victims = []
+                freed = 0
+                for digest, digest_bytes in conn.execute(
+                    "SELECT digest, SUM(bytes) FROM files "
+                    "GROUP BY digest ORDER BY MAX(last_used)"
+                ):
+                    victims.append(digest)
+                    freed += digest_bytes
+                    if freed >= target:
+                        break
+
+                paths = []
+                for digest in victims:
+                    paths += [
+                        path
+                        for (path,) in conn.execute(
+                            "SELECT path FROM files WHERE digest=?", (digest,)
+                        )
+                    ]
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "DELETE FROM files WHERE digest=?", [(d,) for d in victims]
+                )
+                conn.executemany(
+                    f"UPDATE photos SET status='{EVICTED}', updated_at=? WHERE digest=?",
+                    [(time.time(), d) for d in victims],
+                )
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+            # Files go after the index no longer points at them
+            for path in paths:
+                try:
+                    os.remove(os.path.join(self.root, path))
+                except OSError:
+                    pass
+            IMAGE_CACHE_BYTES.set(total - freed)
+            logger.info(
+                f"🧹 Evicted {len(victims)} photos ({freed / 1024 / 1024:.1f} MB)"
+            )
+            return freed
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            counts = dict(
+                conn.execute("SELECT status, COUNT(*) FROM photos GROUP BY status")
+            )
+            files, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM files"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {**counts, "files": files, "bytes": size}
+
+
+class ImagePipeline:
+    """Downloads and thumbnails car photos on a thread pool."""
+
+    def __init__(
+        self,
+        cache: ImageCache,
+        fetch: Callable[[str], Optional[bytes]],
+        workers: int = IMAGE_CACHE_WORKERS,
+        photos_per_car: int = IMAGE_CACHE_PHOTOS,
+    ):
+        self.cache = cache
+        self.fetch = fetch
+        self.photos_per_car = photos_per_car
+        self.executor = ThreadPoolExecutor(
+            max(1, workers), thread_name_prefix="image-cache"
+        )
+
+    def submit(self, car_id: str, image_url: Optional[str], all_images=()) -> int:
+        """Register a car's photos now and download them in the background.
+
+        The card photo comes first, then the gallery, up to photos_per_car.
+        Returns how many downloads were queued.
+        """
+        urls = [url for url in (image_url, *(all_images or ())) if url]
+        urls = list(dict.fromkeys(urls))[: self.photos_per_car]
+        if not urls:
+            return 0
+        missing = self.cache.register(car_id, urls)
+        for url in missing:
+            self.executor.submit(self._download, url)
+        return len(missing)
+
+    def _download(self, url: str):
+        try:
+            data = self.fetch(url)
+            if not data:
+                raise ValueError("no data")
+            self.cache.store(url, data)
+        except Exception as e:
+            IMAGE_DOWNLOADS.inc(status="error")
+            logger.debug(f"Could not cache photo {url}: {e}")
+            self.cache.mark_failed(url)
+            return
+        IMAGE_DOWNLOADS.inc(status="ok")
+        self.cache.evict()
+
+    def wait(self):
+        """Finish every queued download (the pool cannot take more afterwards)."""
+        self.executor.shutdown(wait=True)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local photo cache")
+    parser.add_argument("--db", default="app_data.db", help="Results database")
+    parser.add_argument("--dir", default=IMAGE_CACHE_DIR, help="Cache directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill", help="Cache photos of stored cars")
+    commands.add_parser("stats", help="Show photo counts and disk use")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    options = parse_args(argv)
+    if not options.dir:
+        sys.exit("❌ IMAGE_CACHE_DIR is empty, the photo cache is disabled")
+    cache = ImageCache(options.dir)
+
+    if options.command == "stats":
+        for name, value in sorted(cache.stats().items()):
+            print(f"{name:<8} {value}")
+        return
+
+    from car_scraper import TurboAzScraper
+    from database import DatabaseManager
+
+    db = DatabaseManager(options.db)
+    scraper = TurboAzScraper()
+    pipeline = ImagePipeline(cache, scraper.fetch_image)
+    queued = 0
+    after = None
+    try:
+        while True:
+            cars, after = db.query_cars(
+                ("car_id", "image_url", "all_images"), after_id=after, limit=500
+            )
+            for car in cars:
+                queued += pipeline.submit(
+                    car["car_id"], car["image_url"], car["all_images"]
+                )
+            if after is None:
+                break
+        print(f"⏳ Downloading {queued} photos...")
+        pipeline.wait()
+    finally:
+        scraper.close()
+    print(f"✅ {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for turbo.az and the Telegram Bot API, for load and soak testing.
+
+Serves generated listing and detail pages shaped like the real site, with new
+listings arriving at a configurable rate and occasional price drops. Latency,
+429-with-Retry-After and 5xx responses can be injected. Telegram Bot API calls
+(/bot<token>/<method>) get stub JSON replies, and /_stats reports counters.
+
+Usage:
+    python loadtest/fake_turbo_server.py --port 8080 --arrival-rate 60 --rate-429 0.02
+
+    TURBO_AZ_BASE_URL=http://127.0.0.1:8080 TELEGRAM_API_URL=http://127.0.0.1:8080 \\
+    BOT_TOKEN=test CHAT_ID=1 MIN_REQUEST_DELAY=0 REQUEST_JITTER_MIN=0 \\
+    REQUEST_JITTER_MAX=0 DETAIL_BATCH_PAUSE_MIN=0 DETAIL_BATCH_PAUSE_MAX=0 \\
+    MAX_REQUESTS_PER_MINUTE=100000 CHECK_INTERVAL_MINUTES=0.1 python main.py
+"""
+import argparse
+import html
+import json
+import random
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIRST_CAR_ID = 9000000
+CAR_ID_STEP = 7
+
+CAR_MODELS = [
+    ("Toyota", "Camry", "Sedan", "2.5 L / 181 a.g. / Benzin", "Avtomat", "Ön"),
+    (
+        "Toyota",
+        "Land Cruiser",
+        "Offroader / SUV, 5 qapı",
+        "4.0 L / 271 a.g. / Benzin",
+        "Avtomat",
+        "Tam",
+    ),
+    (
+        "Jeep",
+        "Grand Cherokee",
+        "Offroader / SUV, 5 qapı",
+        "5.7 L / 360 a.g. / Benzin",
+        "Avtomat",
+        "Tam",
+    ),
+    (
+        "Hyundai",
+        "Santa Fe",
+        "Offroader / SUV, 5 qapı",
+        "2.4 L / 172 a.g. / Benzin",
+        "Avtomat",
+        "Tam",
+    ),
+    ("Mercedes", "E 350", "Sedan", "3.5 L / 272 a.g. / Benzin", "Avtomat", "Arxa"),
+    (
+        "Kia",
+        "Sorento",
+        "Offroader / SUV, 5 qapı",
+        "2.4 L / 175 a.g. / Benzin",
+        "Avtomat",
+        "Tam",
+    ),
+    (
+        "Lexus",
+        "RX 350",
+        "Offroader / SUV, 5 qapı",
+        "3.5 L / 277 a.g. / Benzin",
+        "Avtomat",
+        "Tam",
+    ),
+    ("BMW", "528", "Sedan", "3.0 L / 258 a.g. / Benzin", "Avtomat", "Arxa"),
+]
+CITIES = ["Bakı", "Sumqayıt", "Gəncə", "Xırdalan", "Lənkəran", "Şəki"]
+COLORS = ["Qara", "Ağ", "Gümüşü", "Boz", "Göy", "Qırmızı"]
+MARKETS = ["Amerika", "Avropa", "Koreya", "Yaponiya", "Rəsmi diler"]
+
+NAV_HTML = (
+    '<header class="header"><div class="header__logo"><a href="/">turbo.az</a></div>'
+    '<ul class="nav">'
+    + "".join(
+        f'<li class="nav-i"><a href="/autos?q%5Bmake%5D%5B%5D={i}">Marka {i}</a></li>'
+        for i in range(120)
+    )
+    + "</ul></header>"
+)
+FOOTER_HTML = (
+    '<footer class="footer">'
+    + "".join(f'<p class="footer-i">Turbo.az © 2006–2024 · {i}</p>' for i in range(40))
+    + "</footer><script>window.dataLayer=[];"
+    + "x=1;" * 2000
+    + "</script>"
+)
+
+
+def spaced(number: int) -> str:
+    """Format 17500 as '17 500' like turbo.az does."""
+    return f"{number:,}".replace(",", " ")
+
+
+class Inventory:
+    """Deterministic, time-driven set of generated listings."""
+
+    def __init__(
+        self,
+        initial: int,
+        arrival_rate: float,
+        drop_share: float,
+        seed: int,
+        repost_share: float = 0.0,
+    ):
+        self.initial = initial
+        self.arrival_rate = arrival_rate  # new listings per minute
+        self.drop_share = drop_share
+        self.seed = seed
+        self.repost_share = repost_share
+        self.started = time.monotonic()
+
+    def count(self) -> int:
+        elapsed = time.monotonic() - self.started
+        return self.initial + int(elapsed * self.arrival_rate / 60)
+
+    def car(self, index: int) -> dict:
+        car_id = FIRST_CAR_ID + index * CAR_ID_STEP
+        # Separate stream, so other listings are the same with or without reposts
+        repost_rng = random.Random(f"repost-{self.seed}-{index}")
+        if index >= self.initial and repost_rng.random() < self.repost_share:
+            source = self.car(repost_rng.randrange(max(0, index - 100), index))
+            # Some sellers also edit the mileage when relisting
+            km = source["km"] + repost_rng.choice([0, 0, 10000, 20000])
+            return {**source, "car_id": car_id, "km": km, "repost_of": source["car_id"]}
+
+        rng = random.Random(self.seed * 1_000_003 + index)
+        brand, model, body, engine, gear, drive = rng.choice(CAR_MODELS)
+        price = rng.randint(34, 44) * 500
+
+        # Some listings get cheaper a while after they appear
+        listed_at = max(0, index - self.initial) * 60 / max(self.arrival_rate, 1e-9)
+        if rng.random() < self.drop_share:
+            drop_after = listed_at + rng.uniform(30, 600)
+            if time.monotonic() - self.started > drop_after:
+                price -= rng.randint(1, 4) * 500
+
+        return {
+            "car_id": car_id,
+            "brand": brand,
+            "model": model,
+            "body": body,
+            "engine": engine,
+            "gear": gear,
+            "drive": drive,
+            "year": rng.randint(2008, 2015),
+            "km": rng.randint(60, 150) * 1000,
+            "price": price,
+            "city": rng.choice(CITIES),
+            "color": rng.choice(COLORS),
+            "owners": rng.randint(1, 4),
+            "market": rng.choice(MARKETS),
+            "photos": rng.randint(6, 16),
+            "slug": f"{brand}-{model}".lower().replace(" ", "-"),
+            "photo_seed": index,
+            "repost_of": None,
+        }
+
+    def index_for(self, car_id: int):
+        offset = car_id - FIRST_CAR_ID
+        if offset < 0 or offset % CAR_ID_STEP:
+            return None
+        index = offset // CAR_ID_STEP
+        return index if index < self.count() else None
+
+
+def render_photo(seed: int, size: int = 16) -> bytes:
+    """A small grey BMP of random pixels; one seed always draws the same photo."""
+    rng = random.Random(seed)
+    pixels = b"".join(bytes([rng.randrange(256)] * 3) for _ in range(size * size))
+    header = struct.pack("<2sIHHI", b"BM", 54 + len(pixels), 0, 0, 54)
+    info = struct.pack(
+        "<IiiHHIIiiII", 40, size, size, 1, 24, 0, len(pixels), 2835, 2835, 0, 0
+    )
+    return header + info + pixels
+
+
+def render_listing_page(inventory: Inventory, page: int, page_size: int) -> str:
+    total = inventory.count()
+    newest = total - 1 - (page - 1) * page_size
+    cards = []
+    for index in range(newest, max(-1, newest - page_size), -1):
+        car = inventory.car(index)
+        cards.append(
+            f"""<div class="products-i">
+<a class="products-i__link" href="/autos/{car['car_id']}-{car['slug']}" target="_blank"></a>
+<div class="products-i__top"><img alt="" loading="lazy" src="/uploads/f460x343/autos/{car['car_id']}/01.jpg"></div>
+<div class="products-i__bottom"><div class="products-i__price products-i__bottom-text"><div class="product-price">{spaced(car['price'])} AZN</div></div>
+<div class="products-i__name products-i__bottom-text">{car['brand']} {car['model']}</div>
+<div class="products-i__attributes products-i__bottom-text"><div class="products-i__attributes-i">{car['year']}</div><div class="products-i__attributes-i">{car['engine'].split(' /')[0]}</div><div class="products-i__attributes-i">{spaced(car['km'])} km</div></div>
+<div class="products-i__datetime">{car['city']}, bugün</div></div></div>"""
+        )
+
+    last_page = max(1, (total + page_size - 1) // page_size)
+    pagination = "".join(
+        f'<a href="/autos?page={p}">{p}</a>'
+        for p in range(max(1, page - 2), min(last_page, page + 2) + 1)
+    )
+    return (
+        '<!DOCTYPE html><html lang="az"><head><meta charset="utf-8">'
+        f"<title>Avtomobillər | Turbo.az</title></head><body>{NAV_HTML}"
+        f'<main class="main"><div class="products">{"".join(cards)}</div>'
+        f'<div class="pagination">{pagination}</div></main>{FOOTER_HTML}</body></html>'
+    )
+
+
+def render_detail_page(car: dict) -> str:
+    props = [
+        ("Şəhər", car["city"]),
+        ("Marka", car["brand"]),
+        ("Model", car["model"]),
+        ("Buraxılış ili", str(car["year"])),
+        ("Ban növü", car["body"]),
+        ("Rəng", car["color"]),
+        ("Mühərrik", car["engine"]),
+        ("Yürüş", f"{spaced(car['km'])} km"),
+        ("Sürətlər qutusu", car["gear"]),
+        ("Ötürücü", car["drive"]),
+        ("Yeni", "Xeyr"),
+        ("Yerlәrin sayı", "5"),
+        ("Sahiblәr", str(car["owners"])),
+        ("Vәziyyәti", "Vuruğu yoxdur, rənglənməyib"),
+        ("Hansi bazar üçün yığılıb", car["market"]),
+    ]
+    prop_html = "".join(
+        f'<div class="product-properties__i"><label class="product-properties__i-name">{k}</label>'
+        f'<span class="product-properties__i-value">{html.escape(v)}</span></div>'
+        for k, v in props
+    )
+    photos = [
+        f"/uploads/full/autos/{car['car_id']}/{i:02d}.jpg"
+        for i in range(1, car["photos"] + 1)
+    ]
+    slider = "".join(
+        f'<div class="slider__i"><img class="slider-img" src="{p}" alt=""></div>'
+        for p in photos
+    )
+    description = " ".join(
+        ["Maşın əla vəziyyətdədir, heç bir problemi yoxdur, servisdə baxılıb."] * 6
+    )
+    return (
+        '<!DOCTYPE html><html lang="az"><head><meta charset="utf-8">'
+        f"<title>{car['brand']} {car['model']}, {car['year']} il | Turbo.az</title>"
+        f'</head><body>{NAV_HTML}<main class="product">'
+        f'<div class="product-photos"><div class="slider">{slider}</div></div>'
+        f'<div class="product-price">{spaced(car["price"])} AZN</div>'
+        f'<div class="product-properties"><div class="product-properties__column">{prop_html}</div></div>'
+        f'<div class="product-description"><p>{description}</p></div>'
+        f"</main>{FOOTER_HTML}</body></html>"
+    )
+
+
+class FakeTurboHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeTurbo/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        self.server.count(f"status_{status}")
+        self.server.count("bytes_sent", len(body))
+
+    def send_json(self, status: int, payload: dict, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_body(status, body, "application/json", headers)
+
+    def inject_faults(self) -> bool:
+        """Apply latency and maybe answer with an error; True if handled."""
+        options = self.server.options
+        rng = self.server.rng
+
+        if options.latency_ms > 0 or options.latency_jitter_ms > 0:
+            delay = rng.gauss(options.latency_ms, options.latency_jitter_ms)
+            time.sleep(max(0.0, delay) / 1000)
+
+        roll = rng.random()
+        if roll < options.rate_429:
+            self.send_body(
+                429,
+                b"Too Many Requests",
+                "text/plain",
+                {"Retry-After": str(options.retry_after)},
+            )
+            return True
+        if roll < options.rate_429 + options.rate_5xx:
+            status = rng.choice([500, 502, 503, 504])
+            self.send_body(status, b"Server Error", "text/plain")
+            return True
+        return False
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+
+        if parts.path == "/_stats":
+            stats = dict(self.server.stats)
+            stats["listings"] = self.server.inventory.count()
+            self.send_json(200, stats)
+            return
+
+        if parts.path.startswith("/bot"):
+            self.handle_telegram(parts.path, parse_qs(parts.query))
+            return
+
+        self.server.count("turbo_requests")
+        if self.inject_faults():
+            return
+
+        if parts.path in ("/autos", "/autos/"):
+            self.server.count("listing_pages")
+            query = parse_qs(parts.query)
+            page = int((query.get("page") or ["1"])[0] or 1)
+            body = render_listing_page(
+                self.server.inventory, max(1, page), self.server.options.page_size
+            )
+            self.send_body(200, body.encode("utf-8"), "text/html; charset=utf-8")
+            return
+
+        match = re.match(r"^/autos/(\d+)", parts.path)
+        if match:
+            index = self.server.inventory.index_for(int(match.group(1)))
+            if index is not None:
+                self.server.count("detail_pages")
+                car = self.server.inventory.car(index)
+                body = render_detail_page(car)
+                self.send_body(200, body.encode("utf-8"), "text/html; charset=utf-8")
+                return
+
+        if parts.path.startswith("/uploads/"):
+            self.server.count("images")
+            # Photos of a known car are drawn from its photo seed, which a
+            # repost shares with the original
+            match = re.search(r"/autos/(\d+)/(\d+)\.", parts.path)
+            index = match and self.server.inventory.index_for(int(match.group(1)))
+            if index is not None:
+                car = self.server.inventory.car(index)
+                photo = render_photo(car["photo_seed"] * 100 + int(match.group(2)))
+                self.send_body(200, photo, "image/bmp")
+                return
+            self.send_body(200, self.server.image_bytes, "image/gif")
+            return
+
+        self.send_body(404, b"Not Found", "text/plain")
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+
+        if not parts.path.startswith("/bot"):
+            self.send_body(404, b"Not Found", "text/plain")
+            return
+
+        if "json" in (self.headers.get("Content-Type") or ""):
+            params = {k: [str(v)] for k, v in json.loads(raw or "{}").items()}
+        else:
+            params = parse_qs(raw)
+        self.handle_telegram(parts.path, params)
+
+    def handle_telegram(self, path: str, params: dict):
+        """Answer a Bot API call the way api.telegram.org would."""
+        options = self.server.options
+        match = re.match(r"^/bot[^/]+/(\w+)$", path)
+        if not match:
+            self.send_json(404, {"ok": False, "error_code": 404})
+            return
+
+        method = match.group(1)
+        self.server.count("telegram_requests")
+        self.server.count(f"telegram_{method}")
+
+        if options.telegram_latency_ms > 0:
+            time.sleep(options.telegram_latency_ms / 1000)
+
+        if self.server.rng.random() < options.telegram_rate_429:
+            self.server.count("telegram_429")
+            self.send_json(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {options.retry_after}",
+                    "parameters": {"retry_after": options.retry_after},
+                },
+                {"Retry-After": str(options.retry_after)},
+            )
+            return
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "username": "fake_turbo_bot"}
+        else:
+            chat_id = (params.get("chat_id") or ["0"])[0]
+            message_id = (params.get("message_id") or [None])[0]
+            if message_id is None:
+                message_id = self.server.next_message_id()
+            result = {
+                "message_id": int(message_id),
+                "chat": {"id": chat_id},
+                "date": int(time.time()),
+            }
+        self.send_json(200, {"ok": True, "result": result})
+
+    do_HEAD = do_GET
+
+
+class FakeTurboServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, FakeTurboHandler)
+        self.options = options
+        self.inventory = Inventory(
+            options.initial_listings,
+            options.arrival_rate,
+            options.price_drop_share,
+            options.seed,
+            options.repost_share,
+        )
+        self.rng = random.Random(options.seed)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.message_id = 0
+        # 1x1 transparent GIF for photos of unknown cars
+        self.image_bytes = (
+            b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04"
+            b"\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+        )
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def next_message_id(self) -> int:
+        with self.lock:
+            self.message_id += 1
+            return self.message_id
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake turbo.az + Telegram server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--initial-listings", type=int, default=200)
+    parser.add_argument(
+        "--arrival-rate", type=float, default=6.0, help="New listings per minute"
+    )
+    parser.add_argument("--page-size", type=int, default=36)
+    parser.add_argument(
+        "--price-drop-share",
+        type=float,
+        default=0.1,
+        help="Share of listings that get cheaper after a while",
+    )
+    parser.add_argument(
+        "--repost-share",
+        type=float,
+        default=0.0,
+        help="Share of new listings that relist a recent car under a new ID",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--telegram-rate-429", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    server = FakeTurboServer((options.host, options.port), options)
+    base_url = f"http://{options.host}:{server.server_address[1]}"
+    print(f"🚗 Fake turbo.az listening on {base_url}")
+    print(f"   TURBO_AZ_BASE_URL={base_url} TELEGRAM_API_URL={base_url}")
+    print(f"   Stats: {base_url}/_stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Measure how detail-page throughput scales with the number of proxies.
+
+Fetches the same detail pages through the first 1, 2, 4... proxies, each with
+the same request budget, and prints pages per second for every pool size.
+Throughput should grow linearly with the pool while the per-proxy budget, not
+latency, is the limit.
+
+Usage:
+    python loadtest/fake_turbo_server.py --port 8080 &
+    python loadtest/stub_proxy.py --ports 9101-9104 --limit-per-minute 240 &
+    python loadtest/proxy_throughput.py --target http://127.0.0.1:8080 \\
+        --proxies http://127.0.0.1:9101,http://127.0.0.1:9102,http://127.0.0.1:9103,http://127.0.0.1:9104 \\
+        --rpm 120 --pages 40
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from car_scraper import TurboAzScraper
+from proxy_pool import ProxyPool
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Proxy pool throughput check")
+    parser.add_argument("--target", default="http://127.0.0.1:8080")
+    parser.add_argument("--proxies", required=True, help="Comma-separated proxy URLs")
+    parser.add_argument("--rpm", type=float, default=120, help="Budget per proxy")
+    parser.add_argument("--pages", type=int, default=40, help="Pages per pool size")
+    parser.add_argument(
+        "--sizes", default="", help="Pool sizes to try (default: 1, 2, 4... up to all)"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    urls = [url.strip() for url in options.proxies.split(",") if url.strip()]
+    if options.sizes:
+        sizes = [int(size) for size in options.sizes.split(",")]
+    else:
+        sizes = [1]
+        while sizes[-1] * 2 <= len(urls):
+            sizes.append(sizes[-1] * 2)
+        if sizes[-1] != len(urls):
+            sizes.append(len(urls))
+
+    scraper = TurboAzScraper()
+    scraper.enforce_rate_limit = lambda: None
+    cars = scraper.get_listings(f"{options.target}/autos")
+    if not cars:
+        sys.exit(f"❌ No listings at {options.target}/autos")
+    # Card links point at TURBO_AZ_BASE_URL; send them to the target instead
+    detail_urls = [
+        options.target + urlsplit(cars[i % len(cars)].url).path
+        for i in range(options.pages)
+    ]
+
+    print(f"{'proxies':>7} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'scaling':>8}")
+    single = None
+    for size in sizes:
+        # burst=1 so every pool size starts from the same steady-state budget
+        scraper.proxies = ProxyPool(
+            urls[:size], scraper.ua_manager, rate_per_minute=options.rpm, burst=1
+        )
+        start = time.perf_counter()
+        pages = scraper.fetch_raw_many(detail_urls, page_type="detail")
+        elapsed = time.perf_counter() - start
+        scraper.proxies.close()
+
+        rate = sum(page is not None for page in pages) / elapsed
+        single = single or rate
+        print(
+            f"{size:>7} {len(pages):>6} {elapsed:>8.1f} {rate:>8.2f} "
+            f"{rate / single:>7.2f}x"
+        )
+
+    scraper.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Local stand-in HTTP forward proxies for exercising the proxy pool.
+
+Starts one plain-HTTP forward proxy per port (no CONNECT, so point the monitor
+at fake_turbo_server.py rather than https://turbo.az). Each proxy plays one
+outbound address: it can enforce its own requests-per-minute tolerance (answering
+429 with Retry-After beyond it, as turbo.az would for a single IP), add latency
+and fail a share of requests with 502. GET /_stats on a proxy port reports that
+proxy's counters.
+
+Usage:
+    python loadtest/stub_proxy.py --ports 9101-9104 --limit-per-minute 120
+    PROXY_URLS=http://127.0.0.1:9101,http://127.0.0.1:9102 python main.py
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Hop-by-hop headers a proxy must not forward
+HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+class StubProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            body = json.dumps(dict(self.server.stats)).encode("utf-8")
+            self.send_body(200, body, "application/json")
+            return
+
+        target = urlsplit(self.path)
+        if target.scheme != "http" or not target.hostname:
+            self.send_body(400, b"Absolute http:// URL required", "text/plain")
+            return
+
+        server = self.server
+        options = server.options
+        server.count("requests")
+
+        if options.latency_ms > 0:
+            time.sleep(options.latency_ms / 1000)
+
+        if server.over_limit():
+            server.count("rate_limited")
+            self.send_body(
+                429,
+                b"Too Many Requests",
+                "text/plain",
+                {"Retry-After": str(options.retry_after)},
+            )
+            return
+
+        if server.rng.random() < options.fail_rate:
+            server.count("failed")
+            self.send_body(502, b"Bad Gateway", "text/plain")
+            return
+
+        self.forward(target)
+
+    def forward(self, target):
+        path = target.path or "/"
+        if target.query:
+            path += f"?{target.query}"
+        headers = {
+            key: value
+            for key, value in self.headers.items()
+            if key.lower() not in HOP_HEADERS
+        }
+        connection = http.client.HTTPConnection(
+            target.hostname, target.port or 80, timeout=30
+        )
+        try:
+            connection.request(self.command, path, headers=headers)
+            upstream = connection.getresponse()
+            body = upstream.read()
+        except OSError as e:
+            self.server.count("upstream_errors")
+            self.send_body(502, f"Upstream error: {e}".encode("utf-8"), "text/plain")
+            return
+        finally:
+            connection.close()
+
+        self.server.count("forwarded")
+        self.send_response(upstream.status)
+        for key, value in upstream.getheaders():
+            if key.lower() not in HOP_HEADERS and key.lower() != "content-length":
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+
+class StubProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options, seed: int):
+        super().__init__(address, StubProxyHandler)
+        self.options = options
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.recent = deque()
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def over_limit(self) -> bool:
+        """Sliding one-minute window, like a per-address limit on the site."""
+        if not self.options.limit_per_minute:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if len(self.recent) >= self.options.limit_per_minute:
+                return True
+            self.recent.append(now)
+            return False
+
+
+def parse_ports(value: str):
+    ports = []
+    for part in value.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            ports.extend(range(int(first), int(last) + 1))
+        elif part:
+            ports.append(int(part))
+    return ports
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stub HTTP forward proxies")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--ports", default="9101-9104", help="Ports, e.g. 9101-9104 or 9101,9105"
+    )
+    parser.add_argument(
+        "--limit-per-minute",
+        type=int,
+        default=0,
+        help="Requests per minute each proxy tolerates before answering 429",
+    )
+    parser.add_argument("--retry-after", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="Share of requests answered 502"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    servers = []
+    for offset, port in enumerate(parse_ports(options.ports)):
+        server = StubProxyServer((options.host, port), options, options.seed + offset)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+    urls = [f"http://{options.host}:{server.server_address[1]}" for server in servers]
+    print(f"🔀 {len(servers)} stub proxies listening")
+    print(f"   PROXY_URLS={','.join(urls)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+        for url, server in zip(urls, servers):
+            print(f"   {url}: {dict(server.stats)}")
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
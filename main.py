@@ -6,7 +6,9 @@ import sys
 from datetime import datetime
 
 from car_monitor import CarMonitor
-from config import CHECK_INTERVAL_MINUTES
+from config import CHECK_INTERVAL_MINUTES, METRICS_PORT, PROFILE_CYCLES, PROFILE_SECONDS
+from metrics import CYCLE_SECONDS, start_metrics_server
+from profiler import PROFILER
 
 # Set up logging
 logging.basicConfig(
@@ -39,7 +41,8 @@ class TurboAzMonitorApp:
                 check_count += 1
                 logger.info(f"--- Check #{check_count} at {datetime.now()} ---")
 
-                new_cars_count = await self.monitor.check_for_new_cars()
+                with CYCLE_SECONDS.time(), PROFILER.cycle():
+                    new_cars_count = await self.monitor.check_for_new_cars()
 
                 if new_cars_count > 0:
                     logger.info(
@@ -78,6 +81,16 @@ def signal_handler(signum, frame):
         app.stop()
 
 
+def profile_signal_handler(signum, frame):
+    """SIGUSR1 profiles the next cycles, SIGUSR2 a fixed time window."""
+    if signum == signal.SIGUSR1:
+        started = PROFILER.request(cycles=PROFILE_CYCLES)
+    else:
+        started = PROFILER.request(seconds=PROFILE_SECONDS)
+    if not started:
+        logger.info("A profile is already running, ignoring signal")
+
+
 async def main():
     """Main entry point."""
     global app
@@ -85,6 +98,13 @@ async def main():
     # Set up signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, profile_signal_handler)
+        signal.signal(signal.SIGUSR2, profile_signal_handler)
+
+    # Optional standalone Prometheus endpoint
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
 
     app = TurboAzMonitorApp()
 
@@ -94,6 +114,7 @@ async def main():
         logger.error(f"Fatal error: {e}")
         sys.exit(1)
     finally:
+        app.monitor.scraper.close()
         logger.info("Turbo.az monitoring bot stopped")
 
 
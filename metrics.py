@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Minimal Prometheus-style metrics registry for the monitor's hot paths.
+
+Metrics are exposed in the Prometheus text format on /metrics in app.py, or on a
+standalone port for main.py (METRICS_PORT).
+"""
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from tracing import span
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class: a named metric with optional labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def snapshot(self) -> Dict:
+        """Picklable copy of the series, for merging across processes."""
+        raise NotImplementedError
+
+    def render(self, extra: Sequence[Dict] = ()) -> List[str]:
+        """Text lines for this metric, summed with snapshots from other processes."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, extra: Sequence[Dict] = ()) -> List[str]:
+        values = self.snapshot()
+        for other in extra:
+            for key, value in other.items():
+                values[key] = values.get(key, 0.0) + value
+        items = sorted(values.items())
+        lines = self.header()
+        for key, value in items:
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(Metric):
+    """Cumulative bucketed observations with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., sum, count]
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the elapsed wall time."""
+        return _Timer(self, labels)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def render(self, extra: Sequence[Dict] = ()) -> List[str]:
+        merged = self.snapshot()
+        for other in extra:
+            for key, series in other.items():
+                if key in merged:
+                    merged[key] = [a + b for a, b in zip(merged[key], series)]
+                else:
+                    merged[key] = list(series)
+        items = sorted(merged.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Picklable copy of every metric, e.g. to send from a worker process."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self, extra: Sequence[Dict[str, Dict]] = ()) -> str:
+        """Prometheus text, with counters and histograms summed across snapshots."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            others = [
+                snapshot[metric.name] for snapshot in extra if metric.name in snapshot
+            ]
+            lines.extend(metric.render(others))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Scraper
+FETCH_SECONDS = REGISTRY.histogram(
+    "turboaz_fetch_seconds", "HTTP fetch latency by response status", ["status"]
+)
+FETCH_BYTES = REGISTRY.counter(
+    "turboaz_fetch_bytes_total", "Bytes downloaded from turbo.az"
+)
+PARSE_SECONDS = REGISTRY.histogram(
+    "turboaz_parse_seconds",
+    "HTML parse time by page type and stage (html to soup, soup to fields)",
+    ["page_type", "stage"],
+)
+THROTTLE_SLEEP_SECONDS = REGISTRY.counter(
+    "turboaz_throttle_sleep_seconds_total",
+    "Time spent sleeping in the rate limiter and backoffs, by reason",
+    ["reason"],
+)
+DETAIL_CACHE_REQUESTS = REGISTRY.counter(
+    "turboaz_detail_cache_requests_total", "Detail cache lookups", ["result"]
+)
+PROXY_REQUESTS = REGISTRY.counter(
+    "turboaz_proxy_requests_total",
+    "Requests sent through each proxy by outcome (ok, rate_limited, error)",
+    ["proxy", "outcome"],
+)
+PROXY_HEALTH = REGISTRY.gauge(
+    "turboaz_proxy_health", "Health score per proxy, 0 while evicted", ["proxy"]
+)
+
+# Storage
+DB_WRITE_SECONDS = REGISTRY.histogram(
+    "turboaz_db_write_seconds", "SQLite write latency by operation", ["operation"]
+)
+
+# Web app
+PAGE_CACHE_REQUESTS = REGISTRY.counter(
+    "turboaz_page_cache_requests_total", "Rendered page cache lookups", ["result"]
+)
+IMAGE_DOWNLOADS = REGISTRY.counter(
+    "turboaz_image_downloads_total", "Photos downloaded for the local cache", ["status"]
+)
+IMAGE_CACHE_BYTES = REGISTRY.gauge(
+    "turboaz_image_cache_bytes", "Disk used by cached photo thumbnails"
+)
+IMAGE_REQUESTS = REGISTRY.counter(
+    "turboaz_image_requests_total",
+    "Photo route requests: served from disk, or redirected to turbo.az",
+    ["result"],
+)
+
+# Telegram
+TELEGRAM_SEND_SECONDS = REGISTRY.histogram(
+    "turboaz_telegram_send_seconds", "Telegram Bot API call latency", ["method"]
+)
+TELEGRAM_RATE_LIMITED = REGISTRY.counter(
+    "turboaz_telegram_rate_limited_total", "Telegram 429 responses", ["method"]
+)
+
+# Monitoring loop
+CYCLE_SECONDS = REGISTRY.histogram(
+    "turboaz_cycle_seconds",
+    "Duration of one check_for_new_cars cycle",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200),
+)
+NEW_CARS = REGISTRY.counter("turboaz_new_cars_total", "New cars found")
+RULE_REJECTIONS = REGISTRY.counter(
+    "turboaz_rule_rejections_total",
+    "New cars dropped by post-filter rules, on the listing card or after details",
+    ["stage"],
+)
+REPOSTS = REGISTRY.counter(
+    "turboaz_reposts_total",
+    "New listings matching an earlier one, by what matched and the action taken",
+    ["match", "action"],
+)
+
+DEAL_SCORES = REGISTRY.counter(
+    "turboaz_deal_scores_total",
+    "New cars scored against comparable listings, by deal label",
+    ["label"],
+)
+MARKET_LISTINGS = REGISTRY.gauge(
+    "turboaz_market_listings", "Priced listings in the deal score index"
+)
+
+
+def throttle_sleep(seconds: float, reason: str):
+    """time.sleep that records the time spent in THROTTLE_SLEEP_SECONDS."""
+    if seconds <= 0:
+        return
+    THROTTLE_SLEEP_SECONDS.inc(seconds, reason=reason)
+    with span(f"sleep.{reason}", "throttle", seconds=round(seconds, 3)):
+        time.sleep(seconds)
+
+
+def start_metrics_server(
+    port: int, host: str = "0.0.0.0"
+) -> Optional["ThreadingHTTPServer"]:
+    """Serve /metrics on a background thread; returns the server or None."""
+    # http.server is only needed by the standalone endpoint, not on import
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.error(f"Could not start metrics server on port {port}: {e}")
+        return None
+
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"📊 Metrics available on http://{host}:{port}/metrics")
+    return server
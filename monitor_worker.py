@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+Monitor worker process for the web app.
+
+The monitoring loop runs in its own process so HTML parsing and blocking
+rate-limit sleeps never compete with Flask/Socket.IO for the GIL, and a crash
+on either side leaves the other running. WorkerSupervisor (used by app.py)
+starts the process, restarts it when it dies, sends commands over a
+multiprocessing queue and relays the worker's events back for Socket.IO.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from analytics import load_market
+from bot import SentAlert
+from car_monitor import CarMonitor
+from car_scraper import CarListing, TurboAzScraper
+from config import (
+    BOOTSTRAP_HYDRATE,
+    CHECK_INTERVAL_MINUTES,
+    IMAGE_CACHE_DIR,
+    WORKER_CPU,
+)
+from database import DatabaseManager
+from filter_rules import RULES_SETTING, RuleError, RuleSet, load_rules
+from fingerprint import Fingerprint, load_index
+from image_cache import ImageCache, ImagePipeline
+from metrics import CYCLE_SECONDS, DEAL_SCORES, NEW_CARS, REGISTRY
+from profiler import PROFILER
+from tracing import span, start_trace
+
+logger = logging.getLogger(__name__)
+
+# Supervisor liveness check interval and restart backoff bounds, in seconds
+POLL_INTERVAL = 1.0
+RESTART_DELAY_MIN = 1.0
+RESTART_DELAY_MAX = 60.0
+
+# How often the worker pushes a metrics snapshot to the web app
+METRICS_PUSH_INTERVAL = 15.0
+
+# Commands that can take minutes (a full scrape); they run on their own
+# thread so other commands and metrics pushes do not queue behind them
+BACKGROUND_COMMANDS = ("test_scraper",)
+
+# Detail cache of the bootstrap hydrator's scraper, and how many cars it
+# fetches between saves
+BOOTSTRAP_CACHE_FILE = "bootstrap_details_cache.json"
+BOOTSTRAP_BATCH_SIZE = 5
+
+
+class BootstrapHydrator(threading.Thread):
+    """Stores the cars a first run marked known, with their detail pages.
+
+    It fetches through a scraper of its own, so monitor cycles never wait on
+    it; with RATE_BUDGET_FILE set both draw on the same request budget.
+    """
+
+    def __init__(self, monitor: "AppCarMonitor", cars: List[CarListing]):
+        super().__init__(name="bootstrap-hydrator", daemon=True)
+        self.monitor = monitor
+        self.cars = cars
+        self.stopping = threading.Event()
+
+    def stop(self):
+        """Stop after the batch in progress."""
+        self.stopping.set()
+
+    def run(self):
+        scraper = TurboAzScraper()
+        # The monitor's detail cache file is its own; stored cars need no cache
+        scraper.cache_file = BOOTSTRAP_CACHE_FILE
+        scraper.cache = scraper.load_cache()
+        stored = 0
+        try:
+            for start in range(0, len(self.cars), BOOTSTRAP_BATCH_SIZE):
+                if self.stopping.is_set():
+                    break
+                batch = self.cars[start : start + BOOTSTRAP_BATCH_SIZE]
+                scraper.hydrate_cars(batch)
+                hydrated = [car for car in batch if car.car_id in scraper.cache]
+                for car in self.monitor.rules.apply(hydrated, "detail"):
+                    if self.monitor.images:
+                        self.monitor.images.submit(
+                            car.car_id, car.image_url, car.all_images
+                        )
+                    self.monitor.db.save_car(car, notified=False)
+                    stored += 1
+                for car in hydrated:
+                    scraper.cache.pop(car.car_id, None)
+                scraper.save_cache()
+        except Exception as e:
+            logger.error(f"Bootstrap hydration failed: {e}")
+        finally:
+            scraper.close()
+        self.monitor.db.log_message(
+            "INFO",
+            f"Bootstrap: stored {stored} of {len(self.cars)} current listings with details",
+        )
+
+
+class AppCarMonitor(CarMonitor):
+    """Car monitor that stores cars in SQLite and reports events through emit()."""
+
+    def __init__(self, db: DatabaseManager, emit: Callable[[str, Dict], None]):
+        super().__init__()
+        self.db = db
+        self.emit = emit
+        self._rules_key = None
+        self.hydrator: Optional[BootstrapHydrator] = None
+        self.fingerprints = load_index(db)
+        # Prices of every card seen, for deal scores (None without numpy)
+        self.market = load_market(db)
+        # Thumbnails of each saved car's photos, downloaded in the background
+        self.images = None
+        if IMAGE_CACHE_DIR:
+            self.images = ImagePipeline(ImageCache(), self.scraper.fetch_image)
+
+    def update_url_from_filters(self):
+        """Update the monitoring URL from current filter settings."""
+        filters = self.db.get_filter_settings()
+        new_url = self.db.build_turbo_az_url(filters)
+        self.set_url(new_url)
+
+        # Update the config as well for backwards compatibility
+        import config
+
+        config.TURBO_AZ_URL = new_url
+
+        logger.info(f"Updated scraper URL: {new_url}")
+
+    def refresh_rules(self, filters: Dict) -> RuleSet:
+        """Post-filter rules from the settings, recompiled only when they change."""
+        key = (
+            self.db.get_setting(RULES_SETTING, ""),
+            filters["brand"],
+            filters["city"],
+        )
+        if key != self._rules_key:
+            try:
+                self.rules = load_rules(key[0], filters)
+                logger.info(f"Loaded {len(self.rules)} post-filter rules")
+            except RuleError as e:
+                self.db.log_message("ERROR", f"Invalid post-filter rules: {e}")
+            self._rules_key = key
+        return self.rules
+
+    def filter_new_cars(self, cars: List[CarListing]) -> List[CarListing]:
+        """Unseen cars, leaving out ones already stored (e.g. by backfill.py)."""
+        new_cars = super().filter_new_cars(cars)
+        if not new_cars:
+            return new_cars
+        stored = self.db.get_stored_ids([car.car_id for car in new_cars])
+        return [car for car in new_cars if car.car_id not in stored]
+
+    def hydrate_in_background(self, cars: List[CarListing]):
+        """With BOOTSTRAP_HYDRATE, store the bootstrapped cars not stored yet
+        that pass the post-filter rules, fetching details on a thread."""
+        if not BOOTSTRAP_HYDRATE:
+            return
+        stored = self.db.get_stored_ids([car.car_id for car in cars])
+        cars = [car for car in cars if car.car_id not in stored]
+        cars = self.rules.apply(cars, "card")
+        if not cars:
+            return
+        self.hydrator = BootstrapHydrator(self, cars)
+        self.hydrator.start()
+
+    def store_fingerprints(self, fingerprints: List[Fingerprint]):
+        """Save fingerprints so reposts are caught across restarts."""
+        self.db.save_fingerprints(
+            [fingerprint.to_row() for fingerprint in fingerprints]
+        )
+
+    async def check_for_new_cars(self) -> int:
+        """Check for new cars using current filter settings and save to database."""
+        self.db.log_message("INFO", "Checking for new cars...")
+
+        try:
+            # Get current cars from website using current filter settings
+            with span("load_filters", "storage"):
+                filters = self.db.get_filter_settings()
+                current_url = self.db.build_turbo_az_url(filters)
+
+            # Make sure monitor knows about the current URL
+            self.set_url(current_url)
+
+            # Listing cards only; details are fetched for new cars below
+            with span("listing", "other", url=current_url):
+                current_cars = self.scraper.get_listings(current_url)
+
+            if not current_cars:
+                self.db.log_message("WARNING", "No cars found on the website")
+                return 0
+
+            # Price changes come straight from the listing page
+            with span("track_prices", "storage", cards=len(current_cars)):
+                price_drops = self.db.track_listing_prices(current_cars)
+            if self.market is not None:
+                with span("market_observe", "other", cards=len(current_cars)):
+                    self.market.observe(current_cars)
+            if price_drops:
+                with span("notify_price_drops", "notify", drops=len(price_drops)):
+                    await self.notify_price_drops(price_drops)
+
+            # First run: the cars listed now are the baseline, not news
+            if not self.known_cars:
+                self.refresh_rules(filters)
+                with span("bootstrap", "storage", cards=len(current_cars)):
+                    self.bootstrap(current_cars)
+                self.db.log_message(
+                    "INFO",
+                    f"First run: {len(current_cars)} current listings marked as known",
+                )
+                return 0
+
+            # Filter out cars we've already seen
+            with span("filter_new_cars", "storage"):
+                new_cars = self.filter_new_cars(current_cars)
+
+            if new_cars:
+                self.refresh_rules(filters)
+                with span("screen_cards", "other", cars=len(new_cars)):
+                    new_cars = await self.screen_cards(new_cars)
+            with span("index_cards", "storage"):
+                self.index_cards(current_cars)
+
+            if new_cars:
+                if self.market is not None:
+                    self.score_deals(new_cars)
+                delivered = await self.deliver(new_cars)
+                if delivered:
+                    return delivered
+            self.db.log_message("INFO", "No new cars found")
+            return 0
+
+        except Exception as e:
+            error_msg = f"Error checking for new cars: {str(e)}"
+            self.db.log_message("ERROR", error_msg)
+            logger.error(error_msg)
+            return 0
+
+    @staticmethod
+    def car_event(car: CarListing) -> Dict:
+        """A car as sent to the dashboard."""
+        return {
+            "car_id": car.car_id,
+            "title": car.title,
+            "price": car.price,
+            "year": car.year,
+            "mileage": car.mileage,
+            "engine": car.engine,
+            "url": car.url,
+            "image_url": car.image_url,
+            "city": car.city,
+            "brand": car.brand,
+            "color": car.color,
+            "transmission": car.transmission,
+            "repost_of": car.repost_of,
+            "deal": car.deal,
+            "found_at": datetime.now().isoformat(),
+        }
+
+    async def announce(
+        self, new_cars: List[CarListing], pending: bool = False
+    ) -> Dict[str, SentAlert]:
+        """Save new cars, show them on the dashboard and send their alerts."""
+        self.db.log_message("INFO", f"Found {len(new_cars)} new cars!")
+        NEW_CARS.inc(len(new_cars))
+
+        # Save cars to database
+        for car in new_cars:
+            # Registered before the save, so pages rendered for the
+            # new data already point at the local photo route
+            if self.images:
+                self.images.submit(car.car_id, car.image_url, car.all_images)
+            with span("save_car", "storage", car_id=car.car_id):
+                self.db.save_car(car, notified=False)
+
+            # Emit real-time update with enhanced data
+            with span("emit_new_car", "notify", car_id=car.car_id):
+                self.emit("new_car", self.car_event(car))
+
+        # Send telegram notifications if configured
+        if not self.bot:
+            self.db.log_message(
+                "INFO", "Telegram not configured - cars saved to database only"
+            )
+            return {}
+        try:
+            with span("telegram", "notify", cars=len(new_cars)):
+                sent = await self.bot.send_alerts(new_cars, pending)
+            self.db.log_message(
+                "INFO",
+                f"Successfully sent {len(sent)}/{len(new_cars)} Telegram notifications",
+            )
+
+            # Mark as notified in database
+            with span("mark_notified", "storage"):
+                self.db.mark_notified(list(sent))
+            return sent
+
+        except Exception as e:
+            self.db.log_message(
+                "ERROR", f"Failed to send Telegram notifications: {str(e)}"
+            )
+            return {}
+
+    async def publish_details(self, cars: List[CarListing], sent: Dict[str, SentAlert]):
+        """Store the details of cars announced from their cards, and update
+        their dashboard entries and Telegram alerts in place."""
+        for car in cars:
+            # The gallery is only known from the detail page
+            if self.images:
+                self.images.submit(car.car_id, car.image_url, car.all_images)
+            with span("save_car", "storage", car_id=car.car_id):
+                self.db.save_car(car, notified=car.car_id in sent)
+            self.emit("car_updated", self.car_event(car))
+
+        if sent:
+            try:
+                with span("telegram_edit", "notify", cars=len(sent)):
+                    updated = await self.bot.update_alerts(cars, sent)
+                self.db.log_message(
+                    "INFO", f"Updated {updated}/{len(sent)} Telegram notifications"
+                )
+            except Exception as e:
+                self.db.log_message(
+                    "ERROR", f"Failed to update Telegram notifications: {str(e)}"
+                )
+
+    def score_deals(self, cars: List[CarListing]):
+        """Set each car's deal score against comparable listings."""
+        with span("score_deals", "other", cars=len(cars)):
+            for car in cars:
+                car.deal = self.market.score(car)
+                if car.deal:
+                    DEAL_SCORES.inc(label=car.deal["label"])
+
+    async def notify_price_drops(self, price_drops):
+        """Announce listing price drops on the dashboard and Telegram."""
+        for drop in price_drops:
+            self.db.log_message(
+                "INFO",
+                f"Price drop for {drop['title']}: {drop['old_price']} → {drop['new_price']}",
+            )
+            self.emit("price_drop", drop)
+
+            if self.bot:
+                await self.bot.send_price_drop(drop)
+
+
+class MonitorWorker:
+    """Runs inside the worker process: executes commands, emits events."""
+
+    def __init__(self, commands, events):
+        self.commands = commands
+        self.events = events
+        self.db = DatabaseManager(on_log=lambda entry: self.emit("new_log", entry))
+        self.monitor: Optional[AppCarMonitor] = None
+        self.is_monitoring = False
+        self.loop = None
+        self.wakeup = None
+        self.stopped = None
+
+    def emit(self, event: str, payload):
+        self.events.put((event, payload))
+
+    def push_metrics(self):
+        self.emit("metrics", REGISTRY.snapshot())
+
+    def push_status(self):
+        self.emit("status", {"is_monitoring": self.is_monitoring})
+
+    def run(self):
+        """Process entry point."""
+        try:
+            asyncio.run(self._main())
+        finally:
+            if self.monitor:
+                if self.monitor.hydrator:
+                    self.monitor.hydrator.stop()
+                if self.monitor.images:
+                    self.monitor.images.close()
+                self.monitor.scraper.close()
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.stopped = asyncio.Event()
+
+        # Commands are read on a thread so replies (status, profiling, scraper
+        # tests) do not wait for a cycle that is blocked in a rate-limit sleep
+        reader = threading.Thread(
+            target=self._read_commands, name="worker-commands", daemon=True
+        )
+        reader.start()
+
+        self.push_status()
+        while not self.stopped.is_set():
+            interval = None
+            if self.is_monitoring:
+                await self._run_cycle()
+                self.push_metrics()
+                interval = CHECK_INTERVAL_MINUTES * 60
+
+            # Sleep until the next check, a command or shutdown
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    async def _run_cycle(self):
+        try:
+            with CYCLE_SECONDS.time(), PROFILER.cycle(), start_trace(
+                "monitor_cycle"
+            ) as trace:
+                new_cars = await self.monitor.check_for_new_cars()
+            trace.root.set(new_cars=new_cars)
+            self.db.save_trace(trace)
+        except Exception as e:
+            self.db.log_message("ERROR", f"Error in monitoring loop: {str(e)}")
+            await asyncio.sleep(60)  # Wait 1 minute before retrying
+
+    def _read_commands(self):
+        parent = multiprocessing.parent_process()
+        last_push = time.monotonic()
+        while not self.stopped.is_set():
+            # Pushed from this thread so metrics stay fresh during long cycles
+            if time.monotonic() - last_push >= METRICS_PUSH_INTERVAL:
+                self.push_metrics()
+                last_push = time.monotonic()
+
+            try:
+                command, args, reply_id = self.commands.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # Exit with the web app instead of lingering as an orphan
+                if parent is not None and not parent.is_alive():
+                    self.loop.call_soon_threadsafe(self._shutdown)
+                    return
+                continue
+
+            if command in BACKGROUND_COMMANDS:
+                # Slow commands get a thread of their own and reply when done
+                threading.Thread(
+                    target=self._run_command,
+                    args=(command, args, reply_id),
+                    name=f"worker-{command}",
+                    daemon=True,
+                ).start()
+                continue
+            self._run_command(command, args, reply_id)
+
+    def _run_command(self, command: str, args: Dict, reply_id):
+        try:
+            result = self._handle(command, args)
+        except Exception as e:
+            logger.error(f"Worker command {command} failed: {e}")
+            result = {"success": False, "message": str(e)}
+        if reply_id is not None:
+            self.emit("reply", {"id": reply_id, "result": result})
+
+    def _handle(self, command: str, args: Dict):
+        if command == "start":
+            self.loop.call_soon_threadsafe(self._start_monitoring)
+            return {"success": True}
+        if command == "stop":
+            self.loop.call_soon_threadsafe(self._stop_monitoring)
+            return {"success": True}
+        if command == "reload_filters":
+            if self.monitor:
+                self.monitor.update_url_from_filters()
+            return {"success": True}
+        if command == "profile":
+            started = PROFILER.request(
+                cycles=args.get("cycles"), seconds=args.get("seconds")
+            )
+            return {"success": started, **PROFILER.status()}
+        if command == "profile_status":
+            return PROFILER.status()
+        if command == "test_scraper":
+            try:
+                result = self._test_scraper()
+            except Exception as e:
+                result = {"success": False, "message": f"Scraper test failed: {e}"}
+            # Nobody waits on a reply; the web app relays this to the dashboard
+            self.emit("scraper_test", {**result, "job_id": args.get("job_id")})
+            return result
+        if command == "shutdown":
+            self.loop.call_soon_threadsafe(self._shutdown)
+            return {"success": True}
+        return {"success": False, "message": f"Unknown command {command}"}
+
+    def _start_monitoring(self):
+        if self.monitor is None:
+            self.monitor = AppCarMonitor(self.db, self.emit)
+        self.is_monitoring = True
+        self.push_status()
+        self.wakeup.set()
+
+    def _stop_monitoring(self):
+        # A cycle in progress finishes; the next one does not start
+        self.is_monitoring = False
+        self.push_status()
+
+    def _shutdown(self):
+        self.is_monitoring = False
+        self.stopped.set()
+        self.wakeup.set()
+
+    def _test_scraper(self) -> Dict:
+        scraper = TurboAzScraper()
+        try:
+            # Use current filter settings for testing
+            filters = self.db.get_filter_settings()
+            current_url = self.db.build_turbo_az_url(filters)
+            cars = scraper.get_new_cars(current_url)
+        finally:
+            scraper.close()
+
+        return {
+            "success": True,
+            "message": f"Found {len(cars)} cars with detailed information",
+            "sample_cars": [
+                {
+                    "title": car.title,
+                    "price": car.price,
+                    "year": car.year,
+                    "city": car.city,
+                    "brand": car.brand,
+                    "color": car.color,
+                    "url": car.url,
+                }
+                for car in cars[:3]  # First 3 cars
+            ],
+        }
+
+
+def worker_main(commands, events):
+    """Target of the worker process."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - monitor-worker - %(name)s - %(levelname)s - %(message)s",
+    )
+    if WORKER_CPU is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {WORKER_CPU})
+        except OSError as e:
+            logger.warning(f"Could not pin worker to CPU {WORKER_CPU}: {e}")
+
+    MonitorWorker(commands, events).run()
+
+
+class WorkerSupervisor:
+    """Owns the worker process from the web app side."""
+
+    def __init__(self, on_event: Callable[[str, Dict], None]):
+        self.on_event = on_event
+        # spawn: the worker starts clean, without Flask, Socket.IO or their threads
+        self.context = multiprocessing.get_context("spawn")
+        self.commands = None
+        self.events = None
+        self.process = None
+        # Requested state (survives worker restarts) and state reported by the worker
+        self.want_monitoring = False
+        self.is_monitoring = False
+        self.restarts = 0
+        self.metrics_snapshot: Dict = {}
+        self._replies: Dict[int, list] = {}
+        self._reply_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._relay = None
+        self._closing = False
+        self._spawned_at = 0.0
+
+    def start(self):
+        """Start the worker process and the event relay, if not running yet."""
+        with self._lock:
+            if self.process is not None and self.process.is_alive():
+                return
+            self._spawn()
+            if self._relay is None:
+                self._relay = threading.Thread(
+                    target=self._relay_events, name="worker-relay", daemon=True
+                )
+                self._relay.start()
+
+    def _spawn(self):
+        self.commands = self.context.Queue()
+        self.events = self.context.Queue()
+        self.process = self.context.Process(
+            target=worker_main,
+            args=(self.commands, self.events),
+            name="turboaz-monitor-worker",
+        )
+        self.process.start()
+        self._spawned_at = time.monotonic()
+        logger.info(f"Started monitor worker (pid {self.process.pid})")
+        if self.want_monitoring:
+            self.commands.put(("start", {}, None))
+
+    def send(self, command: str, **args):
+        """Fire-and-forget command."""
+        self.start()
+        self.commands.put((command, args, None))
+
+    def call(self, command: str, timeout: float = 10.0, **args) -> Dict:
+        """Send a command and wait for the worker's reply."""
+        self.start()
+        reply_id = next(self._reply_ids)
+        waiter = [threading.Event(), None]
+        self._replies[reply_id] = waiter
+        self.commands.put((command, args, reply_id))
+        try:
+            if not waiter[0].wait(timeout):
+                return {"success": False, "message": "Monitor worker did not respond"}
+            return waiter[1]
+        finally:
+            self._replies.pop(reply_id, None)
+
+    def start_monitoring(self):
+        self.want_monitoring = True
+        self.send("start")
+
+    def stop_monitoring(self):
+        self.want_monitoring = False
+        self.send("stop")
+
+    def shutdown(self, timeout: float = 10.0):
+        """Ask the worker to exit, terminating it if it does not."""
+        self._closing = True
+        process = self.process
+        if process is None or not process.is_alive():
+            return
+        self.commands.put(("shutdown", {}, None))
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    def _relay_events(self):
+        delay = RESTART_DELAY_MIN
+        while not self._closing:
+            try:
+                event, payload = self.events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self._closing or self.process.is_alive():
+                    continue
+                # Worker died: restart it, backing off while it keeps crashing
+                if time.monotonic() - self._spawned_at > RESTART_DELAY_MAX:
+                    delay = RESTART_DELAY_MIN
+                exit_code = self.process.exitcode
+                logger.error(
+                    f"Monitor worker exited with code {exit_code}; "
+                    f"restarting in {delay:.0f}s"
+                )
+                self.is_monitoring = False
+                self.on_event(
+                    "new_log",
+                    {
+                        "level": "ERROR",
+                        "message": f"Monitor worker crashed (exit code {exit_code}), restarting",
+                        "timestamp": datetime.now().isoformat(),
+                    },
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, RESTART_DELAY_MAX)
+                with self._lock:
+                    if not self._closing:
+                        self.restarts += 1
+                        self._spawn()
+                continue
+            except (EOFError, OSError):
+                continue
+
+            if event == "reply":
+                waiter = self._replies.get(payload["id"])
+                if waiter:
+                    waiter[1] = payload["result"]
+                    waiter[0].set()
+            elif event == "status":
+                self.is_monitoring = payload["is_monitoring"]
+                self.on_event(event, payload)
+            elif event == "metrics":
+                self.metrics_snapshot = payload
+            else:
+                self.on_event(event, payload)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+In-memory cache of rendered pages for the web app.
+
+Entries belong to a version: the found_cars and settings change counters kept
+in app_settings. While the version is unchanged a page is served straight from
+memory, and the first lookup under a new version drops every older entry, so
+nothing is ever stale and no explicit invalidation is needed.
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from config import PAGE_CACHE_ENTRIES
+from metrics import PAGE_CACHE_REQUESTS
+
+
+class PageCache:
+    """LRU of rendered pages for the current data version."""
+
+    def __init__(self, max_entries: int = PAGE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.version: Optional[Hashable] = None
+        self._pages: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: Hashable, key: Hashable) -> Optional[str]:
+        with self._lock:
+            if version != self.version:
+                self._pages.clear()
+                self.version = version
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+        PAGE_CACHE_REQUESTS.inc(result="hit" if page is not None else "miss")
+        return page
+
+    def put(self, version: Hashable, key: Hashable, page: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            # Rendered from data that has since changed; don't keep it
+            if version != self.version:
+                return
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self.version = None
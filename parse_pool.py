@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Process pool for CPU-bound HTML parsing.
+
+Raw page bytes go to worker processes and compact extracted dicts come back,
+so parsing is not capped at the fetching thread's core. Batches smaller than
+min_batch (or a pool configured with fewer than two workers) are parsed inline,
+where pickling and process start-up would cost more than they save.
+"""
+import logging
+from typing import Callable, Iterable, List
+
+from config import PARSE_CHUNKSIZE, PARSE_POOL_MIN_BATCH, PARSE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """Lazily started ProcessPoolExecutor with an inline fallback."""
+
+    def __init__(
+        self,
+        workers: int = PARSE_WORKERS,
+        chunksize: int = PARSE_CHUNKSIZE,
+        min_batch: int = PARSE_POOL_MIN_BATCH,
+    ):
+        self.workers = workers
+        self.chunksize = max(1, chunksize)
+        self.min_batch = min_batch
+        self._executor = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Imported here: most runs never need a pool
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn: workers must not inherit the caller's threads and locks
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started parse pool with {self.workers} workers")
+        return self._executor
+
+    def map(self, func: Callable, *iterables: Iterable) -> List:
+        """func(*args) for each item, in the pool or inline for small batches."""
+        batches = [list(items) for items in iterables]
+        size = len(batches[0]) if batches else 0
+        if not self.enabled or size < self.min_batch:
+            return list(map(func, *batches))
+
+        try:
+            executor = self._get_executor()
+            return list(executor.map(func, *batches, chunksize=self.chunksize))
+        except Exception as e:
+            # A broken pool (killed worker, spawn failure) must not lose the batch
+            logger.warning(f"Parse pool failed ({e}), parsing {size} pages inline")
+            self.shutdown(wait=False)
+            return list(map(func, *batches))
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+On-demand sampling profiler for live monitoring cycles.
+
+PROFILER.request() arms a profile of the next N monitoring cycles or of a fixed
+time window. While armed, a background thread samples Python stacks with
+sys._current_frames() and writes a collapsed-stack file (flamegraph.pl,
+speedscope) plus a top-functions summary. When nothing is armed the cycle hook
+is a single attribute check.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from config import PROFILE_DIR, PROFILE_INTERVAL_MS
+
+logger = logging.getLogger(__name__)
+
+# Number of functions listed in the summary
+TOP_FUNCTIONS = 30
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler:
+    """Samples the stacks of selected threads at a fixed wall-clock interval."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, thread_ids=None):
+        self.interval = interval
+        # Idents of the threads to sample (None: all of them); cycle work
+        # handed to other threads joins this set while it runs
+        self.thread_ids: Optional[Set[int]] = thread_ids
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._resumed_at = None
+        self._active = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = datetime.now()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+        self.resume()
+
+    def pause(self):
+        """Stop sampling until resume(), e.g. between profiled cycles."""
+        if self._active.is_set():
+            self._active.clear()
+            self.duration += time.perf_counter() - self._resumed_at
+
+    def resume(self):
+        if not self._active.is_set():
+            self._resumed_at = time.perf_counter()
+            self._active.set()
+
+    def stop(self):
+        self.pause()
+        self._stop.set()
+        self._active.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._active.wait()
+            if self._stop.is_set():
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> List[Dict]:
+        """Functions ranked by self samples, with inclusive samples alongside."""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for function in set(frames):
+                total_counts[function] += count
+
+        total = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": function,
+                "self": count,
+                "self_pct": round(count / total * 100, 1),
+                "total": total_counts[function],
+                "total_pct": round(total_counts[function] / total * 100, 1),
+            }
+            for function, count in self_counts.most_common(limit)
+        ]
+
+    def write_reports(self, output_dir: str, label: str) -> Dict[str, str]:
+        """Write <name>.collapsed and <name>.txt; return their paths."""
+        os.makedirs(output_dir, exist_ok=True)
+        name = f"profile-{self.started_at:%Y%m%d-%H%M%S}-{label}"
+        collapsed_path = os.path.join(output_dir, f"{name}.collapsed")
+        summary_path = os.path.join(output_dir, f"{name}.txt")
+
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(f"Profile {name}\n")
+            f.write(
+                f"{self.samples} samples every {self.interval * 1000:.1f} ms "
+                f"over {self.duration:.1f}s (wall clock, waits included)\n\n"
+            )
+            f.write(f"{'self':>8} {'self%':>6} {'total':>8} {'total%':>6}  function\n")
+            for row in self.top_functions():
+                f.write(
+                    f"{row['self']:>8} {row['self_pct']:>6} {row['total']:>8} "
+                    f"{row['total_pct']:>6}  {row['function']}\n"
+                )
+
+        return {"collapsed": collapsed_path, "summary": summary_path}
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class _AttachedThread:
+    def __init__(self, thread_ids: Set[int]):
+        self.thread_ids = thread_ids
+
+    def __enter__(self):
+        self.thread_ids.add(threading.get_ident())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.thread_ids.discard(threading.get_ident())
+        return False
+
+
+class _CycleProfile:
+    def __init__(self, controller: "ProfileController"):
+        self.controller = controller
+
+    def __enter__(self):
+        self.controller._start({threading.get_ident()}, "cycle")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.controller._cycle_finished()
+        return False
+
+
+class ProfileController:
+    """Arms profiles on request and runs them around monitoring cycles."""
+
+    def __init__(self, output_dir: str = PROFILE_DIR):
+        self.output_dir = output_dir
+        self.pending_cycles = 0
+        self.profiler: Optional[SamplingProfiler] = None
+        self.mode = None
+        self.last_reports: Dict[str, str] = {}
+        # Re-entrant: request() may run from a signal handler on the cycle's thread
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def request(self, cycles: int = None, seconds: float = None) -> bool:
+        """Profile the next `cycles` cycles, or all threads for `seconds`."""
+        with self._lock:
+            if self.pending_cycles or self.profiler is not None:
+                return False
+            if seconds:
+                self._start(None, "window")
+                self._timer = threading.Timer(seconds, self._finish)
+                self._timer.daemon = True
+                self._timer.start()
+                logger.info(f"🔬 Profiling all threads for {seconds}s")
+            else:
+                self.pending_cycles = max(1, int(cycles or 1))
+                logger.info(
+                    f"🔬 Profiling armed for the next {self.pending_cycles} cycle(s)"
+                )
+        return True
+
+    def cycle(self):
+        """Context manager wrapped around one monitoring cycle."""
+        if not self.pending_cycles:
+            return _NULL_CONTEXT
+        return _CycleProfile(self)
+
+    def attach(self):
+        """Context manager adding the calling thread to a running cycle
+        profile, for cycle work done on another thread (detail hydration)."""
+        profiler = self.profiler
+        if profiler is None or profiler.thread_ids is None:
+            return _NULL_CONTEXT
+        return _AttachedThread(profiler.thread_ids)
+
+    def status(self) -> Dict:
+        return {
+            "active": self.profiler is not None,
+            "mode": self.mode,
+            "pending_cycles": self.pending_cycles,
+            "samples": self.profiler.samples if self.profiler else 0,
+            "last_reports": self.last_reports,
+        }
+
+    def _start(self, thread_ids, mode: str):
+        if self.profiler is not None:
+            self.profiler.resume()
+            return
+        self.mode = mode
+        self.profiler = SamplingProfiler(thread_ids=thread_ids)
+        self.profiler.start()
+
+    def _cycle_finished(self):
+        with self._lock:
+            self.pending_cycles -= 1
+            if self.pending_cycles > 0:
+                if self.profiler is not None:
+                    self.profiler.pause()
+                return
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            profiler, self.profiler = self.profiler, None
+            mode, self.mode = self.mode, None
+            self.pending_cycles = 0
+        if profiler is None:
+            return
+
+        profiler.stop()
+        try:
+            self.last_reports = profiler.write_reports(self.output_dir, mode)
+        except OSError as e:
+            logger.error(f"Failed to write profile reports: {e}")
+            return
+        logger.info(
+            f"🔬 Profile finished ({profiler.samples} samples): "
+            f"{self.last_reports['summary']}"
+        )
+
+
+PROFILER = ProfileController()
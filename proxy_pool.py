@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Outbound proxy pool with per-proxy request budgets and health scoring.
+
+Each proxy has a token bucket (PROXY_REQUESTS_PER_MINUTE, bursting up to
+PROXY_BURST), its own client identities, and a health score built from latency
+and recent outcomes. acquire() routes a request to the healthiest proxy with
+budget left and only waits when every proxy is out of budget, so aggregate
+throughput grows with the number of proxies. A 429 cools the proxy down
+(Retry-After, or an escalating PROXY_COOLDOWN_SECONDS); PROXY_MAX_FAILURES
+errors in a row evict it for PROXY_EVICTION_SECONDS, after which it returns on
+probation with a reduced score.
+"""
+import logging
+import threading
+import time
+from operator import attrgetter
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from config import (
+    PROXY_BURST,
+    PROXY_COOLDOWN_SECONDS,
+    PROXY_EVICTION_SECONDS,
+    PROXY_MAX_FAILURES,
+    PROXY_REQUESTS_PER_MINUTE,
+)
+from identity_pool import IdentityPool
+from metrics import PROXY_HEALTH, PROXY_REQUESTS, throttle_sleep
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest observation in the latency and success averages
+EWMA_ALPHA = 0.3
+
+# Longest a repeatedly rate-limited proxy is cooled down for
+MAX_COOLDOWN_SECONDS = 900
+
+# Success average a proxy restarts with after an eviction
+PROBATION_SUCCESS = 0.5
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+def proxy_label(url: str) -> str:
+    """host:port without credentials, for logs and metric labels."""
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return url
+    return f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname
+
+
+class Proxy:
+    """One outbound proxy: its budget, health and client identities."""
+
+    def __init__(self, url: str, ua_manager, rate_per_minute: float, burst: int):
+        self.url = url
+        self.label = proxy_label(url)
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.identities = IdentityPool(ua_manager, proxy=url)
+        self.latency: Optional[float] = None  # EWMA, seconds
+        self.success = 1.0  # EWMA of requests that got a usable answer
+        self.failures = 0  # errors in a row
+        self.strikes = 0  # 429s in a row
+        self.cooldown_until = 0.0
+        self.evicted_until = 0.0
+        self.request_count = 0
+
+    @property
+    def score(self) -> float:
+        return self.success / (1.0 + (self.latency or 0.0))
+
+    def blocked_until(self) -> float:
+        return max(self.cooldown_until, self.evicted_until)
+
+    def ready_at(self, now: float) -> float:
+        """Earliest monotonic time this proxy can take a request."""
+        blocked = self.blocked_until()
+        if blocked > now:
+            return blocked
+        return now + self.bucket.wait_time(now)
+
+    def status(self, now: float) -> Dict:
+        return {
+            "proxy": self.label,
+            "score": round(self.score, 3),
+            "latency_ms": (
+                round(self.latency * 1000, 1) if self.latency is not None else None
+            ),
+            "success": round(self.success, 3),
+            "requests": self.request_count,
+            "cooling_down": self.cooldown_until > now,
+            "evicted": self.evicted_until > now,
+        }
+
+
+class ProxyPool:
+    """Routes requests to the healthiest proxy with budget left."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        ua_manager,
+        rate_per_minute: float = PROXY_REQUESTS_PER_MINUTE,
+        burst: int = PROXY_BURST,
+        cooldown: float = PROXY_COOLDOWN_SECONDS,
+        max_failures: int = PROXY_MAX_FAILURES,
+        eviction: float = PROXY_EVICTION_SECONDS,
+    ):
+        if not urls:
+            raise ValueError("ProxyPool needs at least one proxy URL")
+        self.proxies = [Proxy(url, ua_manager, rate_per_minute, burst) for url in urls]
+        self.cooldown = cooldown
+        self.max_failures = max(1, max_failures)
+        self.eviction = eviction
+        self._lock = threading.Lock()
+        for proxy in self.proxies:
+            PROXY_HEALTH.set(proxy.score, proxy=proxy.label)
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def acquire(self) -> Optional[Proxy]:
+        """Take one request's budget from the best available proxy, waiting if needed.
+
+        Returns None when every proxy is evicted.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if all(proxy.evicted_until > now for proxy in self.proxies):
+                    return None
+                for proxy in sorted(
+                    self.proxies, key=attrgetter("score"), reverse=True
+                ):
+                    if proxy.blocked_until() <= now and proxy.bucket.try_take(now):
+                        proxy.request_count += 1
+                        return proxy
+                wait = min(proxy.ready_at(now) for proxy in self.proxies) - now
+
+            if wait > self.cooldown:
+                logger.warning(f"All proxies unavailable, waiting {wait:.0f}s")
+            throttle_sleep(max(wait, 0.01), "proxy_budget")
+
+    def record(
+        self,
+        proxy: Proxy,
+        status: Optional[int],
+        latency: Optional[float] = None,
+        retry_after: Optional[float] = None,
+    ):
+        """Update a proxy's health; status is the HTTP status, None for a failed request."""
+        if status == 429:
+            outcome = "rate_limited"
+        elif status is None or status >= 500:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        PROXY_REQUESTS.inc(proxy=proxy.label, outcome=outcome)
+
+        with self._lock:
+            now = time.monotonic()
+            if latency is not None and outcome != "error":
+                if proxy.latency is None:
+                    proxy.latency = latency
+                else:
+                    proxy.latency += EWMA_ALPHA * (latency - proxy.latency)
+            proxy.success += EWMA_ALPHA * ((outcome == "ok") - proxy.success)
+
+            if outcome == "ok":
+                proxy.failures = 0
+                proxy.strikes = 0
+            elif outcome == "rate_limited":
+                proxy.strikes += 1
+                cooldown = retry_after or min(
+                    self.cooldown * 2 ** (proxy.strikes - 1), MAX_COOLDOWN_SECONDS
+                )
+                proxy.cooldown_until = now + cooldown
+                logger.warning(
+                    f"Proxy {proxy.label} rate limited, cooling down for {cooldown:.0f}s"
+                )
+            else:
+                proxy.failures += 1
+                if proxy.failures >= self.max_failures:
+                    self._evict(proxy, now)
+
+            PROXY_HEALTH.set(
+                0 if proxy.evicted_until > now else proxy.score, proxy=proxy.label
+            )
+
+    def _evict(self, proxy: Proxy, now: float):
+        proxy.evicted_until = now + self.eviction
+        proxy.failures = 0
+        proxy.latency = None
+        proxy.success = PROBATION_SUCCESS
+        proxy.identities.close()
+        logger.warning(
+            f"Proxy {proxy.label} evicted for {self.eviction:.0f}s "
+            f"after {self.max_failures} failures in a row"
+        )
+
+    def status(self) -> List[Dict]:
+        with self._lock:
+            now = time.monotonic()
+            return [proxy.status(now) for proxy in self.proxies]
+
+    def close(self):
+        for proxy in self.proxies:
+            proxy.identities.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Request budget shared by every process on a host that fetches turbo.az.
+
+The scraper's own limiter only counts its own requests, so the web monitor,
+a backfill crawl and crawl workers running side by side would each spend the
+full MAX_REQUESTS_PER_MINUTE from the same address. With RATE_BUDGET_FILE set
+to the same absolute path in each (it is unset by default), they reserve
+request slots in one SQLite table instead. A slot starts at
+least MIN_REQUEST_DELAY after the latest one, and at most
+MAX_REQUESTS_PER_MINUTE slots fall in any 60 seconds. The caller sleeps until
+its slot, and processes take turns in the order they asked.
+"""
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+from config import MAX_REQUESTS_PER_MINUTE, MIN_REQUEST_DELAY, RATE_BUDGET_FILE
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0
+
+
+class RateBudget:
+    """Request slots reserved through a SQLite file."""
+
+    def __init__(
+        self,
+        path: str = RATE_BUDGET_FILE,
+        per_minute: int = MAX_REQUESTS_PER_MINUTE,
+        min_delay: float = MIN_REQUEST_DELAY,
+    ):
+        self.path = path
+        self.per_minute = max(1, per_minute)
+        self.min_delay = min_delay
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Writers queue on the database lock instead of failing straight away
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def init_database(self):
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS request_slots (at REAL NOT NULL)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_request_slots_at ON request_slots (at)"
+            )
+        finally:
+            conn.close()
+
+    def reserve(self) -> Optional[float]:
+        """Claim the next free slot; returns the seconds to wait for it, or
+        None if the file cannot be used (the caller then limits itself)."""
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.warning(f"Rate budget unavailable: {e}")
+            return None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute(
+                "DELETE FROM request_slots WHERE at < ?", (now - WINDOW_SECONDS,)
+            )
+            # Slots still in the window, including ones reserved for later
+            recent = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT at FROM request_slots ORDER BY at DESC LIMIT ?",
+                    (self.per_minute,),
+                )
+            ]
+            start = now
+            if recent:
+                start = max(start, recent[0] + self.min_delay)
+            if len(recent) >= self.per_minute:
+                start = max(start, recent[-1] + WINDOW_SECONDS)
+            conn.execute("INSERT INTO request_slots (at) VALUES (?)", (start,))
+            conn.execute("COMMIT")
+            return start - now
+        except sqlite3.Error as e:
+            logger.warning(f"Rate budget unavailable: {e}")
+            return None
+        finally:
+            conn.close()
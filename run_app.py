@@ -3,7 +3,11 @@
 Launcher script for the Turbo.az Car Monitor Web App
 """
 
+import logging
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     try:
         from app import app, socketio
 
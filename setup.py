@@ -35,7 +35,8 @@ def check_dependencies():
 
     required_packages = [
         "python-telegram-bot",
-        "requests",
+        "httpx",
+        "h2",
         "beautifulsoup4",
         "python-dotenv",
         "lxml",
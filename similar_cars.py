@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+"Similar listings" for the car detail page: nearest neighbours among all
+found cars.
+
+Each car is a feature vector of
+- year, mileage, log price in AZN and engine size, each divided by the
+  difference that counts as one unit of distance (FEATURE_SCALES);
+- brand, body type and transmission as category codes.
+
+The squared distance between one-hot vectors is 2 when the categories differ
+and 0 when they match. So instead of storing one-hot columns, each category
+contributes a fixed weight (CATEGORY_WEIGHTS) when its codes differ. The
+distance is the same, and the matrix stays a few columns wide however many
+brands there are. A missing number adds one unit against every car.
+
+Vectors live in two contiguous NumPy arrays with spare capacity. A top-k
+query computes the distance to every car in one pass, then takes the k
+smallest with argpartition. That is a few milliseconds at 100 000 cars, so
+no approximate index is needed. The index loads found_cars once, then on
+each data version change it reads the rows inserted or updated since, in
+revision order. An updated car (details fetched after a card-only save, a
+new listing price) has its vector replaced in place.
+
+Needs numpy (pip install numpy); without it the panel is left out.
+"""
+import logging
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from analytics import azn_price
+from car_scraper import normalize_card
+
+logger = logging.getLogger(__name__)
+
+# Stored columns a feature vector is built from
+FEATURE_FIELDS = (
+    "car_id",
+    "title",
+    "price",
+    "year",
+    "mileage",
+    "engine",
+    "brand",
+    "body_type",
+    "transmission",
+)
+
+# One unit of distance: 2 years, 25 000 km, about 15% in price, 0.4 L
+FEATURE_SCALES = (2.0, 25000.0, 0.15, 0.4)
+CATEGORIES = ("brand", "body_type", "transmission")
+CATEGORY_WEIGHTS = (4.0, 1.0, 1.0)
+MISSING_DISTANCE = 1.0
+
+# Category code of an unknown value; it never matches a known one
+UNKNOWN = -1
+
+DEFAULT_LIMIT = 6
+PAGE_SIZE = 5000
+INITIAL_CAPACITY = 1024
+
+
+def _category(value) -> str:
+    return " ".join(str(value or "").casefold().split())
+
+
+class SimilarCars:
+    """Feature vectors of found cars, for top-k nearest neighbour queries."""
+
+    def __init__(self):
+        self.car_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        # Allocated on the first add(), so numpy loads with the first query
+        # rather than with the web app
+        self.numbers = None
+        self.codes = None
+        self.vocabularies: List[Dict[str, int]] = [{} for _ in CATEGORIES]
+        self.version: Optional[int] = None
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.car_ids)
+
+    def _numbers(self, car: Dict) -> List[float]:
+        _, year, km, litres = normalize_card(
+            car["title"], car["year"], car["mileage"], car["engine"]
+        )
+        return [
+            math.nan if year is None else year,
+            math.nan if km is None else km,
+            self._log_price(car["price"]),
+            math.nan if litres is None else litres,
+        ]
+
+    @staticmethod
+    def _log_price(price_text: Optional[str]) -> float:
+        price = azn_price(price_text)
+        return math.log(price) if price else math.nan
+
+    def _codes(self, car: Dict) -> List[int]:
+        # Cars saved from their listing card alone have no brand; the title
+        # starts with it
+        brand = car["brand"] or (car["title"] or "").split(" ", 1)[0]
+        codes = []
+        for vocabulary, value in zip(
+            self.vocabularies, (brand, car["body_type"], car["transmission"])
+        ):
+            value = _category(value)
+            if not value or value == "n/a":
+                codes.append(UNKNOWN)
+            else:
+                codes.append(vocabulary.setdefault(value, len(vocabulary)))
+        return codes
+
+    def _grow(self, size: int):
+        import numpy as np
+
+        capacity = INITIAL_CAPACITY if self.numbers is None else len(self.numbers)
+        if self.numbers is not None and size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        numbers = np.full((capacity, len(FEATURE_SCALES)), np.nan)
+        codes = np.full((capacity, len(CATEGORIES)), UNKNOWN, np.int32)
+        if self.numbers is not None:
+            numbers[: len(self.car_ids)] = self.numbers[: len(self.car_ids)]
+            codes[: len(self.car_ids)] = self.codes[: len(self.car_ids)]
+        self.numbers, self.codes = numbers, codes
+
+    def add(self, cars: List[Dict]):
+        """Append cars (FEATURE_FIELDS dicts); ones already indexed are updated."""
+        import numpy as np
+
+        if not cars:
+            return
+        self._grow(len(self.car_ids) + len(cars))
+        rows = []
+        for car in cars:
+            row = self.rows.get(car["car_id"])
+            if row is None:
+                row = len(self.car_ids)
+                self.rows[car["car_id"]] = row
+                self.car_ids.append(car["car_id"])
+            rows.append(row)
+        numbers = np.array([self._numbers(car) for car in cars], dtype=float)
+        self.numbers[rows] = numbers / FEATURE_SCALES
+        self.codes[rows] = [self._codes(car) for car in cars]
+
+    def refresh(self, db):
+        """Catch up with found_cars if its data version moved on."""
+        version, _ = db.get_data_version()
+        with self._lock:
+            if version == self.version:
+                return
+            loaded = 0
+            while True:
+                cars, self.revision = db.get_changed_cars(
+                    FEATURE_FIELDS, after_revision=self.revision, limit=PAGE_SIZE
+                )
+                self.add(cars)
+                loaded += len(cars)
+                if len(cars) < PAGE_SIZE:
+                    break
+            self.version = version
+        if loaded:
+            logger.debug(
+                f"Similar cars index: {loaded} added or updated, {len(self)} total"
+            )
+
+    def similar(
+        self, car_id: str, limit: int = DEFAULT_LIMIT
+    ) -> List[Tuple[str, float]]:
+        """(car_id, distance) of the `limit` cars nearest to `car_id`, nearest
+        first; empty if the car is not indexed."""
+        import numpy as np
+
+        with self._lock:
+            row = self.rows.get(car_id)
+            size = len(self.car_ids)
+            if row is None or size < 2:
+                return []
+            difference = self.numbers[:size] - self.numbers[row]
+            difference = np.where(np.isnan(difference), MISSING_DISTANCE, difference)
+            distance = np.einsum("ij,ij->i", difference, difference)
+            distance += (self.codes[:size] != self.codes[row]) @ np.array(
+                CATEGORY_WEIGHTS
+            )
+            distance[row] = np.inf
+
+            limit = min(limit, size - 1)
+            nearest = np.argpartition(distance, limit - 1)[:limit]
+            nearest = nearest[np.argsort(distance[nearest])]
+            return [(self.car_ids[i], float(distance[i])) for i in nearest]
@@ -0,0 +1,20 @@
+import importlib.util
+import os
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures")
+
+
+def load_script(path):
+    """Import a script from the repo's non-package directories (loadtest/, ...)."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_fixture(name):
+    """Raw bytes of a saved turbo.az page from benchmarks/fixtures."""
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
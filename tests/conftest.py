@@ -0,0 +1,100 @@
+"""Shared fixtures. Every test runs in its own temporary directory, so files
+the code writes next to itself (known_cars.txt, caches) never leak out."""
+
+import threading
+
+import pytest
+
+from car_scraper import CarListing, TurboAzScraper
+from database import DatabaseManager
+from tests import load_script
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "app_data.db"))
+
+
+@pytest.fixture
+def make_car():
+    """Build a CarListing with listing-card defaults; keyword arguments win."""
+
+    def make(car_id="100", **fields):
+        card = {
+            "title": "Toyota Camry",
+            "price": "20 000 AZN",
+            "year": "2012",
+            "mileage": "137 000 km",
+            "engine": "2.5 L",
+            "url": f"https://turbo.az/autos/{car_id}",
+            "image_url": f"https://turbo.azstatic.com/{car_id}.jpg",
+        }
+        card.update(fields)
+        return CarListing(car_id=car_id, **card)
+
+    return make
+
+
+@pytest.fixture
+def scraper():
+    """A TurboAzScraper without the politeness delays between requests."""
+    scraper = TurboAzScraper()
+    scraper.enforce_rate_limit = lambda: None
+    yield scraper
+    scraper.close()
+
+
+@pytest.fixture
+def monitor(monkeypatch, scraper):
+    """A command-line CarMonitor without Telegram or request delays."""
+    import car_monitor
+
+    monkeypatch.setattr(car_monitor, "BOT_TOKEN", None)
+    monitor = car_monitor.CarMonitor()
+    monitor.scraper.close()
+    monitor.scraper = scraper
+    return monitor
+
+
+@pytest.fixture
+def fake_turbo():
+    """Start loadtest/fake_turbo_server.py on a free port; call with its CLI
+    arguments, get the running server (base URL in server.base_url)."""
+    module = load_script("loadtest/fake_turbo_server.py")
+    servers = []
+
+    def start(*argv):
+        options = module.parse_args(["--port", "0", *argv])
+        server = module.FakeTurboServer(("127.0.0.1", 0), options)
+        server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def web(db, monkeypatch):
+    """The Flask app module, imported lazily (it opens app_data.db in the
+    working directory) and pointed at the test database."""
+    import app as web
+    from page_cache import PageCache
+
+    monkeypatch.setattr(web, "db", db)
+    monkeypatch.setattr(web, "page_cache", PageCache())
+    return web
+
+
+@pytest.fixture
+def client(web):
+    return web.app.test_client()
@@ -0,0 +1,205 @@
+import asyncio
+
+import httpx
+import pytest
+
+import bot as bot_module
+import car_monitor
+import car_scraper
+import monitor_worker
+from bot import SentAlert, TurboAzBot
+from filter_rules import load_rules
+
+
+@pytest.fixture(autouse=True)
+def no_telegram_pauses(monkeypatch):
+    async def sleep(seconds):
+        pass
+
+    monkeypatch.setattr(bot_module.asyncio, "sleep", sleep)
+
+
+@pytest.fixture
+def server(fake_turbo, monkeypatch):
+    server = fake_turbo(
+        "--initial-listings", "3", "--page-size", "3", "--arrival-rate", "0"
+    )
+    monkeypatch.setattr(car_scraper, "TURBO_AZ_BASE_URL", server.base_url)
+    return server
+
+
+@pytest.fixture
+def telegram(server, monkeypatch):
+    """A TurboAzBot posting to the fake server's Bot API stub."""
+    monkeypatch.setenv("BOT_TOKEN", "TOKEN")
+    monkeypatch.setenv("CHAT_ID", "1")
+    telegram = TurboAzBot()
+    telegram.api_url = f"{server.base_url}/botTOKEN"
+    return telegram
+
+
+def stats(server):
+    return httpx.get(f"{server.base_url}/_stats").json()
+
+
+class FakeBot:
+    """Records alerts and edits; every car gets a message."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def send_alerts(self, cars, pending=False):
+        self.calls.append(("send", [car.car_id for car in cars], pending))
+        return {car.car_id: SentAlert(int(car.car_id), True) for car in cars}
+
+    async def update_alerts(self, cars, sent):
+        self.calls.append(("update", cars, sorted(sent)))
+        return len(cars)
+
+
+def test_pending_alerts_say_details_follow(telegram, make_car):
+    car = make_car("1")
+
+    pending = telegram.format_car_message(car, pending=True)
+    final = telegram.format_car_message(car)
+
+    assert "Fetching full details" in pending
+    assert "Fetching full details" not in final
+    assert pending.endswith(f"[View on Turbo.az]({car.url})")
+
+
+def test_sent_alerts_keep_their_message_ids(telegram, server, make_car):
+    cars = [make_car("1"), make_car("2", image_url="")]
+
+    sent = asyncio.run(telegram.send_alerts(cars, pending=True))
+
+    assert sent == {"1": SentAlert(1, photo=True), "2": SentAlert(2, photo=False)}
+    counts = stats(server)
+    assert (counts["telegram_sendPhoto"], counts["telegram_sendMessage"]) == (1, 1)
+
+
+def test_alerts_are_edited_the_way_they_were_sent(telegram, server, make_car):
+    cars = [make_car("1"), make_car("2"), make_car("3")]
+    sent = {"1": SentAlert(5, photo=True), "2": SentAlert(6, photo=False)}
+
+    assert asyncio.run(telegram.update_alerts(cars, sent)) == 2
+
+    counts = stats(server)
+    assert counts["telegram_editMessageCaption"] == 1
+    assert counts["telegram_editMessageText"] == 1
+
+
+def test_an_unchanged_edit_counts_as_updated(telegram, make_car, monkeypatch):
+    async def refuse(url, data):
+        response = httpx.Response(
+            400,
+            text='{"description": "Bad Request: message is not modified"}',
+            request=httpx.Request("POST", url),
+        )
+        raise httpx.HTTPStatusError("400", request=response.request, response=response)
+
+    monkeypatch.setattr(telegram, "_post", refuse)
+
+    assert asyncio.run(
+        telegram.update_car_notification(make_car("1"), SentAlert(1, True))
+    )
+
+
+def listings(monitor, server):
+    return monitor.scraper.get_listings(f"{server.base_url}/autos")
+
+
+def test_alerts_go_out_from_the_cards_then_get_the_details(monitor, server):
+    monitor.bot = FakeBot()
+    cards = listings(monitor, server)
+
+    assert asyncio.run(monitor.deliver(cards)) == 3
+
+    (send, ids, pending), (update, enriched, sent) = monitor.bot.calls
+    assert (send, update) == ("send", "update")
+    assert sorted(ids) == sent == sorted(car.car_id for car in cards)
+    assert pending is True
+    assert enriched[0].car_id == cards[0].car_id
+    assert enriched[0].specifications["Rəng"] == server.inventory.car(2)["color"]
+    # The cards the alerts were formatted from are left as they were
+    assert cards[0].specifications == {}
+
+
+def test_cars_without_details_keep_their_card_alert(monitor, server, make_car):
+    monitor.bot = FakeBot()
+    cards = listings(monitor, server) + [
+        make_car("1", url=f"{server.base_url}/autos/1-gone")
+    ]
+
+    assert asyncio.run(monitor.deliver(cards)) == 4
+
+    send, update = monitor.bot.calls
+    assert "1" in send[1]
+    assert "1" not in [car.car_id for car in update[1]]
+
+
+def test_detail_rules_are_checked_before_alerting(monitor, server):
+    monitor.bot = FakeBot()
+    cards = listings(monitor, server)
+    city = server.inventory.car(1)["city"]
+    monitor.rules = load_rules(
+        f'[{{"field": "owners", "op": ">=", "value": 0}}, {{"field": "city", "op": "==", "value": "{city}"}}]'
+    )
+
+    delivered = asyncio.run(monitor.deliver(cards))
+
+    expected = [
+        str(server.inventory.car(i)["car_id"])
+        for i in (2, 1, 0)
+        if server.inventory.car(i)["city"] == city
+    ]
+    assert delivered == len(expected)
+    assert monitor.bot.calls == [("send", expected, False)]
+
+
+@pytest.fixture
+def app_monitor(db, scraper, monkeypatch):
+    monkeypatch.setattr(car_monitor, "BOT_TOKEN", None)
+    monkeypatch.setattr(monitor_worker, "IMAGE_CACHE_DIR", "")
+    events = []
+    monitor = monitor_worker.AppCarMonitor(
+        db, lambda event, data: events.append((event, data))
+    )
+    monitor.scraper.close()
+    monitor.scraper = scraper
+    monitor.events = events
+    return monitor
+
+
+def test_dashboard_entries_are_updated_with_the_details(app_monitor, server, db):
+    cards = listings(app_monitor, server)
+    newest = server.inventory.car(2)
+
+    asyncio.run(app_monitor.deliver(cards))
+
+    names = [event for event, _ in app_monitor.events]
+    assert names == ["new_car"] * 3 + ["car_updated"] * 3
+    updated = app_monitor.events[3][1]
+    assert (updated["car_id"], updated["city"]) == (
+        str(newest["car_id"]),
+        newest["city"],
+    )
+    assert db.get_car(str(newest["car_id"]))["city"] == newest["city"]
+
+
+def test_only_sent_alerts_are_marked_notified(app_monitor, server, db):
+    class HalfSent(FakeBot):
+        async def send_alerts(self, cars, pending=False):
+            sent = await super().send_alerts(cars, pending)
+            return {cars[0].car_id: sent[cars[0].car_id]}
+
+    app_monitor.bot = HalfSent()
+    cards = listings(app_monitor, server)
+
+    asyncio.run(app_monitor.deliver(cards))
+
+    assert [bool(db.get_car(car.car_id)["notified"]) for car in cards] == [
+        True,
+        False,
+        False,
+    ]
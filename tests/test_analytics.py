@@ -0,0 +1,124 @@
+import pytest
+
+from analytics import MarketIndex, azn_price, deal_label, load_market
+
+pytest.importorskip("numpy")
+
+RATES = {"USD": 1.7}
+
+
+@pytest.fixture
+def index():
+    return MarketIndex(band_km=40000, rates=RATES, min_comparables=3)
+
+
+@pytest.fixture
+def camrys(make_car):
+    """Cards of five comparable Camrys priced 10 000 to 50 000 AZN."""
+
+    def make(start=0, **fields):
+        return [
+            make_car(str(start + n), price=f"{(n + 1) * 10} 000 AZN", **fields)
+            for n in range(5)
+        ]
+
+    return make
+
+
+def prices(index):
+    return {key: group.tolist() for key, group in index.groups.items()}
+
+
+def test_prices_are_converted_to_azn():
+    assert azn_price("$9 000", RATES) == 15300.0
+    assert azn_price("17 500", RATES) == 17500.0
+    assert azn_price("9 000 €", RATES) is None
+    assert azn_price(None, RATES) is None
+
+
+@pytest.mark.parametrize(
+    "percentile, label", [(0, "great"), (20, "great"), (21, "good"), (100, "high")]
+)
+def test_deal_labels(percentile, label):
+    assert deal_label(percentile) == label
+
+
+def test_groups_stay_sorted_as_cards_change(index, camrys, make_car):
+    index.observe(reversed(camrys()))
+    group = ("toyota camry", 2012, 3)
+    assert prices(index) == {group: [10000.0, 20000.0, 30000.0, 40000.0, 50000.0]}
+
+    changed = index.observe(
+        [make_car("1", price="35 000 AZN"), make_car("0", price="10 000 AZN")]
+    )
+
+    assert changed == 1
+    assert prices(index)[group] == [10000.0, 30000.0, 35000.0, 40000.0, 50000.0]
+
+
+def test_cards_move_between_groups_and_empty_groups_go(index, make_car):
+    index.observe([make_car("1")])
+
+    index.observe([make_car("1", mileage="10 000 km")])
+    assert list(index.groups) == [("toyota camry", 2012, 0)]
+
+    index.observe([make_car("1", price="")])
+    assert index.groups == {} and len(index) == 0
+
+
+def test_score_ranks_the_price_among_comparables(index, camrys, make_car):
+    index.observe(camrys())
+
+    score = index.score(make_car("new", price="15 000 AZN"))
+
+    assert score == {
+        "percentile": 20,
+        "comparables": 5,
+        "median": 30000,
+        "label": "great",
+    }
+
+
+def test_ties_count_half_and_the_car_itself_is_left_out(index, camrys):
+    cars = camrys()
+    index.observe(cars)
+
+    score = index.score(cars[2])
+
+    assert (score["comparables"], score["percentile"]) == (4, 50)
+
+
+def test_neighbouring_years_count_but_other_bands_do_not(index, camrys, make_car):
+    index.observe(camrys(0, year="2011") + camrys(10, mileage="10 000 km"))
+
+    assert index.score(make_car("new", year="2012"))["comparables"] == 5
+    assert index.score(make_car("new", year="2014")) == {}
+
+
+def test_too_few_comparables_gives_no_score(index, make_car):
+    index.observe([make_car("1"), make_car("2")])
+
+    assert index.score(make_car("new")) == {}
+
+
+def test_load_matches_observing_the_same_cards(index, camrys, make_car):
+    cars = camrys() + [make_car("usd", price="$10 000"), make_car("eur", price="€9")]
+    index.observe(cars)
+    card = ("toyota camry", 2012, 137000, 2.5)
+    rows = [(str(n), *card, (n + 1) * 10000, "AZN") for n in range(5)]
+    rows += [("usd", *card, 10000, "USD"), ("eur", *card, 9, "EUR")]
+    loaded = MarketIndex(band_km=40000, rates=RATES, min_comparables=3)
+
+    loaded.load(rows)
+
+    assert prices(loaded) == prices(index)
+    assert loaded.cars == index.cars
+    assert loaded.score(cars[0]) == index.score(cars[0])
+
+
+def test_market_is_loaded_from_listing_cards(db, camrys):
+    db.track_listing_prices(camrys())
+
+    market = load_market(db)
+
+    assert len(market) == 5
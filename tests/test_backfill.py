@@ -0,0 +1,180 @@
+import pytest
+
+import backfill
+import rate_budget
+from backfill import (
+    DONE,
+    FAILED,
+    MAX_PAGE_ATTEMPTS,
+    PENDING,
+    Backfill,
+    BackfillStore,
+    parse_split,
+    search_url,
+)
+from rate_budget import RateBudget
+
+
+@pytest.fixture
+def store(db):
+    return BackfillStore(db.db_path)
+
+
+@pytest.fixture
+def server(fake_turbo):
+    """Ten fixed listings, four to a page: pages 1-3."""
+    return fake_turbo(
+        "--initial-listings", "10", "--page-size", "4", "--arrival-rate", "0"
+    )
+
+
+@pytest.fixture
+def make_backfill(db, store):
+    runs = []
+
+    def make(**kwargs):
+        run = Backfill(db, store, details=False, **kwargs)
+        run.scraper.enforce_rate_limit = lambda: None
+        runs.append(run)
+        return run
+
+    yield make
+    for run in runs:
+        run.scraper.close()
+
+
+def test_search_url_sets_and_replaces_parameters():
+    url = search_url(
+        "https://turbo.az/autos?q%5Byear_to%5D=2015&page=1",
+        {"q[year_from]": "2010", "q[year_to]": "2010"},
+    )
+
+    assert url == (
+        "https://turbo.az/autos?page=1&q%5Byear_from%5D=2010&q%5Byear_to%5D=2010"
+    )
+
+
+def test_splits_cover_the_range_in_steps():
+    assert parse_split("year:2010-2012")[1] == (
+        "year 2011",
+        {"q[year_from]": "2011", "q[year_to]": "2011"},
+    )
+    assert [label for label, _ in parse_split("price:10000-14000:2000")] == [
+        "price 10000-11999",
+        "price 12000-13999",
+        "price 14000",
+    ]
+
+
+@pytest.mark.parametrize(
+    "spec", ["colour:1-2", "year:2015-2010", "year:2010", "price:1-9:0", "year"]
+)
+def test_invalid_splits_are_value_errors(spec):
+    with pytest.raises(ValueError):
+        parse_split(spec)
+
+
+def test_planning_again_keeps_progress_unless_restarted(store):
+    assert store.plan([("all", "https://turbo.az/autos")]) == 1
+    partition = store.partitions()[0]
+    store.checkpoint(partition, cars=4, saved=4)
+
+    assert store.plan([("all", "https://turbo.az/autos")]) == 0
+    assert store.partitions()[0].next_page == 2
+
+    store.plan([("all", "https://turbo.az/autos")], restart=True)
+    assert (store.partitions()[0].next_page, store.partitions()[0].cars) == (1, 0)
+
+
+def test_partitions_fail_after_repeated_page_failures(store):
+    store.plan([("all", "https://turbo.az/autos")])
+    partition = store.partitions()[0]
+    for _ in range(MAX_PAGE_ATTEMPTS):
+        store.fail(partition, "page 1 not fetched")
+
+    assert store.partitions(FAILED) == [partition]
+    assert store.retry_failed() == 1
+    assert store.partitions(PENDING)[0].next_page == 1
+
+
+def test_backfill_pages_until_the_results_end(server, store, db, make_backfill):
+    store.plan([("all", f"{server.base_url}/autos")])
+
+    saved = make_backfill().run()
+
+    partition = store.partitions()[0]
+    assert saved == 10
+    assert (partition.status, partition.pages, partition.cars) == (DONE, 3, 10)
+    assert (
+        len(
+            db.get_stored_ids(
+                [str(server.inventory.car(i)["car_id"]) for i in range(10)]
+            )
+        )
+        == 10
+    )
+
+
+def test_backfill_resumes_at_the_checkpoint(server, store, db, make_backfill):
+    store.plan([("all", f"{server.base_url}/autos")])
+    store.checkpoint(store.partitions()[0], cars=4, saved=4)
+
+    assert make_backfill().run() == 6
+    newest = str(server.inventory.car(9)["car_id"])
+    assert db.get_stored_ids([newest]) == set()
+
+
+def test_backfill_stops_at_the_page_cap(server, store, make_backfill):
+    store.plan([("all", f"{server.base_url}/autos")])
+
+    assert make_backfill(max_pages=2).run() == 8
+    assert store.partitions()[0].status == DONE
+
+
+def test_unfetched_pages_are_retried_later(server, store, make_backfill, monkeypatch):
+    store.plan([("all", f"{server.base_url}/autos")])
+    run = make_backfill()
+    monkeypatch.setattr(run.scraper, "get_page_content", lambda *a, **kw: None)
+    pauses = []
+    monkeypatch.setattr(run, "pause", pauses.append)
+
+    assert run.run() == 0
+
+    assert pauses == [backfill.RETRY_DELAY_SECONDS] * (MAX_PAGE_ATTEMPTS - 1)
+    partition = store.partitions()[0]
+    assert (partition.status, partition.error) == (FAILED, "page 1 not fetched")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_budget.time, "time", lambda: now[0])
+    return now
+
+
+def test_budget_slots_keep_the_minimum_delay(tmp_path, clock):
+    budget = RateBudget(str(tmp_path / "budget.db"), per_minute=100, min_delay=2)
+
+    assert [budget.reserve() for _ in range(3)] == [0, 2, 4]
+    clock[0] += 10
+    assert budget.reserve() == 0
+
+
+def test_budget_caps_requests_per_minute(tmp_path, clock):
+    budget = RateBudget(str(tmp_path / "budget.db"), per_minute=2, min_delay=0)
+
+    assert [budget.reserve() for _ in range(3)] == [0, 0, 60]
+
+
+def test_processes_share_one_budget(tmp_path, clock):
+    path = str(tmp_path / "budget.db")
+    monitor, crawler = RateBudget(path, min_delay=2), RateBudget(path, min_delay=2)
+
+    assert (monitor.reserve(), crawler.reserve(), monitor.reserve()) == (0, 2, 4)
+
+
+def test_an_unusable_budget_file_leaves_limiting_to_the_caller(tmp_path):
+    budget = RateBudget(str(tmp_path / "budget.db"))
+    budget.path = str(tmp_path / "missing" / "budget.db")
+
+    assert budget.reserve() is None
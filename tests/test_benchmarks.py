@@ -0,0 +1,87 @@
+import importlib.util
+import json
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from car_scraper import TurboAzScraper
+
+BENCH_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"
+)
+
+
+def load_runner():
+    spec = importlib.util.spec_from_file_location(
+        "run_benchmarks", os.path.join(BENCH_DIR, "run_benchmarks.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+runner = load_runner()
+
+
+@pytest.fixture(scope="module")
+def benchmarks(tmp_path_factory):
+    pytest.importorskip("numpy")
+    workdir = tmp_path_factory.mktemp("bench")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield runner.build_benchmarks(str(workdir))
+    finally:
+        os.chdir(cwd)
+
+
+def test_summarize_reports_percentiles():
+    summary = runner.summarize([float(n) for n in range(1, 101)])
+
+    assert summary["iterations"] == 100
+    assert summary["p50_us"] == 51.0
+    assert summary["p99_us"] == 100.0
+    assert summary["ops_per_sec"] == round(1e6 / 50.5, 1)
+
+
+def result(p50):
+    return {"ops_per_sec": 1.0, "p50_us": p50, "p99_us": p50}
+
+
+def test_compare_flags_only_regressions_beyond_the_tolerance():
+    baseline = {"benchmarks": {"a": result(100.0), "b": result(100.0)}}
+
+    assert runner.compare({"a": result(125.0)}, baseline, 0.3)
+    assert runner.compare({"b": result(50.0)}, baseline, 0.3)
+    assert not runner.compare({"a": result(140.0)}, baseline, 0.3)
+
+
+def test_compare_passes_benchmarks_missing_from_the_baseline():
+    assert runner.compare({"new": result(1e9)}, {"benchmarks": {}}, 0.3)
+
+
+def test_listing_fixture_parses_into_cards():
+    with open(os.path.join(BENCH_DIR, "fixtures", "listing_page.html")) as f:
+        page = BeautifulSoup(f.read(), "html.parser")
+
+    cars = TurboAzScraper().extract_car_listings(page)
+
+    assert cars
+    assert all(car.car_id and car.title and car.price for car in cars)
+    assert len({car.car_id for car in cars}) == len(cars)
+
+
+def test_every_benchmark_runs(benchmarks):
+    for name, (func, scale) in benchmarks.items():
+        func()
+        assert scale > 0, name
+
+
+def test_baseline_covers_every_benchmark(benchmarks):
+    # A benchmark without a baseline entry is reported as "new" and can
+    # never fail the regression gate
+    with open(runner.BASELINE_FILE, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    assert set(benchmarks) <= set(baseline["benchmarks"])
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pytest
+
+import car_monitor
+import car_scraper
+import monitor_worker
+from car_scraper import TurboAzScraper
+from config import KNOWN_CARS_FILE
+
+
+def read_known():
+    with open(KNOWN_CARS_FILE) as f:
+        return f.read().splitlines()
+
+
+def stats(server):
+    return httpx.get(f"{server.base_url}/_stats").json()
+
+
+@pytest.fixture
+def server(fake_turbo, monkeypatch):
+    server = fake_turbo(
+        "--initial-listings", "6", "--page-size", "6", "--arrival-rate", "0"
+    )
+    monkeypatch.setattr(car_scraper, "TURBO_AZ_BASE_URL", server.base_url)
+    return server
+
+
+def test_known_cars_are_appended_once(monitor):
+    assert monitor.add_known_cars(["1", "2", "1"]) == 2
+    assert monitor.add_known_cars(["2", "3"]) == 1
+    assert monitor.add_known_cars(["3"]) == 0
+
+    assert read_known() == ["1", "2", "3"]
+    assert monitor.known_cars == {"1", "2", "3"}
+
+
+def test_appending_keeps_the_ids_already_on_file(monitor):
+    with open(KNOWN_CARS_FILE, "w") as f:
+        f.write("7\n5\n")
+    monitor.load_known_cars()
+
+    monitor.filter_new_cars([])
+    monitor.add_known_car("6")
+
+    assert read_known() == ["7", "5", "6"]
+
+
+def test_new_cars_are_recorded_as_they_are_filtered(monitor, make_car):
+    monitor.add_known_cars(["1"])
+
+    new = monitor.filter_new_cars([make_car("1"), make_car("2")])
+
+    assert [car.car_id for car in new] == ["2"]
+    assert read_known() == ["1", "2"]
+
+
+def test_bootstrap_marks_cards_known_and_indexes_them(monitor, make_car):
+    cars = [make_car("1"), make_car("2")]
+
+    monitor.bootstrap(cars)
+
+    assert read_known() == ["1", "2"]
+    assert "1" in monitor.fingerprints and "2" in monitor.fingerprints
+
+
+def test_first_run_reads_only_the_listing_page(monitor, server):
+    assert asyncio.run(monitor.initialize_monitoring(f"{server.base_url}/autos"))
+
+    assert len(monitor.known_cars) == 6
+    counts = stats(server)
+    assert counts["listing_pages"] == 1
+    assert "detail_pages" not in counts
+
+
+def test_a_later_run_keeps_the_known_cars(monitor, server, make_car):
+    monitor.add_known_cars(["1"])
+
+    asyncio.run(monitor.initialize_monitoring(f"{server.base_url}/autos"))
+
+    assert monitor.known_cars == {"1"}
+    assert "listing_pages" not in stats(server)
+
+
+@pytest.fixture
+def app_monitor(db, monkeypatch):
+    monkeypatch.setattr(car_monitor, "BOT_TOKEN", None)
+    monkeypatch.setattr(monitor_worker, "IMAGE_CACHE_DIR", "")
+    monkeypatch.setattr(TurboAzScraper, "enforce_rate_limit", lambda self: None)
+    monitor = monitor_worker.AppCarMonitor(db, lambda event, data: None)
+    yield monitor
+    if monitor.hydrator:
+        monitor.hydrator.stop()
+        monitor.hydrator.join(5)
+    monitor.scraper.close()
+
+
+def test_web_bootstrap_stores_nothing_by_default(app_monitor, server, db):
+    cars = app_monitor.scraper.get_listings(f"{server.base_url}/autos")
+
+    app_monitor.bootstrap(cars)
+
+    assert app_monitor.hydrator is None
+    assert db.get_stored_ids([car.car_id for car in cars]) == set()
+    assert len(db.get_fingerprints()) == 6
+
+
+def test_hydration_stores_the_bootstrapped_cars_with_details(
+    app_monitor, server, db, monkeypatch
+):
+    monkeypatch.setattr(monitor_worker, "BOOTSTRAP_HYDRATE", True)
+    cars = app_monitor.scraper.get_listings(f"{server.base_url}/autos")
+    db.save_car(cars[0], notified=False)
+
+    app_monitor.bootstrap(cars)
+    app_monitor.hydrator.join(10)
+
+    assert not app_monitor.hydrator.is_alive()
+    assert db.get_stored_ids([car.car_id for car in cars]) == {
+        car.car_id for car in cars
+    }
+    assert stats(server)["detail_pages"] == 5
+    stored = db.get_car(cars[1].car_id)
+    assert stored["brand"] == server.inventory.car(4)["brand"]
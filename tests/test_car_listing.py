@@ -0,0 +1,121 @@
+import sqlite3
+
+from car_scraper import CAR_COLUMNS, CAR_FIELDS, CarListing
+from database import DatabaseManager
+
+
+def detailed_car(make_car):
+    return make_car(
+        "7",
+        city="Bakı",
+        brand="Toyota",
+        condition="Vuruğu yoxdur",
+        all_images=["a.jpg", "b.jpg"],
+        specifications={"Rəng": "Ağ"},
+        deal={"label": "good", "percentile": 12},
+    )
+
+
+def test_schema_follows_the_dataclass():
+    assert CAR_FIELDS[0] == CAR_COLUMNS[0] == "car_id"
+    assert "card_hash" not in CAR_FIELDS
+    # condition is stored under a column name of its own
+    assert CAR_COLUMNS[CAR_FIELDS.index("condition")] == "condition_info"
+
+
+def test_row_round_trip(make_car):
+    car = detailed_car(make_car)
+
+    row = car.to_row()
+
+    assert len(row) == len(CAR_COLUMNS)
+    assert CarListing.from_row(row) == car
+
+
+def test_empty_json_fields_are_stored_as_null(make_car):
+    row = make_car("7").to_row()
+
+    for name in ("all_images", "specifications", "deal"):
+        assert row[CAR_COLUMNS.index(name)] is None
+
+    car = CarListing.from_row(row)
+    assert (car.all_images, car.specifications, car.deal) == ([], {}, {})
+
+
+def test_malformed_json_reads_as_empty(make_car):
+    row = list(make_car("7").to_row())
+    row[CAR_COLUMNS.index("specifications")] = "{not json"
+
+    assert CarListing.from_row(row).specifications == {}
+
+
+def test_repeated_spec_strings_are_shared(make_car):
+    rows = [make_car(str(i), city="".join(["Ba", "kı"])).to_row() for i in range(2)]
+
+    first, second = (CarListing.from_row(row) for row in rows)
+
+    assert first.city is second.city
+
+
+def test_to_dict_uses_column_names(make_car):
+    record = detailed_car(make_car).to_dict()
+
+    assert tuple(record) == CAR_COLUMNS
+    assert record["condition_info"] == "Vuruğu yoxdur"
+
+
+def test_card_hash_only_covers_the_card(make_car):
+    car = make_car("7")
+
+    assert make_car("7", color="Qara").compute_card_hash() == car.compute_card_hash()
+    assert make_car("7", price="1 AZN").compute_card_hash() != car.compute_card_hash()
+
+
+def test_new_database_has_every_column(tmp_path):
+    path = str(tmp_path / "cars.db")
+    DatabaseManager(path)
+
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(found_cars)")]
+    conn.close()
+    assert columns == ["id", *CAR_COLUMNS, "found_at", "notified", "revision"]
+
+
+def test_old_database_gets_missing_columns(tmp_path):
+    path = str(tmp_path / "cars.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE found_cars (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "car_id TEXT UNIQUE, title TEXT, found_at TIMESTAMP, notified BOOLEAN)"
+    )
+    conn.execute("INSERT INTO found_cars (car_id, title) VALUES ('1', 'Old')")
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(path)
+
+    assert db.get_car("1")["title"] == "Old"
+    assert db.get_car("1")["deal"] == {}
+
+
+def test_saved_car_reads_back(db, make_car):
+    car = detailed_car(make_car)
+
+    db.save_car(car)
+    stored = db.get_car("7")
+
+    for name, value in car.to_dict().items():
+        assert stored[name] == value
+    assert stored["notified"] is False
+
+
+def test_save_car_upserts(db, make_car):
+    db.save_car(make_car("7", price="20 000 AZN"))
+    first = db.get_car("7")
+
+    db.save_car(make_car("7", price="19 000 AZN", color="Qara"), notified=True)
+    second = db.get_car("7")
+
+    assert second["id"] == first["id"]
+    assert second["found_at"] == first["found_at"]
+    assert (second["price"], second["color"]) == ("19 000 AZN", "Qara")
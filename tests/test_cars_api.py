@@ -0,0 +1,82 @@
+import pytest
+
+
+@pytest.fixture
+def cars(db, make_car):
+    for n in range(5):
+        brand = "BMW" if n % 2 else "Toyota"
+        db.save_car(make_car(str(n), brand=brand, all_images=[f"{n}.jpg"]))
+    return db
+
+
+def car_ids(response):
+    return [car["car_id"] for car in response.get_json()["cars"]]
+
+
+def test_cars_are_paged_newest_first(client, cars):
+    first = client.get("/api/cars?limit=2")
+    cursor = first.get_json()["next_cursor"]
+    second = client.get(f"/api/cars?limit=2&cursor={cursor}")
+    last = client.get(f"/api/cars?limit=2&cursor={second.get_json()['next_cursor']}")
+
+    assert (car_ids(first), car_ids(second), car_ids(last)) == (
+        ["4", "3"],
+        ["2", "1"],
+        ["0"],
+    )
+    assert last.get_json()["next_cursor"] is None
+
+
+def test_ascending_order_and_filters(client, cars):
+    response = client.get("/api/cars?order=asc&brand=BMW")
+
+    assert car_ids(response) == ["1", "3"]
+
+
+def test_fields_project_the_columns(client, cars):
+    response = client.get("/api/cars?fields=car_id,all_images&limit=1")
+
+    assert response.get_json()["cars"] == [{"car_id": "4", "all_images": ["4.jpg"]}]
+
+
+@pytest.mark.parametrize(
+    "query", ["fields=colour", "order=sideways", "cursor=abc", "year_from=new"]
+)
+def test_bad_parameters_are_400s(client, cars, query):
+    response = client.get(f"/api/cars?{query}")
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_unchanged_data_answers_304(client, cars):
+    first = client.get("/api/cars")
+
+    again = client.get("/api/cars", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_new_cars_change_the_etag(client, cars, make_car):
+    etag = client.get("/api/cars").headers["ETag"]
+
+    cars.save_car(make_car("5"))
+    response = client.get("/api/cars", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert car_ids(response)[0] == "5"
+
+
+def test_etags_differ_per_query(client, cars):
+    assert (
+        client.get("/api/cars?brand=BMW").headers["ETag"]
+        != client.get("/api/cars?brand=Toyota").headers["ETag"]
+    )
+
+
+def test_single_car_and_missing_car(client, cars):
+    car = client.get("/api/cars/3?fields=brand").get_json()
+
+    assert car == {"brand": "BMW"}
+    assert client.get("/api/cars/nope").status_code == 404
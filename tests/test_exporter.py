@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+
+import pytest
+
+from exporter import EXPORT_COLUMNS, CarExport, ExportError
+
+
+@pytest.fixture
+def cars(db, make_car):
+    """Five stored cars: two BMWs from 2010 and three Toyotas from 2014."""
+    for n in range(5):
+        brand, year = ("BMW", "2010") if n < 2 else ("Toyota", "2014")
+        db.save_car(make_car(str(n), brand=brand, year=year, all_images=[f"{n}.jpg"]))
+    return db
+
+
+def export(db, fmt="csv", **kwargs):
+    return CarExport(db.db_path, fmt, **kwargs)
+
+
+def text(export):
+    return "".join(export.stream())
+
+
+def test_rows_are_read_in_id_chunks(cars):
+    chunks = list(export(cars, chunk_size=2).chunks())
+
+    assert [len(rows) for rows in chunks] == [2, 2, 1]
+    ids = [row[0] for rows in chunks for row in rows]
+    assert ids == sorted(ids)
+
+
+def test_cars_stored_during_an_export_are_left_out(cars, make_car):
+    chunks = export(cars, chunk_size=2).chunks()
+    first = next(chunks)
+
+    cars.save_car(make_car("late"))
+
+    assert len(first) + sum(len(rows) for rows in chunks) == 5
+
+
+def test_filters_narrow_the_export(cars):
+    bmws = export(cars, filters={"brand": "BMW"}).chunks()
+    newer = export(cars, filters={"year_from": "2012"}).chunks()
+
+    assert [row[1] for rows in bmws for row in rows] == ["0", "1"]
+    assert [row[1] for rows in newer for row in rows] == ["2", "3", "4"]
+
+
+@pytest.mark.parametrize(
+    "fmt, filters",
+    [("xml", {}), ("csv", {"colour": "red"}), ("csv", {"year_to": "new"})],
+)
+def test_bad_parameters_are_export_errors(db, fmt, filters):
+    with pytest.raises(ExportError):
+        export(db, fmt, filters=filters)
+
+
+def test_csv_has_a_header_and_one_line_per_car(cars):
+    rows = list(csv.reader(io.StringIO(text(export(cars, chunk_size=2)))))
+
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert [row[1] for row in rows[1:]] == ["0", "1", "2", "3", "4"]
+
+
+def test_ndjson_embeds_json_columns(cars):
+    lines = text(export(cars, "ndjson", chunk_size=2)).splitlines()
+
+    first = json.loads(lines[0])
+    assert len(lines) == 5
+    assert first["all_images"] == ["0.jpg"]
+    assert first["notified"] is False
+
+
+def test_empty_tables_export_just_the_header(db):
+    assert text(export(db)) == ",".join(EXPORT_COLUMNS) + "\r\n"
+    assert text(export(db, "ndjson")) == ""
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_formats_round_trip(cars, fmt):
+    pa = pytest.importorskip("pyarrow")
+    data = b"".join(export(cars, fmt, chunk_size=2).stream())
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(pa.BufferReader(data))
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+
+    assert table.column_names == list(EXPORT_COLUMNS)
+    assert table.column("car_id").to_pylist() == ["0", "1", "2", "3", "4"]
+    assert table.column("notified").to_pylist() == [False] * 5
+
+
+def test_endpoint_streams_the_export(web, client, cars):
+    response = client.get("/api/export?format=ndjson&brand=Toyota")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"].endswith("found_cars.ndjson")
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+
+
+def test_endpoint_rejects_unknown_formats(web, client):
+    response = client.get("/api/export?format=xml")
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
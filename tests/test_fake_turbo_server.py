@@ -0,0 +1,118 @@
+import httpx
+from bs4 import BeautifulSoup
+
+from car_scraper import TurboAzScraper, parse_detail_content
+from tests import load_script
+
+fake = load_script("loadtest/fake_turbo_server.py")
+
+
+def get(server, path, **kwargs):
+    return httpx.get(server.base_url + path, timeout=5, **kwargs)
+
+
+def test_inventory_is_deterministic():
+    first = fake.Inventory(50, 0, 0, seed=3)
+    second = fake.Inventory(50, 0, 0, seed=3)
+
+    assert [first.car(i) for i in range(50)] == [second.car(i) for i in range(50)]
+    assert first.car(0) != fake.Inventory(50, 0, 0, seed=4).car(0)
+
+
+def test_inventory_maps_car_ids_back_to_indexes():
+    inventory = fake.Inventory(10, 0, 0, seed=1)
+
+    car = inventory.car(4)
+
+    assert inventory.index_for(car["car_id"]) == 4
+    assert inventory.index_for(car["car_id"] + 1) is None
+    assert inventory.index_for(inventory.car(10)["car_id"]) is None
+
+
+def test_reposts_copy_an_earlier_car():
+    inventory = fake.Inventory(5, 0, 0, seed=1, repost_share=1.0)
+
+    repost = inventory.car(5)
+    source = inventory.car(inventory.index_for(repost["repost_of"]))
+
+    assert (repost["brand"], repost["model"], repost["photo_seed"]) == (
+        source["brand"],
+        source["model"],
+        source["photo_seed"],
+    )
+    assert repost["car_id"] != source["car_id"]
+
+
+def test_listing_page_parses_into_the_newest_cards(fake_turbo):
+    server = fake_turbo("--initial-listings", "40", "--page-size", "10")
+
+    response = get(server, "/autos?page=1")
+    cars = TurboAzScraper().extract_car_listings(
+        BeautifulSoup(response.text, "html.parser")
+    )
+
+    assert response.status_code == 200
+    newest = server.inventory.car(39)
+    assert len(cars) == 10
+    assert cars[0].car_id == str(newest["car_id"])
+    assert cars[0].title == f"{newest['brand']} {newest['model']}"
+
+
+def test_detail_page_parses_into_the_car(fake_turbo):
+    server = fake_turbo("--initial-listings", "5")
+    car = server.inventory.car(2)
+
+    response = get(server, f"/autos/{car['car_id']}-{car['slug']}")
+    details, _, _ = parse_detail_content(response.content, "utf-8")
+
+    assert (details["brand"], details["model"], details["city"]) == (
+        car["brand"],
+        car["model"],
+        car["city"],
+    )
+    assert len(details["all_images"]) == car["photos"]
+
+
+def test_unknown_detail_page_is_404(fake_turbo):
+    server = fake_turbo("--initial-listings", "5")
+
+    assert get(server, "/autos/1-nope").status_code == 404
+
+
+def test_injected_429_carries_retry_after(fake_turbo):
+    server = fake_turbo("--rate-429", "1", "--retry-after", "7")
+
+    response = get(server, "/autos")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert get(server, "/_stats").json()["status_429"] == 1
+
+
+def test_photos_repeat_per_car(fake_turbo):
+    server = fake_turbo("--initial-listings", "5")
+    car_id = server.inventory.car(1)["car_id"]
+    path = f"/uploads/full/autos/{car_id}/01.jpg"
+
+    first, second = get(server, path), get(server, path)
+
+    assert first.headers["Content-Type"] == "image/bmp"
+    assert first.content == second.content
+
+
+def test_telegram_messages_get_ids_and_edits_keep_them(fake_turbo):
+    server = fake_turbo()
+    api = f"{server.base_url}/botTOKEN"
+
+    sent = [
+        httpx.post(f"{api}/sendMessage", data={"chat_id": "1", "text": "hi"})
+        for _ in range(2)
+    ]
+    edited = httpx.post(
+        f"{api}/editMessageText", data={"chat_id": "1", "message_id": "1"}
+    )
+
+    assert [r.json()["result"]["message_id"] for r in sent] == [1, 2]
+    assert edited.json()["result"]["message_id"] == 1
+    assert httpx.get(f"{api}/getMe").json()["result"]["is_bot"] is True
+    assert get(server, "/_stats").json()["telegram_sendMessage"] == 2
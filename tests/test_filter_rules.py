@@ -0,0 +1,152 @@
+import pytest
+
+from filter_rules import (
+    RULES_SETTING,
+    RuleError,
+    compile_rule,
+    compile_rules,
+    first_number,
+    load_rules,
+    parse_rules,
+    rules_from_filters,
+)
+
+
+def passes(car, field, op, value):
+    return (
+        compile_rules([{"field": field, "op": op, "value": value}]).rejects(car) is None
+    )
+
+
+@pytest.mark.parametrize(
+    "text, number",
+    [("150 000 km", 150000.0), ("2.5 L", 2.5), ("1,6 L", 1.6), ("N/A", None)],
+)
+def test_first_number_ignores_thousands_spaces(text, number):
+    assert first_number(text) == number
+
+
+@pytest.mark.parametrize(
+    "field, op, value, expected",
+    [
+        ("color", "==", "ağ", True),
+        ("color", "!=", "Ağ", False),
+        ("color", "in", ["Qara", "Ağ"], True),
+        ("color", "not_in", ["Qara", "Ağ"], False),
+        ("description", "contains", "QƏZAL", True),
+        ("description", "not_contains", ["vuruq", "qəzalı"], False),
+        ("description", "matches", r"^əla\b", True),
+        ("mileage", "<=", 150000, True),
+        ("mileage", ">", "137000", False),
+        ("spec:Lyuk", "==", "var", True),
+    ],
+)
+def test_operators(make_car, field, op, value, expected):
+    car = make_car(
+        color="Ağ",
+        description="Əla vəziyyət, qəzalı deyil",
+        specifications={"Lyuk": "Var"},
+    )
+
+    assert passes(car, field, op, value) is expected
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"field": "colour", "op": "==", "value": "Ağ"},
+        {"field": "color", "op": "~", "value": "Ağ"},
+        {"field": "owners", "op": "<", "value": "two"},
+        {"field": "color", "op": "in", "value": []},
+        {"field": "title", "op": "matches", "value": "("},
+        "owners < 2",
+    ],
+)
+def test_invalid_rules_are_rule_errors(spec):
+    with pytest.raises(RuleError):
+        compile_rule(spec)
+
+
+def test_unknown_fields_never_reject(make_car):
+    car = make_car(color="N/A")
+
+    assert passes(car, "color", "==", "Qara")
+    assert passes(car, "owners", "<=", 1)
+
+
+def test_card_rules_come_first():
+    ruleset = compile_rules(
+        [
+            {"field": "owners", "op": "<=", "value": 2},
+            {"field": "brand", "op": "in", "value": ["BMW"]},
+            {"field": "price", "op": "<", "value": 30000},
+        ]
+    )
+
+    assert [rule.field for rule in ruleset.rules] == ["brand", "price", "owners"]
+    assert not ruleset.on_card
+
+
+def test_card_fields_settle_a_rule_set():
+    ruleset = compile_rules([{"field": "year", "op": ">=", "value": 2010}])
+
+    assert ruleset.on_card
+
+
+def test_brand_allow_list_rejects_on_the_card_title(make_car):
+    ruleset = compile_rules([{"field": "brand", "op": "in", "value": ["BMW", "Kia"]}])
+
+    assert ruleset.rejects(make_car(title="Toyota Camry")) is not None
+    assert ruleset.rejects(make_car(title="Kia Rio")) is None
+
+
+def test_brand_rules_are_still_judged_on_the_detail_page(make_car):
+    ruleset = compile_rules([{"field": "brand", "op": "==", "value": "Land"}])
+    car = make_car(title="Land Rover Defender")
+
+    assert not ruleset.on_card
+    assert ruleset.rejects(car) is None
+    car.brand = "Land Rover"
+    assert ruleset.rejects(car) is not None
+
+
+def test_apply_keeps_the_cars_no_rule_rejects(make_car):
+    ruleset = compile_rules([{"field": "city", "op": "==", "value": "Bakı"}])
+    cars = [make_car("1", city="Bakı"), make_car("2", city="Gəncə"), make_car("3")]
+
+    assert [car.car_id for car in ruleset.apply(cars, "card")] == ["1", "3"]
+
+
+def test_search_settings_become_allow_lists():
+    assert rules_from_filters({"brand": "Toyota, BMW", "city": " "}) == [
+        {"field": "brand", "op": "in", "value": ["Toyota", "BMW"]}
+    ]
+
+
+def test_stored_rules_are_parsed_and_validated():
+    assert parse_rules("  ") == []
+    assert parse_rules('[{"field": "owners", "op": "<", "value": 3}]')[0]["op"] == "<"
+    with pytest.raises(RuleError):
+        parse_rules("[{")
+    with pytest.raises(RuleError):
+        parse_rules('{"field": "owners"}')
+
+
+def test_load_rules_adds_the_search_settings():
+    ruleset = load_rules(
+        '[{"field": "owners", "op": "<", "value": 3}]', {"city": "Bakı"}
+    )
+
+    assert sorted(rule.field for rule in ruleset.rules) == ["city", "owners"]
+
+
+def test_endpoint_saves_only_valid_rules(client, db):
+    rules = [{"field": "owners", "op": "<=", "value": 2}]
+
+    bad = client.post("/api/filter_rules", json={"rules": [{"field": "x"}]})
+    good = client.post("/api/filter_rules", json={"rules": rules})
+
+    assert bad.status_code == 400
+    assert good.get_json()["success"] is True
+    assert client.get("/api/filter_rules").get_json()["rules"] == rules
+    assert parse_rules(db.get_setting(RULES_SETTING, "")) == rules
@@ -0,0 +1,177 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+import car_monitor
+from fingerprint import (
+    ATTRIBUTES,
+    PHOTO,
+    Fingerprint,
+    FingerprintIndex,
+    dhash,
+    hamming,
+    load_index,
+)
+
+HASH = 0x0123456789ABCDEF
+
+
+def fingerprint(car_id, image_hash=None, **fields):
+    card = {
+        "title": "Toyota Camry",
+        "year": "2012",
+        "mileage": "137 000 km",
+        "engine": "2.5 L",
+        "city": "Bakı",
+    }
+    card.update(fields)
+    return Fingerprint.from_fields(car_id, image_hash=image_hash, **card)
+
+
+def index_of(*fingerprints):
+    index = FingerprintIndex(max_distance=4)
+    for item in fingerprints:
+        index.add(item)
+    return index
+
+
+def flip(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_card_values_are_normalized():
+    item = fingerprint("1", title="  TOYOTA  Camry ", engine="2,5 L")
+
+    assert (item.title, item.mileage_bucket, item.engine) == ("toyota camry", 27, "2.5")
+    assert Fingerprint.from_row(item.to_row()) == item
+
+
+def test_same_attributes_in_a_neighbouring_mileage_bucket_match():
+    index = index_of(fingerprint("1"))
+
+    assert index.find(fingerprint("2", mileage="141 000 km")) == ("1", ATTRIBUTES)
+    assert index.find(fingerprint("3", mileage="160 000 km")) is None
+    assert index.find(fingerprint("4", city="Gəncə")) is None
+
+
+def test_different_photos_tell_identical_specs_apart():
+    index = index_of(fingerprint("1", HASH))
+
+    assert index.find(fingerprint("2", ~HASH & (2**64 - 1))) is None
+    assert index.find(fingerprint("3", flip(HASH, 0, 20))) == ("1", ATTRIBUTES)
+
+
+def test_photos_match_an_edited_relist_within_the_distance():
+    index = index_of(fingerprint("1", HASH))
+    edited = {"mileage": "90 000 km", "city": "Gəncə"}
+
+    # One bit in each 16-bit band: 4 bits apart
+    assert index.find(fingerprint("2", flip(HASH, 1, 17, 33, 49), **edited)) == (
+        "1",
+        PHOTO,
+    )
+    assert index.find(fingerprint("3", flip(HASH, 1, 2, 17, 33, 49), **edited)) is None
+
+
+def test_shared_photos_of_other_models_are_ignored():
+    index = index_of(fingerprint("1", HASH))
+
+    assert index.find(fingerprint("2", HASH, title="Kia Rio", mileage="1 km")) is None
+
+
+def test_unidentifiable_listings_never_match():
+    index = index_of(fingerprint("1", HASH, year="N/A"))
+
+    assert index.find(fingerprint("2", HASH, year="N/A")) is None
+
+
+def test_photo_hashes_are_added_to_card_fingerprints():
+    index = index_of(fingerprint("1"))
+
+    assert index.add(fingerprint("1", HASH))
+    assert not index.add(fingerprint("1", HASH))
+    assert index.find(fingerprint("2", HASH, mileage="1 km")) == ("1", PHOTO)
+
+
+def test_dhash_survives_resizing_and_reencoding():
+    Image = pytest.importorskip("PIL.Image")
+
+    def encode(size, fmt):
+        picture = Image.radial_gradient("L").resize(size)
+        buffer = io.BytesIO()
+        picture.save(buffer, fmt)
+        return buffer.getvalue()
+
+    original = dhash(encode((256, 256), "PNG"))
+    copy = dhash(encode((180, 180), "JPEG"))
+
+    assert hamming(original, copy) <= 4
+    assert dhash(b"not an image") is None
+
+
+def test_index_is_built_from_found_cars_once(db, make_car):
+    db.save_car(make_car("1", city="Bakı"))
+
+    index = load_index(db)
+
+    assert index.find(fingerprint("2")) == ("1", ATTRIBUTES)
+    assert len(db.get_fingerprints()) == 1
+    assert "1" in load_index(db)
+
+
+def test_reposts_on_one_page_flag_the_newer_listing(monitor, make_car):
+    cars = [make_car("20", city="Bakı"), make_car("10", city="Bakı")]
+
+    monitor.flag_reposts(cars)
+
+    assert [car.repost_of for car in cars] == ["10", None]
+
+
+def test_suppress_policy_drops_reposts(monitor, make_car, monkeypatch):
+    monkeypatch.setattr(car_monitor, "REPOST_POLICY", "suppress")
+    monitor.flag_reposts([make_car("10", city="Bakı")])
+
+    assert monitor.flag_reposts([make_car("20", city="Bakı")]) == []
+
+
+def test_photo_hashing_gives_up_on_slow_downloads(monitor, make_car, monkeypatch):
+    monkeypatch.setattr(car_monitor, "REPOST_IMAGE_TIMEOUT", 0.2)
+    monitor.hash_images = True
+    release = threading.Event()
+
+    def photo_hash(url):
+        if "slow" in url:
+            release.wait(5)
+        return HASH
+
+    monkeypatch.setattr(monitor, "_photo_hash", photo_hash)
+    cars = [make_car("1"), make_car("2", image_url="https://cdn/slow.jpg")]
+
+    async def hash_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        start = time.perf_counter()
+        hashes = await monitor.hash_photos(cars)
+        ticker.cancel()
+        return hashes, time.perf_counter() - start, ticks
+
+    try:
+        hashes, elapsed, ticks = asyncio.run(hash_while_ticking())
+    finally:
+        release.set()
+
+    assert hashes == {"1": HASH}
+    assert elapsed < 1
+    assert ticks > 5
@@ -0,0 +1,95 @@
+import threading
+
+import httpx
+import pytest
+
+import car_scraper
+import identity_pool
+from car_scraper import AdvancedUserAgentManager
+from identity_pool import IdentityPool
+
+
+@pytest.fixture
+def ua_manager(monkeypatch):
+    monkeypatch.setattr(car_scraper, "FAKE_UA_AVAILABLE", False)
+    return AdvancedUserAgentManager()
+
+
+def echo_user_agent(request):
+    return httpx.Response(200, text=request.headers["User-Agent"])
+
+
+def make_pool(ua_manager, handler=echo_user_agent, **kwargs):
+    return IdentityPool(ua_manager, transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_identities_are_kept_for_a_run_of_requests(ua_manager):
+    pool = make_pool(ua_manager, size=3, rotate_range=(2, 2))
+
+    picks = [pool.next() for _ in range(6)]
+
+    assert picks[0] is picks[1]
+    assert picks[2] is picks[3] and picks[2] is not picks[1]
+    assert len(pool.identities) == 3
+
+
+def test_rotation_stays_within_the_pool_size(ua_manager):
+    pool = make_pool(ua_manager, size=2, rotate_range=(1, 1))
+
+    picks = [pool.next() for _ in range(6)]
+
+    assert len(pool.identities) == 2
+    # With two identities, rotation always moves to the other one
+    assert all(a is not b for a, b in zip(picks, picks[1:]))
+
+
+def test_an_identity_always_sends_its_own_user_agent(ua_manager):
+    pool = make_pool(ua_manager, size=3, rotate_range=(1, 1))
+
+    for _ in range(6):
+        identity = pool.next()
+        assert identity.get("https://turbo.az/").text == identity.user_agent
+
+    assert sum(identity.request_count for identity in pool.identities) == 6
+
+
+def test_retired_identities_are_replaced(ua_manager):
+    pool = make_pool(ua_manager, size=1, rotate_range=(5, 5))
+    retired = pool.next()
+    retired.get("https://turbo.az/")
+
+    pool.retire(retired)
+
+    assert pool.next() is not retired
+    assert retired._client is None
+
+
+def test_close_waits_for_requests_in_flight(ua_manager):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(request):
+        started.set()
+        release.wait(5)
+        return httpx.Response(200)
+
+    identity = make_pool(ua_manager, slow).next()
+    responses = []
+    thread = threading.Thread(
+        target=lambda: responses.append(identity.get("https://turbo.az/"))
+    )
+    thread.start()
+    started.wait(5)
+
+    identity.close()
+    assert identity._client is not None
+
+    release.set()
+    thread.join(5)
+    assert responses[0].status_code == 200
+    assert identity._client is None
+
+
+def test_http2_is_dropped_without_h2(ua_manager, monkeypatch):
+    monkeypatch.setattr(identity_pool, "HTTP2_AVAILABLE", False)
+
+    assert IdentityPool(ua_manager, http2=True).http2 is False
@@ -0,0 +1,151 @@
+import io
+import os
+
+import pytest
+
+import image_cache
+from image_cache import (
+    CACHED,
+    EVICTED,
+    FAILED,
+    ORIGINAL,
+    PENDING,
+    ImageCache,
+    ImagePipeline,
+    photo_key,
+)
+
+URL = "https://turbo.azstatic.com/1.jpg"
+
+
+def photo_bytes(colour="red", size=(64, 48)):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", size, colour).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(str(tmp_path / "images"))
+
+
+@pytest.fixture
+def no_pillow(monkeypatch):
+    monkeypatch.setattr(image_cache, "PILLOW_AVAILABLE", False)
+
+
+def test_unregistered_photos_keep_their_url(cache):
+    assert cache.src(URL) == URL
+    assert cache.src(None) is None
+
+
+def test_registered_photos_are_served_locally(cache):
+    assert cache.register("1", [URL]) == [URL]
+
+    assert cache.src(URL, "large") == f"/img/large/{photo_key(URL)}"
+    pending = cache.lookup(photo_key(URL), "card")
+    assert (pending.url, pending.path) == (URL, None)
+    assert cache.lookup(photo_key(URL), "huge") is None
+
+
+def test_thumbnails_fit_their_size(cache):
+    Image = pytest.importorskip("PIL.Image")
+    cache.register("1", [URL])
+
+    cache.store(URL, photo_bytes(size=(2000, 1000)))
+
+    photo = cache.lookup(photo_key(URL), "card")
+    with Image.open(photo.path) as thumbnail:
+        assert thumbnail.size == (480, 240)
+    assert cache.register("1", [URL]) == []
+
+
+def test_identical_photos_are_stored_once(cache):
+    other = "https://turbo.azstatic.com/2.jpg"
+    cache.register("1", [URL, other])
+    data = photo_bytes()
+
+    written = cache.store(URL, data)
+
+    assert written > 0
+    assert cache.store(other, data) == 0
+    assert cache.stats()[CACHED] == 2
+    assert (
+        cache.lookup(photo_key(URL), "card").path
+        == cache.lookup(photo_key(other), "card").path
+    )
+
+
+def test_without_pillow_the_original_is_served(cache, no_pillow):
+    cache.register("1", [URL])
+    cache.store(URL, b"\x89PNG\r\n\x1a\nrest")
+
+    photo = cache.lookup(photo_key(URL), "large")
+
+    assert photo.mimetype == "image/png"
+    assert photo.etag.endswith(ORIGINAL)
+
+
+def test_least_recently_used_photos_are_evicted(tmp_path, no_pillow, monkeypatch):
+    cache = ImageCache(str(tmp_path / "images"), max_bytes=250)
+    now = [1000.0]
+    monkeypatch.setattr(image_cache.time, "time", lambda: now[0])
+    urls = [f"https://cdn/{n}.jpg" for n in range(3)]
+    cache.register("1", urls)
+    for n, url in enumerate(urls):
+        cache.store(url, bytes([n]) * 100)
+        now[0] += 10
+
+    assert cache.evict() > 0
+
+    statuses = [cache.lookup(photo_key(url), "card").path is None for url in urls]
+    assert statuses == [True, False, False]
+    assert cache.stats()[EVICTED] == 1
+    stored = [name for _, _, names in os.walk(cache.root) for name in names]
+    assert sum(f"-{ORIGINAL}." in name for name in stored) == 2
+
+
+def test_pipeline_downloads_the_card_photo_first(cache, no_pillow):
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return None if "broken" in url else b"data"
+
+    pipeline = ImagePipeline(cache, fetch, workers=1, photos_per_car=2)
+    queued = pipeline.submit("1", URL, [URL, "https://cdn/broken.jpg", "x.jpg"])
+    pipeline.wait()
+
+    assert queued == 2
+    assert fetched == [URL, "https://cdn/broken.jpg"]
+    stats = cache.stats()
+    assert (stats[CACHED], stats[FAILED]) == (1, 1)
+    assert PENDING not in stats
+
+
+@pytest.fixture
+def cached_web(web, cache, monkeypatch):
+    monkeypatch.setattr(web, "image_cache", cache)
+    return web
+
+
+def test_endpoint_serves_cached_photos_immutable(cached_web, client, cache, no_pillow):
+    cache.register("1", [URL])
+    cache.store(URL, b"\x89PNG\r\n\x1a\nrest")
+
+    response = client.get(cache.src(URL))
+
+    assert response.status_code == 200
+    assert response.data == b"\x89PNG\r\n\x1a\nrest"
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+def test_endpoint_redirects_until_the_photo_is_in(cached_web, client, cache):
+    cache.register("1", [URL])
+
+    response = client.get(cache.src(URL))
+
+    assert response.status_code == 302
+    assert response.headers["Location"] == URL
+    assert client.get("/img/card/unknown").status_code == 404
@@ -0,0 +1,128 @@
+import httpx
+import pytest
+
+from metrics import (
+    CONTENT_TYPE,
+    THROTTLE_SLEEP_SECONDS,
+    MetricsRegistry,
+    start_metrics_server,
+    throttle_sleep,
+)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_renders_labelled_series_in_order(registry):
+    requests = registry.counter("requests_total", "Requests", ["status"])
+    requests.inc(status="500")
+    requests.inc(2, status="200")
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{status="200"} 2\n'
+        'requests_total{status="500"} 1\n'
+    )
+
+
+def test_label_values_are_escaped(registry):
+    registry.counter("c", "C", ["path"]).inc(path='a"b\\c\nd')
+
+    assert 'c{path="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_labels_must_match_the_declaration(registry):
+    counter = registry.counter("c", "C", ["status"])
+
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(status="200", method="GET")
+
+
+def test_names_are_unique(registry):
+    registry.counter("c", "C")
+
+    with pytest.raises(ValueError):
+        registry.gauge("c", "C")
+
+
+def test_gauge_is_set_not_added(registry):
+    gauge = registry.gauge("g", "G")
+    gauge.set(5)
+    gauge.set(2.5)
+
+    assert gauge.value() == 2.5
+    assert "g 2.5\n" in registry.render()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 4.25" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_histogram_timer_observes_once(registry):
+    latency = registry.histogram("op_seconds", "Op", ["op"])
+
+    with latency.time(op="save"):
+        pass
+
+    assert latency.snapshot()[("save",)][-1] == 1
+
+
+def test_worker_snapshots_are_summed_into_the_render(registry):
+    requests = registry.counter("requests_total", "Requests", ["status"])
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(1,))
+    requests.inc(status="200")
+    latency.observe(0.5)
+    worker = MetricsRegistry()
+    worker.counter("requests_total", "Requests", ["status"]).inc(3, status="200")
+    worker.histogram("latency_seconds", "Latency", buckets=(1,)).observe(2)
+
+    lines = registry.render([worker.snapshot()]).splitlines()
+
+    assert 'requests_total{status="200"} 4' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    # The local series are left untouched
+    assert requests.value(status="200") == 1
+
+
+def test_throttle_sleep_records_time_slept(monkeypatch):
+    slept = []
+    monkeypatch.setattr("metrics.time.sleep", slept.append)
+    before = THROTTLE_SLEEP_SECONDS.value(reason="test")
+
+    throttle_sleep(0.25, "test")
+    throttle_sleep(0, "test")
+
+    assert slept == [0.25]
+    assert THROTTLE_SLEEP_SECONDS.value(reason="test") == before + 0.25
+
+
+def test_standalone_endpoint_serves_the_registry():
+    server = start_metrics_server(0, host="127.0.0.1")
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        response = httpx.get(f"{base}/metrics")
+        missing = httpx.get(f"{base}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == CONTENT_TYPE
+    assert "# TYPE turboaz_fetch_seconds histogram" in response.text
+    assert missing.status_code == 404
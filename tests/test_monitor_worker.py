@@ -0,0 +1,104 @@
+import queue
+import threading
+
+import pytest
+
+from monitor_worker import MonitorWorker, WorkerSupervisor
+
+
+@pytest.fixture
+def worker():
+    """A MonitorWorker running its loop on a thread, fed through plain queues."""
+    worker = MonitorWorker(queue.Queue(), queue.Queue())
+    thread = threading.Thread(target=worker.run, daemon=True)
+    yield worker, thread
+    if thread.is_alive():
+        worker.commands.put(("shutdown", {}, None))
+        thread.join(5)
+
+
+def replies(worker, count):
+    """The next `count` replies, in arrival order, skipping other events."""
+    received = []
+    while len(received) < count:
+        event, payload = worker.events.get(timeout=5)
+        if event == "reply":
+            received.append((payload["id"], payload["result"]))
+    return received
+
+
+def test_commands_get_replies(worker):
+    worker, thread = worker
+    thread.start()
+    worker.commands.put(("profile_status", {}, 1))
+    worker.commands.put(("bogus", {}, 2))
+
+    (_, status), (_, unknown) = replies(worker, 2)
+
+    assert status["active"] is False
+    assert unknown == {"success": False, "message": "Unknown command bogus"}
+
+
+def test_scraper_test_runs_beside_other_commands(worker, monkeypatch):
+    worker, thread = worker
+    release = threading.Event()
+
+    def slow_test():
+        release.wait(5)
+        return {"success": True, "message": "Found 0 cars"}
+
+    monkeypatch.setattr(worker, "_test_scraper", slow_test)
+    thread.start()
+    worker.commands.put(("test_scraper", {"job_id": "abc"}, 1))
+    worker.commands.put(("profile_status", {}, 2))
+
+    assert replies(worker, 1)[0][0] == 2
+    release.set()
+    assert replies(worker, 1)[0][0] == 1
+
+
+def test_scraper_test_failures_are_reported_with_the_job_id(worker, monkeypatch):
+    worker, _ = worker
+
+    def broken():
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(worker, "_test_scraper", broken)
+
+    result = worker._handle("test_scraper", {"job_id": "abc"})
+
+    assert result["success"] is False
+    assert worker.events.get_nowait() == (
+        "scraper_test",
+        {
+            "success": False,
+            "message": "Scraper test failed: offline",
+            "job_id": "abc",
+        },
+    )
+
+
+def test_supervisor_talks_to_a_spawned_worker():
+    events = []
+    supervisor = WorkerSupervisor(on_event=lambda event, payload: events.append(event))
+    try:
+        status = supervisor.call("profile_status", timeout=30)
+        process = supervisor.process
+    finally:
+        supervisor.shutdown()
+
+    assert status["active"] is False
+    assert "status" in events
+    assert not process.is_alive()
+
+
+def test_scraper_test_endpoint_answers_at_once(web, client, monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        web.supervisor, "send", lambda command, **args: sent.append((command, args))
+    )
+
+    data = client.get("/api/test_scraper").get_json()
+
+    assert data["success"] is True
+    assert sent == [("test_scraper", {"job_id": data["job_id"]})]
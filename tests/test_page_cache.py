@@ -0,0 +1,98 @@
+import pytest
+
+from page_cache import PageCache
+
+
+def test_pages_are_served_while_the_version_holds():
+    cache = PageCache()
+    assert cache.get((1, 1), "/cars") is None
+    cache.put((1, 1), "/cars", "<html>")
+
+    assert cache.get((1, 1), "/cars") == "<html>"
+
+
+def test_a_new_version_drops_every_older_page():
+    cache = PageCache()
+    cache.get((1, 1), "/cars")
+    cache.put((1, 1), "/cars", "old")
+
+    assert cache.get((2, 1), "/cars") is None
+    assert cache.get((1, 1), "/cars") is None
+
+
+def test_pages_rendered_from_older_data_are_not_kept():
+    cache = PageCache()
+    cache.get((2, 1), "/cars")
+
+    cache.put((1, 1), "/cars", "stale")
+
+    assert cache.get((2, 1), "/cars") is None
+
+
+def test_least_recently_used_pages_are_evicted():
+    cache = PageCache(max_entries=2)
+    cache.get(1, "a")
+    for key in ("a", "b"):
+        cache.put(1, key, key)
+    cache.get(1, "a")
+
+    cache.put(1, "c", "c")
+
+    assert [cache.get(1, key) for key in ("a", "b", "c")] == ["a", None, "c"]
+
+
+def test_zero_entries_disables_the_cache():
+    cache = PageCache(max_entries=0)
+    cache.get(1, "a")
+    cache.put(1, "a", "page")
+
+    assert cache.get(1, "a") is None
+
+
+def test_data_and_settings_changes_bump_the_page_version(db, make_car):
+    start = db.get_page_version()
+
+    db.save_car(make_car("1"))
+    after_car = db.get_page_version()
+    db.save_setting("theme", "dark")
+
+    assert after_car == (start[0] + 1, start[1])
+    assert db.get_page_version() == (after_car[0], start[1] + 1)
+
+
+@pytest.fixture
+def renders(web, monkeypatch):
+    """Templates rendered by the app, by name; pages come back as their name."""
+    rendered = []
+
+    def render_template(name, **context):
+        rendered.append(name)
+        return name
+
+    monkeypatch.setattr(web, "render_template", render_template)
+    return rendered
+
+
+def test_pages_render_once_per_version(client, db, renders, make_car):
+    client.get("/cars")
+    client.get("/cars")
+    assert renders == ["cars.html"]
+
+    db.save_car(make_car("1"))
+    client.get("/cars")
+    db.save_setting("theme", "dark")
+    client.get("/cars")
+
+    assert renders == ["cars.html"] * 3
+
+
+def test_query_strings_are_cached_separately(client, renders):
+    client.get("/cars?page=1")
+    client.get("/cars?page=2")
+
+    assert len(renders) == 2
+
+
+def test_redirects_are_not_cached(client, renders):
+    assert client.get("/car/missing").status_code == 302
+    assert client.get("/car/missing").status_code == 302
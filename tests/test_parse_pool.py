@@ -0,0 +1,80 @@
+import pytest
+
+import car_scraper
+from car_scraper import parse_detail_content
+from parse_pool import ParsePool
+from tests import read_fixture
+
+FIXTURES = ["detail_8698765.html", "detail_8712345.html"]
+
+
+def details(results):
+    return [parsed[0] for parsed in results]
+
+
+@pytest.fixture
+def pool():
+    pool = ParsePool(workers=2, chunksize=1, min_batch=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_small_batches_are_parsed_inline(pool):
+    assert pool.map(len, ["abc"]) == [3]
+    assert pool._executor is None
+
+
+def test_single_worker_never_starts_a_pool():
+    pool = ParsePool(workers=1, min_batch=0)
+
+    assert not pool.enabled
+    assert pool.map(len, ["a", "bb", "ccc"]) == [1, 2, 3]
+    assert pool._executor is None
+
+
+def test_pool_parses_like_the_inline_path(pool):
+    pages = [read_fixture(name) for name in FIXTURES]
+    encodings = ["utf-8"] * len(pages)
+
+    pooled = pool.map(parse_detail_content, pages, encodings)
+
+    assert pool._executor is not None
+    assert details(pooled) == details(map(parse_detail_content, pages, encodings))
+
+
+def test_a_broken_pool_falls_back_to_inline(pool, monkeypatch):
+    def broken():
+        raise OSError("spawn failed")
+
+    monkeypatch.setattr(pool, "_get_executor", broken)
+
+    assert pool.map(len, ["a", "bb"]) == [1, 2]
+
+
+def test_parse_errors_come_back_as_none(monkeypatch):
+    def broken(soup):
+        raise ValueError("bad page")
+
+    monkeypatch.setattr(car_scraper, "parse_detail_page", broken)
+
+    assert parse_detail_content(b"<html></html>", None) is None
+
+
+def test_hydrated_cars_get_their_details(scraper, fake_turbo, make_car):
+    server = fake_turbo("--initial-listings", "3")
+    scraper.parse_pool = ParsePool(workers=2, chunksize=1, min_batch=2)
+    inventory = [server.inventory.car(i) for i in range(3)]
+    cars = [
+        make_car(
+            str(car["car_id"]),
+            url=f"{server.base_url}/autos/{car['car_id']}-{car['slug']}",
+        )
+        for car in inventory
+    ]
+
+    scraper.hydrate_cars(cars)
+
+    assert [(car.brand, car.city) for car in cars] == [
+        (car["brand"], car["city"]) for car in inventory
+    ]
+    assert set(scraper.cache) == {car.car_id for car in cars}
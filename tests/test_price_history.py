@@ -0,0 +1,86 @@
+from bot import TurboAzBot
+from car_scraper import parse_price
+
+
+def test_parse_price_splits_value_and_currency():
+    assert parse_price("17 500 AZN") == (17500, "AZN")
+    assert parse_price("12 000 $") == (12000, "USD")
+    assert parse_price("") == (None, None)
+    assert parse_price("Razılaşma yolu ilə") == (None, None)
+
+
+def test_first_sighting_records_history_without_a_drop(db, make_car):
+    assert db.track_listing_prices([make_car("1", price="20 000 AZN")]) == []
+
+    history = db.get_price_history("1")
+    assert [(row["price_value"], row["currency"]) for row in history] == [
+        (20000, "AZN")
+    ]
+
+
+def test_lower_price_is_reported_as_a_drop(db, make_car):
+    db.track_listing_prices([make_car("1", price="20 000 AZN")])
+
+    drops = db.track_listing_prices([make_car("1", price="18 500 AZN")])
+
+    assert len(drops) == 1
+    drop = drops[0]
+    assert drop["car_id"] == "1"
+    assert (drop["old_value"], drop["new_value"], drop["drop"]) == (20000, 18500, 1500)
+    assert [row["price_value"] for row in db.get_price_history("1")] == [20000, 18500]
+
+
+def test_unchanged_card_writes_nothing(db, make_car):
+    db.track_listing_prices([make_car("1")])
+    version = db.get_data_version()
+
+    assert db.track_listing_prices([make_car("1")]) == []
+    assert len(db.get_price_history("1")) == 1
+    assert db.get_data_version() == version
+
+
+def test_price_rise_is_recorded_but_not_a_drop(db, make_car):
+    db.track_listing_prices([make_car("1", price="20 000 AZN")])
+
+    assert db.track_listing_prices([make_car("1", price="21 000 AZN")]) == []
+    assert [row["price_value"] for row in db.get_price_history("1")] == [20000, 21000]
+
+
+def test_currency_change_is_not_a_drop(db, make_car):
+    db.track_listing_prices([make_car("1", price="20 000 AZN")])
+
+    assert db.track_listing_prices([make_car("1", price="12 000 $")]) == []
+
+
+def test_card_change_without_a_new_price_is_not_history(db, make_car):
+    db.track_listing_prices([make_car("1", mileage="137 000 km")])
+
+    assert db.track_listing_prices([make_car("1", mileage="138 000 km")]) == []
+    assert len(db.get_price_history("1")) == 1
+
+
+def test_stored_car_follows_the_listing_price(db, make_car):
+    db.save_car(make_car("1", price="20 000 AZN"))
+    db.track_listing_prices([make_car("1", price="20 000 AZN")])
+
+    db.track_listing_prices([make_car("1", price="19 000 AZN")])
+
+    assert db.get_car("1")["price"] == "19 000 AZN"
+
+
+def test_price_drop_message(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "token")
+    monkeypatch.setenv("CHAT_ID", "1")
+    drop = {
+        "title": "Toyota Camry",
+        "old_price": "20 000 AZN",
+        "new_price": "18 500 AZN",
+        "drop": 1500,
+        "currency": "AZN",
+        "url": "https://turbo.az/autos/1",
+    }
+
+    message = TurboAzBot().format_price_drop_message(drop)
+
+    assert message.startswith("📉 **Price Drop!**")
+    assert "20 000 AZN → **18 500 AZN**" in message
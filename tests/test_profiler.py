@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from profiler import ProfileController, SamplingProfiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def controller(tmp_path):
+    controller = ProfileController(output_dir=str(tmp_path / "profiles"))
+    yield controller
+    controller._finish()
+
+
+def test_samples_only_the_selected_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001, thread_ids={worker.ident})
+    try:
+        profiler.start()
+        time.sleep(0.1)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.samples > 0
+    assert profiler.stacks
+    assert all(stack.startswith("busy;") for stack in profiler.stacks)
+    assert any("busy_loop" in stack for stack in profiler.stacks)
+
+
+def test_top_functions_split_self_and_total_samples():
+    profiler = SamplingProfiler()
+    profiler.stacks = Counter({"main;a;b": 3, "main;a": 1})
+
+    rows = {row["function"]: row for row in profiler.top_functions()}
+
+    assert (rows["b"]["self"], rows["b"]["total"]) == (3, 3)
+    assert (rows["a"]["self"], rows["a"]["total"]) == (1, 4)
+    assert rows["a"]["total_pct"] == 100.0
+    assert rows["b"]["self_pct"] == 75.0
+
+
+def test_reports_hold_the_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler()
+    profiler.start()
+    profiler.stop()
+    profiler.stacks = Counter({"main;a": 2})
+
+    paths = profiler.write_reports(str(tmp_path), "cycle")
+
+    with open(paths["collapsed"], encoding="utf-8") as f:
+        assert f.read() == "main;a 2\n"
+    with open(paths["summary"], encoding="utf-8") as f:
+        assert "main;a" not in f.read()
+
+
+def test_unarmed_cycles_are_not_profiled(controller):
+    with controller.cycle():
+        pass
+
+    assert controller.status()["active"] is False
+    assert controller.last_reports == {}
+
+
+def test_armed_cycles_are_profiled_then_reported(controller):
+    assert controller.request(cycles=2)
+    assert not controller.request(cycles=1)
+
+    with controller.cycle():
+        assert controller.status()["mode"] == "cycle"
+    assert controller.status()["pending_cycles"] == 1
+    with controller.cycle():
+        pass
+
+    status = controller.status()
+    assert (status["active"], status["pending_cycles"]) == (False, 0)
+    assert set(status["last_reports"]) == {"collapsed", "summary"}
+    assert controller.request(cycles=1)
+
+
+def test_attach_adds_helper_threads_to_a_cycle_profile(controller):
+    controller.request(cycles=1)
+    seen = []
+
+    def helper():
+        with controller.attach():
+            seen.append(threading.get_ident() in controller.profiler.thread_ids)
+        seen.append(threading.get_ident() in controller.profiler.thread_ids)
+
+    with controller.cycle():
+        thread = threading.Thread(target=helper)
+        thread.start()
+        thread.join()
+
+    assert seen == [True, False]
+
+
+def test_window_profile_finishes_on_its_own(controller):
+    assert controller.request(seconds=0.05)
+    assert controller.status()["mode"] == "window"
+
+    controller._timer.join()
+
+    assert controller.status()["active"] is False
+    assert controller.last_reports
+
+
+def test_endpoint_is_off_without_an_admin_token(web, client, monkeypatch):
+    monkeypatch.setattr(web, "ADMIN_TOKEN", "")
+
+    response = client.get("/api/admin/profile", headers={"X-Admin-Token": ""})
+
+    assert response.status_code == 404
+
+
+def test_endpoint_rejects_a_wrong_token(web, client, monkeypatch):
+    monkeypatch.setattr(web, "ADMIN_TOKEN", "secret")
+
+    response = client.get("/api/admin/profile", headers={"X-Admin-Token": "nope"})
+
+    assert response.status_code == 403
+
+
+def test_endpoint_asks_the_worker_to_profile(web, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(web, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(
+        web.supervisor,
+        "call",
+        lambda command, **args: calls.append((command, args)) or {"success": True},
+    )
+
+    response = client.post(
+        "/api/admin/profile",
+        json={"cycles": 3},
+        headers={"X-Admin-Token": "secret"},
+    )
+
+    assert response.get_json()["success"] is True
+    assert calls == [("profile", {"cycles": 3, "seconds": None})]
@@ -0,0 +1,148 @@
+import math
+
+import pytest
+
+import similar_cars
+from similar_cars import FEATURE_SCALES, SimilarCars
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def car():
+    def make(car_id, **fields):
+        record = {
+            "car_id": car_id,
+            "title": "Toyota Camry",
+            "price": "20 000 AZN",
+            "year": "2012",
+            "mileage": "137 000 km",
+            "engine": "2.5 L",
+            "brand": "Toyota",
+            "body_type": "Sedan",
+            "transmission": "Avtomat",
+        }
+        record.update(fields)
+        return record
+
+    return make
+
+
+@pytest.fixture
+def index():
+    return SimilarCars()
+
+
+def test_nearest_cars_come_first(index, car):
+    index.add(
+        [
+            car("base"),
+            car("other-brand", brand="BMW", title="BMW 528"),
+            car("older", year="2010"),
+            car("same"),
+        ]
+    )
+
+    nearest = index.similar("base", limit=3)
+
+    assert [car_id for car_id, _ in nearest] == ["same", "older", "other-brand"]
+    assert nearest[0][1] == 0.0
+    assert nearest[1][1] == pytest.approx(1.0)
+    assert nearest[2][1] == pytest.approx(4.0)
+
+
+def test_card_only_cars_take_the_brand_from_the_title(index, car):
+    index.add([car("base"), car("card", brand=None, title="TOYOTA Corolla")])
+
+    assert index.similar("base") == [("card", pytest.approx(0.0))]
+
+
+def test_missing_numbers_add_a_unit_each(index, car):
+    index.add([car("base"), car("bare", mileage="N/A", engine="")])
+
+    assert index.similar("base")[0][1] == pytest.approx(2.0)
+
+
+def test_unknown_cars_have_no_neighbours(index, car):
+    index.add([car("only")])
+
+    assert index.similar("only") == []
+    assert index.similar("missing") == []
+
+
+def test_updates_replace_the_vector_in_place(index, car):
+    index.add([car("base"), car("other")])
+
+    index.add([car("other", year="2016")])
+
+    assert len(index) == 2
+    assert index.similar("base")[0][1] == pytest.approx(4.0)
+
+
+def test_capacity_grows_past_the_initial_allocation(index, car, monkeypatch):
+    monkeypatch.setattr(similar_cars, "INITIAL_CAPACITY", 2)
+
+    index.add([car(str(n), year=str(2000 + n)) for n in range(5)])
+
+    assert len(index.numbers) == 8
+    assert [car_id for car_id, _ in index.similar("0", limit=2)] == ["1", "2"]
+
+
+def stored(db, make_car, count):
+    for n in range(count):
+        db.save_car(make_car(str(n), brand="Toyota", year=str(2010 + n)))
+
+
+def test_refresh_pages_through_the_changed_cars(index, db, make_car, monkeypatch):
+    monkeypatch.setattr(similar_cars, "PAGE_SIZE", 2)
+    stored(db, make_car, 5)
+
+    index.refresh(db)
+
+    assert len(index) == 5
+    assert index.revision == 5
+
+
+def test_refresh_reads_nothing_while_the_version_holds(
+    index, db, make_car, monkeypatch
+):
+    stored(db, make_car, 2)
+    index.refresh(db)
+    reads = []
+    original = db.get_changed_cars
+
+    def get_changed_cars(*args, **kwargs):
+        reads.append(kwargs["after_revision"])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(db, "get_changed_cars", get_changed_cars)
+
+    index.refresh(db)
+    db.save_car(make_car("new"))
+    index.refresh(db)
+
+    assert reads == [2]
+    assert len(index) == 3
+
+
+def test_refresh_picks_up_new_listing_prices(index, db, make_car):
+    stored(db, make_car, 2)
+    db.track_listing_prices([make_car(str(n)) for n in range(2)])
+    index.refresh(db)
+
+    db.track_listing_prices([make_car("1", price="10 000 AZN")])
+    index.refresh(db)
+
+    row = index.rows["1"]
+    assert len(index) == 2
+    assert index.numbers[row][2] == pytest.approx(math.log(10000) / FEATURE_SCALES[2])
+
+
+def test_car_page_lists_similar_cars(web, client, db, make_car, monkeypatch):
+    monkeypatch.setattr(web, "similar_cars", SimilarCars())
+    stored(db, make_car, 3)
+
+    response = client.get("/api/cars/0/similar?fields=car_id")
+
+    assert response.get_json()["cars"] == [{"car_id": "1"}, {"car_id": "2"}]
+    assert client.get("/api/cars/missing/similar").status_code == 404
@@ -0,0 +1,124 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from car_scraper import (
+    CarListing,
+    apply_details,
+    extract_specifications_from_text,
+    parse_detail_page,
+)
+from config import TURBO_AZ_BASE_URL
+from tests import read_fixture
+
+
+def soup(html):
+    return BeautifulSoup(html, "html.parser")
+
+
+def test_text_is_split_on_every_known_label():
+    text = "Şəhər Bakı Marka Toyota Model Camry Buraxılış ili 2012 Yürüş 137 000 km"
+
+    assert extract_specifications_from_text(text) == {
+        "Şəhər": "Bakı",
+        "Marka": "Toyota",
+        "Model": "Camry",
+        "Buraxılış ili": "2012",
+        "Yürüş": "137 000 km",
+    }
+
+
+def test_text_keeps_the_first_value_of_a_repeated_label():
+    assert extract_specifications_from_text("Rəng Ağ Rəng Qara") == {"Rəng": "Ağ"}
+
+
+def test_text_without_labels_gives_nothing():
+    assert extract_specifications_from_text("no labels here") == {}
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        (
+            "detail_8698765.html",
+            {"city": "Gəncə", "brand": "Toyota", "model": "Camry", "owners": "3"},
+        ),
+        (
+            "detail_8712345.html",
+            {"brand": "Jeep", "model": "Grand Cherokee", "mileage": "92 000 km"},
+        ),
+    ],
+)
+def test_detail_fixture(name, expected):
+    details = parse_detail_page(soup(read_fixture(name).decode("utf-8")))
+
+    for key, value in expected.items():
+        assert details[key] == value
+    assert len(details["specifications"]) == 15
+    assert details["description"].startswith("Maşın əla vəziyyətdədir")
+    assert len(details["all_images"]) == len(set(details["all_images"]))
+
+
+def test_property_items_are_read_label_by_label():
+    html = """
+    <div class="product-properties">
+      <div class="product-properties-i"><label>Rəng</label>
+        <div class="product-properties-i-value">Ağ</div></div>
+      <div class="product-properties-i"><label>Vәziyyәti</label>
+        <div class="product-properties-i-value">Vuruğu yoxdur</div></div>
+      <div class="product-properties-i"><label>Lyuk</label>
+        <div class="product-properties-i-value">Var</div></div>
+    </div>"""
+
+    details = parse_detail_page(soup(html))
+
+    assert details["color"] == "Ağ"
+    assert details["condition"] == "Vuruğu yoxdur"
+    assert details["specifications"]["Lyuk"] == "Var"
+
+
+def test_flattened_properties_fall_back_to_the_text_split():
+    html = '<div class="product-properties">Marka BMW Model X5 Rəng Qara</div>'
+
+    details = parse_detail_page(soup(html))
+
+    assert (details["brand"], details["model"], details["color"]) == (
+        "BMW",
+        "X5",
+        "Qara",
+    )
+
+
+def test_table_rows_are_the_last_resort():
+    html = "<table><tr><th>Marka</th><td>Kia</td></tr></table>"
+
+    assert parse_detail_page(soup(html))["brand"] == "Kia"
+
+
+def test_images_follow_selector_priority_without_duplicates():
+    html = """
+    <img src="/uploads/cars/other.jpg">
+    <div class="slider"><img src="https://cdn/slider.jpg"></div>
+    <div class="product-photos"><img data-src="https://cdn/photos.jpg"></div>
+    <img class="slider-img" src="https://cdn/first.jpg">
+    <img class="product-photo" src="https://cdn/first.jpg">
+    <img src="https://cdn/logo.png">"""
+
+    assert parse_detail_page(soup(html))["all_images"] == [
+        "https://cdn/first.jpg",
+        "https://cdn/photos.jpg",
+        "https://cdn/slider.jpg",
+        TURBO_AZ_BASE_URL + "/uploads/cars/other.jpg",
+    ]
+
+
+def test_description_comes_from_the_first_matching_selector():
+    html = '<div class="description">Second</div><div class="product-text">First</div>'
+
+    assert parse_detail_page(soup(html))["description"] == "First"
+
+
+def test_details_are_copied_onto_the_listing(make_car):
+    car = apply_details(make_car("1"), {"color": "Ağ", "not_a_field": "x"})
+
+    assert isinstance(car, CarListing)
+    assert car.color == "Ağ"
@@ -0,0 +1,70 @@
+import subprocess
+import sys
+
+import car_scraper
+from car_scraper import AdvancedUserAgentManager
+from tests import REPO_DIR
+
+HEAVY_MODULES = ("bs4", "httpx", "requests", "http.server", "fake_useragent")
+
+
+def run_fresh(code):
+    """Run code in a new interpreter from the repo; return what it printed."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {REPO_DIR!r}); {code}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def heavy_modules_after(code):
+    loaded = run_fresh(
+        f"{code}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    return [name for name in loaded.split(",") if name]
+
+
+def test_library_imports_leave_heavy_modules_unloaded():
+    assert heavy_modules_after("import car_scraper, car_monitor, bot, metrics") == []
+
+
+def test_a_new_scraper_defers_its_http_client():
+    loaded = heavy_modules_after(
+        "import car_scraper; "
+        "car_scraper.FAKE_UA_AVAILABLE = False; "
+        "car_scraper.TurboAzScraper()"
+    )
+
+    assert loaded == []
+
+
+def test_library_imports_leave_logging_to_the_entry_point():
+    handlers = run_fresh(
+        "import logging, car_scraper, car_monitor, bot; "
+        "print(len(logging.getLogger().handlers))"
+    )
+
+    assert handlers == "0"
+
+
+def test_static_agents_cover_requests_until_the_generator_loads(monkeypatch):
+    monkeypatch.setattr(car_scraper, "FAKE_UA_AVAILABLE", False)
+    manager = AdvancedUserAgentManager()
+
+    assert manager.ua_generator is None
+    assert manager.get_random_desktop_ua() in manager.static_desktop_agents
+
+
+class StubGenerator:
+    chrome = firefox = safari = edge = "Stub/1.0"
+
+
+def test_the_loaded_generator_takes_over(monkeypatch):
+    monkeypatch.setattr(car_scraper, "FAKE_UA_AVAILABLE", False)
+    manager = AdvancedUserAgentManager()
+
+    manager.ua_generator = StubGenerator()
+
+    assert manager.get_random_desktop_ua() == "Stub/1.0"
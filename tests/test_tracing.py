@@ -0,0 +1,127 @@
+import contextvars
+import threading
+
+import pytest
+
+import tracing
+from tracing import current_span, span, start_trace
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """perf_counter that only moves when the test advances it."""
+    now = [100.0]
+    monkeypatch.setattr(tracing.time, "perf_counter", lambda: now[0])
+
+    def advance(seconds):
+        now[0] += seconds
+
+    return advance
+
+
+def test_spans_outside_a_trace_are_no_ops():
+    with span("fetch", "network") as outside:
+        outside.set(status=200)
+
+    assert current_span() is outside
+
+
+def test_spans_nest_under_the_current_span():
+    with start_trace("cycle") as trace:
+        with span("fetch", "network", url="u"):
+            with span("parse", "parse") as inner:
+                inner.set(cars=3)
+
+    root, fetch, parse = trace.spans
+    assert (fetch.parent, parse.parent) == (root, fetch)
+    assert fetch.attrs == {"url": "u"}
+    assert parse.attrs == {"cars": 3}
+    assert all(s.end is not None for s in trace.spans)
+
+
+def test_breakdown_counts_self_time_per_kind(clock):
+    with start_trace("cycle") as trace:
+        with span("fetch", "network"):
+            clock(0.3)
+            with span("sleep", "throttle"):
+                clock(0.2)
+        clock(0.1)
+
+    assert trace.duration_ms == pytest.approx(600)
+    breakdown = trace.breakdown()
+    assert breakdown["network"] == pytest.approx(300)
+    assert breakdown["throttle"] == pytest.approx(200)
+    assert breakdown["other"] == pytest.approx(100)
+
+
+def test_to_dict_offsets_spans_from_the_cycle_start(clock):
+    with start_trace("cycle", url="x") as trace:
+        clock(0.05)
+        with span("fetch", "network"):
+            clock(0.01)
+
+    data = trace.to_dict()
+
+    assert data["spans"][0]["attrs"] == {"url": "x"}
+    fetch = data["spans"][1]
+    assert (fetch["parent"], fetch["start_ms"], fetch["duration_ms"]) == (
+        0,
+        50.0,
+        10.0,
+    )
+
+
+def test_errors_are_recorded_on_the_span():
+    with pytest.raises(RuntimeError):
+        with start_trace("cycle") as trace:
+            with span("fetch", "network"):
+                raise RuntimeError("boom")
+
+    assert trace.spans[1].attrs["error"] == "RuntimeError"
+    assert trace.root.attrs["error"] == "RuntimeError"
+
+
+def test_spans_beyond_the_cap_are_dropped(monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_SPANS", 3)
+
+    with start_trace("cycle") as trace:
+        for _ in range(5):
+            with span("fetch", "network"):
+                pass
+
+    assert len(trace.spans) == 3
+    assert trace.dropped == 3
+
+
+def fetch_page():
+    with span("page", "network"):
+        pass
+
+
+def test_threads_join_the_trace_through_a_copied_context():
+    with start_trace("cycle") as trace:
+        with span("batch", "network") as batch:
+            context = contextvars.copy_context()
+            worker = threading.Thread(target=context.run, args=(fetch_page,))
+            worker.start()
+            worker.join()
+
+    assert trace.spans[-1].name == "page"
+    assert trace.spans[-1].parent is batch
+
+
+def test_saved_traces_are_capped_at_the_retention(db):
+    for cars in range(3):
+        with start_trace("cycle") as trace:
+            with span("fetch", "network"):
+                pass
+        trace.root.set(new_cars=cars)
+        db.save_trace(trace, retention=2)
+
+    traces = db.get_recent_traces()
+
+    assert [t["new_cars"] for t in traces] == [2, 1]
+    assert traces[0]["span_count"] == 2
+    assert [s["name"] for s in traces[0]["spans"]] == ["cycle", "fetch"]
+    assert set(traces[0]["breakdown"]) == set(tracing.KINDS)
+    assert db.get_recent_traces(with_spans=False)[0]["spans"] == []
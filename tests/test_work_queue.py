@@ -0,0 +1,168 @@
+import pytest
+
+import car_scraper
+import crawl_worker
+import work_queue
+from crawl_worker import DETAIL, LISTING, CrawlWorker, page_url, seed
+from work_queue import DONE, FAILED, LEASED, PENDING, SQLiteWorkQueue, open_queue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() for the queue that only moves when the test advances it."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(work_queue.time, "time", lambda: now[0])
+
+    def advance(seconds):
+        now[0] += seconds
+
+    return advance
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "work_queue.db"), max_attempts=2)
+
+
+def test_duplicates_are_queued_once_and_keep_the_higher_priority(queue):
+    assert queue.enqueue("detail", "1", priority=1)
+    assert not queue.enqueue("detail", "1", priority=5)
+    queue.enqueue("detail", "2", priority=3)
+
+    leased = queue.lease("w", limit=5)
+
+    assert [(job.key, job.priority) for job in leased] == [("1", 5), ("2", 3)]
+
+
+def test_leased_jobs_are_hidden_from_other_workers(queue, clock):
+    queue.enqueue("detail", "1", {"card": ["1"]})
+
+    (job,) = queue.lease("a", visibility_timeout=60)
+
+    assert job.payload == {"card": ["1"]}
+    assert job.attempts == 1
+    assert queue.lease("b") == []
+    assert queue.stats() == {"detail": {LEASED: 1}}
+
+
+def test_lease_filters_by_kind(queue):
+    queue.enqueue("listing", "page1")
+    queue.enqueue("detail", "1")
+
+    assert [job.kind for job in queue.lease("w", kinds=["detail"], limit=5)] == [
+        "detail"
+    ]
+
+
+def test_ack_finishes_a_job(queue):
+    queue.enqueue("detail", "1")
+    (job,) = queue.lease("w")
+
+    assert queue.ack(job)
+
+    assert queue.stats() == {"detail": {DONE: 1}}
+    assert not queue.enqueue("detail", "1")
+    assert queue.enqueue("detail", "1", refresh=True)
+
+
+def test_failed_jobs_come_back_after_the_delay(queue, clock):
+    queue.enqueue("detail", "1")
+    (job,) = queue.lease("w")
+
+    assert queue.fail(job, "timeout", retry_in=30)
+
+    assert queue.lease("w") == []
+    clock(30)
+    assert queue.lease("w")[0].attempts == 2
+
+
+def test_jobs_fail_for_good_after_max_attempts(queue):
+    queue.enqueue("detail", "1")
+    for _ in range(2):
+        (job,) = queue.lease("w")
+        queue.fail(job, "boom")
+
+    assert queue.lease("w") == []
+    assert queue.stats() == {"detail": {FAILED: 1}}
+
+
+def test_expired_leases_are_handed_out_again(queue, clock):
+    queue.enqueue("detail", "1")
+    (stale,) = queue.lease("crashed", visibility_timeout=60)
+    clock(61)
+
+    (job,) = queue.lease("w")
+
+    assert job.attempts == 2
+    # The first worker's lease is gone, so it can no longer finish the job
+    assert not queue.ack(stale)
+    assert queue.ack(job)
+
+
+def test_last_attempt_expiring_fails_the_job(queue, clock):
+    queue.enqueue("detail", "1")
+    for _ in range(2):
+        queue.lease("crashed", visibility_timeout=60)
+        clock(61)
+
+    assert queue.lease("w") == []
+    assert queue.stats() == {"detail": {FAILED: 1}}
+
+
+def test_extend_keeps_a_lease(queue, clock):
+    queue.enqueue("detail", "1")
+    (job,) = queue.lease("w", visibility_timeout=60)
+    clock(50)
+
+    assert queue.extend(job, 60)
+    clock(50)
+
+    assert queue.lease("other") == []
+
+
+def test_purge_drops_only_old_finished_jobs(queue, clock):
+    queue.enqueue_many("detail", [("1", None, 0), ("2", None, 0)])
+    queue.ack(queue.lease("w")[0])
+    clock(100)
+
+    assert queue.purge(older_than=50) == 1
+    assert queue.stats() == {"detail": {PENDING: 1}}
+
+
+def test_open_queue_picks_the_backend_by_scheme(tmp_path):
+    assert isinstance(open_queue(f"sqlite:///{tmp_path}/q.db"), SQLiteWorkQueue)
+    with pytest.raises(ValueError):
+        open_queue("redis://localhost")
+
+
+def test_page_url_replaces_the_page_parameter():
+    assert (
+        page_url("https://turbo.az/autos?page=1&year_to=2015", 3)
+        == "https://turbo.az/autos?page=3&year_to=2015"
+    )
+
+
+def test_worker_crawls_listings_then_details(queue, db, fake_turbo, monkeypatch):
+    server = fake_turbo("--initial-listings", "4", "--page-size", "4")
+    monkeypatch.setattr(car_scraper, "TURBO_AZ_BASE_URL", server.base_url)
+    worker = CrawlWorker(queue, db, "w", batch=10)
+    worker.scraper.enforce_rate_limit = lambda: None
+
+    assert seed(queue, db, f"{server.base_url}/autos", pages=1) == 1
+    worker.run([LISTING, DETAIL], once=True)
+
+    assert queue.stats() == {LISTING: {DONE: 1}, DETAIL: {DONE: 4}}
+    newest = server.inventory.car(3)
+    saved = db.get_car(str(newest["car_id"]))
+    assert saved["brand"] == newest["brand"]
+
+
+def test_worker_retries_listing_pages_that_fail(queue, db, monkeypatch):
+    monkeypatch.setattr(crawl_worker, "RETRY_DELAY_SECONDS", 0)
+    worker = CrawlWorker(queue, db, "w", batch=1)
+    monkeypatch.setattr(worker.scraper, "get_listings", lambda url: [])
+    queue.enqueue(LISTING, "page1", {"url": "page1"})
+
+    worker.run([LISTING], once=True)
+
+    assert queue.stats() == {LISTING: {FAILED: 1}}
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Lightweight span tracing for one monitoring cycle.
+
+start_trace() wraps a cycle; span() anywhere below it records a nested, timed
+stage. Outside an active trace span() is a no-op, so the scraper and bot can be
+instrumented unconditionally.
+"""
+import contextvars
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Span kinds, used to colour the waterfall and to split the cycle time
+KINDS = ("network", "parse", "throttle", "storage", "notify", "other")
+
+# Upper bound on spans kept per trace so a huge cycle cannot grow without limit
+MAX_SPANS = 5000
+
+_current_span = contextvars.ContextVar("turboaz_current_span", default=None)
+
+
+class Span:
+    """One timed stage; times are perf_counter seconds."""
+
+    __slots__ = ("trace", "index", "parent", "name", "kind", "attrs", "start", "end")
+
+    def __init__(self, trace, index, parent, name, kind, attrs):
+        self.trace = trace
+        self.index = index
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        """Attach attributes (status, bytes, counts...) to the span."""
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    """Stand-in returned when no trace is active."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    __slots__ = ("parent", "name", "kind", "attrs", "span", "token")
+
+    def __init__(self, parent: Span, name: str, kind: str, attrs: Dict):
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.span = None
+        self.token = None
+
+    def __enter__(self):
+        self.span = self.parent.trace.open_span(
+            self.name, self.kind, self.parent, self.attrs
+        )
+        if self.span is None:
+            return _NULL_SPAN
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.span.end = time.perf_counter()
+            if exc_type is not None:
+                self.span.attrs["error"] = exc_type.__name__
+            _current_span.reset(self.token)
+        return False
+
+
+class Trace:
+    """All spans recorded during one cycle."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now()
+        self.spans: List[Span] = []
+        self.dropped = 0
+        # Spans may be opened from fetch threads as well as the cycle's thread
+        self._lock = threading.Lock()
+        self.root = self.open_span(name, "other", None, {})
+
+    def open_span(
+        self, name: str, kind: str, parent: Optional[Span], attrs: Dict
+    ) -> Optional[Span]:
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                return None
+            span = Span(self, len(self.spans), parent, name, kind, attrs)
+            self.spans.append(span)
+        return span
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return (end - self.root.start) * 1000
+
+    def breakdown(self) -> Dict[str, float]:
+        """Self time per span kind in ms, so nested spans are not double counted."""
+        now = time.perf_counter()
+        durations = [(span.end or now) - span.start for span in self.spans]
+        self_times = list(durations)
+        for span in self.spans:
+            if span.parent is not None:
+                self_times[span.parent.index] -= durations[span.index]
+
+        totals = dict.fromkeys(KINDS, 0.0)
+        for span, self_time in zip(self.spans, self_times):
+            totals[span.kind] = totals.get(span.kind, 0.0) + max(self_time, 0.0)
+        return {kind: round(value * 1000, 2) for kind, value in totals.items()}
+
+    def to_dict(self) -> Dict:
+        """JSON-ready representation with offsets relative to the cycle start."""
+        origin = self.root.start
+        now = time.perf_counter()
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "dropped_spans": self.dropped,
+            "breakdown": self.breakdown(),
+            "spans": [
+                {
+                    "name": span.name,
+                    "kind": span.kind,
+                    "parent": span.parent.index if span.parent is not None else None,
+                    "start_ms": round((span.start - origin) * 1000, 2),
+                    "duration_ms": round(((span.end or now) - span.start) * 1000, 2),
+                    "attrs": span.attrs,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+class start_trace:
+    """Context manager that makes a new Trace current for the enclosed code."""
+
+    def __init__(self, name: str, **attrs):
+        self.trace = Trace(name)
+        self.trace.root.attrs.update(attrs)
+        self.token = None
+
+    def __enter__(self) -> Trace:
+        self.token = _current_span.set(self.trace.root)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.root.end = time.perf_counter()
+        if exc_type is not None:
+            self.trace.root.attrs["error"] = exc_type.__name__
+        _current_span.reset(self.token)
+        return False
+
+
+def span(name: str, kind: str = "other", **attrs):
+    """Time the enclosed block as a child of the current span, if any."""
+    parent = _current_span.get()
+    if parent is None:
+        return _NULL_SPAN
+    return _SpanContext(parent, name, kind, attrs)
+
+
+def current_span():
+    """The innermost active span, or a no-op span outside a trace."""
+    return _current_span.get() or _NULL_SPAN
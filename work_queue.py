@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Crawl work queue with leases, shared by scraper workers on any number of hosts.
+
+Jobs are (kind, key) pairs, e.g. ("listing", <url>) or ("detail", <car id>), and
+the pair is unique, so a car is queued once however many listing pages show
+it. Workers lease jobs in priority order; a lease hides the job from other
+workers for its visibility timeout. ack() completes it, and fail() puts it back
+with a delay. A lease that runs out (the worker crashed or hung) makes the job
+visible again. After max_attempts leases a job is marked failed.
+
+open_queue() picks the backend from a URL. SQLite (sqlite:///work_queue.db) is
+built in and fine for workers sharing a disk; register_backend() plugs in a
+networked store for workers on different machines.
+"""
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from config import WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS, WORK_QUEUE_URL
+
+logger = logging.getLogger(__name__)
+
+# Job statuses
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """One unit of crawl work, as handed to a worker by lease()."""
+
+    id: int
+    kind: str
+    key: str
+    payload: Dict = field(default_factory=dict)
+    priority: int = 0
+    attempts: int = 0
+    lease_token: Optional[str] = None
+    leased_until: float = 0.0
+
+
+class WorkQueue:
+    """Backend interface; see SQLiteWorkQueue for the reference implementation."""
+
+    def enqueue(
+        self,
+        kind: str,
+        key: str,
+        payload: Optional[Dict] = None,
+        priority: int = 0,
+        refresh: bool = False,
+    ) -> bool:
+        """Queue a job unless (kind, key) is already queued.
+
+        A duplicate only raises the queued job's priority. With refresh=True a
+        finished or failed job is queued again; otherwise it stays finished.
+        Returns True if work was queued.
+        """
+        return self.enqueue_many(kind, [(key, payload, priority)], refresh) == 1
+
+    def enqueue_many(
+        self, kind: str, jobs: Iterable[Sequence], refresh: bool = False
+    ) -> int:
+        """Queue (key, payload, priority) tuples; returns how many were queued."""
+        raise NotImplementedError
+
+    def lease(
+        self,
+        worker_id: str,
+        kinds: Optional[Sequence[str]] = None,
+        limit: int = 1,
+        visibility_timeout: float = WORK_LEASE_SECONDS,
+    ) -> List[Job]:
+        """Claim up to `limit` visible jobs, highest priority first."""
+        raise NotImplementedError
+
+    def ack(self, job: Job) -> bool:
+        """Mark a leased job done; False if the lease was lost to another worker."""
+        raise NotImplementedError
+
+    def fail(self, job: Job, error: str = "", retry_in: float = 0.0) -> bool:
+        """Give a leased job back to be retried after `retry_in` seconds."""
+        raise NotImplementedError
+
+    def extend(self, job: Job, seconds: float = WORK_LEASE_SECONDS) -> bool:
+        """Keep a long-running job hidden for another `seconds`."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Job counts by kind and status."""
+        raise NotImplementedError
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs not touched for `older_than` seconds."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in a SQLite file; WAL lets workers on one host share it."""
+
+    def __init__(self, path: str, max_attempts: int = WORK_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Writers queue on the database lock instead of failing straight away
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def init_database(self):
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS crawl_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    job_key TEXT NOT NULL,
+                    payload TEXT NOT NULL DEFAULT '{}',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    visible_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_token TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (kind, job_key)
+                )
+            """
+            )
+            # Serves the lease query: visible jobs of a kind by priority
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_crawl_jobs_lease
+                ON crawl_jobs (status, kind, priority DESC, visible_at)
+            """
+            )
+        finally:
+            conn.close()
+
+    def enqueue_many(
+        self, kind: str, jobs: Iterable[Sequence], refresh: bool = False
+    ) -> int:
+        now = time.time()
+        rows = [
+            (kind, str(key), json.dumps(payload or {}), int(priority), now, now, now)
+            for key, payload, priority in jobs
+        ]
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO crawl_jobs
+                    (kind, job_key, payload, priority, visible_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                rows,
+            )
+            queued = conn.total_changes - before
+
+            # Duplicates: bump priority, and requeue finished ones when asked
+            conn.executemany(
+                "UPDATE crawl_jobs SET priority=? "
+                "WHERE kind=? AND job_key=? AND priority<?",
+                [(row[3], kind, row[1], row[3]) for row in rows],
+            )
+            if refresh:
+                before = conn.total_changes
+                conn.executemany(
+                    f"""
+                    UPDATE crawl_jobs
+                    SET status='{PENDING}', payload=?, priority=?, attempts=0,
+                        visible_at=?, last_error=NULL, updated_at=?
+                    WHERE kind=? AND job_key=? AND status IN ('{DONE}', '{FAILED}')
+                """,
+                    [(row[2], row[3], now, now, kind, row[1]) for row in rows],
+                )
+                queued += conn.total_changes - before
+            conn.execute("COMMIT")
+            return queued
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def lease(
+        self,
+        worker_id: str,
+        kinds: Optional[Sequence[str]] = None,
+        limit: int = 1,
+        visibility_timeout: float = WORK_LEASE_SECONDS,
+    ) -> List[Job]:
+        now = time.time()
+        kind_filter = ""
+        params: List = [now]
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' for _ in kinds)})"
+            params.extend(kinds)
+
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, so two workers can never
+            # select the same rows
+            conn.execute("BEGIN IMMEDIATE")
+
+            # Leases that ran out on their last allowed attempt end here
+            conn.execute(
+                f"""
+                UPDATE crawl_jobs SET status='{FAILED}', updated_at=?,
+                    last_error=COALESCE(last_error, 'lease expired')
+                WHERE status='{LEASED}' AND visible_at<=? AND attempts>=?
+            """,
+                (now, now, self.max_attempts),
+            )
+
+            rows = conn.execute(
+                f"""
+                SELECT id, kind, job_key, payload, priority, attempts
+                FROM crawl_jobs
+                WHERE status IN ('{PENDING}', '{LEASED}') AND visible_at<=? {kind_filter}
+                ORDER BY priority DESC, id
+                LIMIT ?
+            """,
+                params + [limit],
+            ).fetchall()
+
+            jobs = []
+            leased_until = now + visibility_timeout
+            for job_id, kind, key, payload, priority, attempts in rows:
+                token = uuid.uuid4().hex
+                conn.execute(
+                    f"""
+                    UPDATE crawl_jobs SET status='{LEASED}', attempts=attempts+1,
+                        visible_at=?, lease_owner=?, lease_token=?, updated_at=?
+                    WHERE id=?
+                """,
+                    (leased_until, worker_id, token, now, job_id),
+                )
+                jobs.append(
+                    Job(
+                        job_id,
+                        kind,
+                        key,
+                        json.loads(payload),
+                        priority,
+                        attempts + 1,
+                        token,
+                        leased_until,
+                    )
+                )
+            conn.execute("COMMIT")
+            return jobs
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_leased(self, job: Job, assignments: str, params: Sequence) -> bool:
+        """Apply an UPDATE only while `job` still holds its lease."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE crawl_jobs SET {assignments}, updated_at=? "
+                f"WHERE id=? AND lease_token=? AND status='{LEASED}'",
+                (*params, time.time(), job.id, job.lease_token),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def ack(self, job: Job) -> bool:
+        return self._update_leased(job, f"status='{DONE}', lease_token=NULL", ())
+
+    def fail(self, job: Job, error: str = "", retry_in: float = 0.0) -> bool:
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        return self._update_leased(
+            job,
+            "status=?, visible_at=?, last_error=?, lease_token=NULL",
+            (status, time.time() + retry_in, error[:500]),
+        )
+
+    def extend(self, job: Job, seconds: float = WORK_LEASE_SECONDS) -> bool:
+        leased_until = time.time() + seconds
+        if self._update_leased(job, "visible_at=?", (leased_until,)):
+            job.leased_until = leased_until
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT kind, status, COUNT(*) FROM crawl_jobs GROUP BY kind, status"
+            ).fetchall()
+        finally:
+            conn.close()
+        stats: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in rows:
+            stats.setdefault(kind, {})[status] = count
+        return stats
+
+    def purge(self, older_than: float) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"DELETE FROM crawl_jobs WHERE status IN ('{DONE}', '{FAILED}') "
+                "AND updated_at<?",
+                (time.time() - older_than,),
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+_BACKENDS: Dict[str, Callable[[str], WorkQueue]] = {}
+
+
+def register_backend(scheme: str, factory: Callable[[str], WorkQueue]):
+    """Make open_queue() build `factory(url)` for URLs starting with `scheme://`."""
+    _BACKENDS[scheme] = factory
+
+
+def _open_sqlite(url: str) -> WorkQueue:
+    # sqlite:///relative.db or sqlite:////absolute/path.db
+    return SQLiteWorkQueue(url[len("sqlite:///") :])
+
+
+register_backend("sqlite", _open_sqlite)
+
+
+def open_queue(url: str = WORK_QUEUE_URL) -> WorkQueue:
+    """Open the work queue named by `url`."""
+    scheme = url.split("://", 1)[0] if "://" in url else ""
+    factory = _BACKENDS.get(scheme)
+    if factory is None:
+        raise ValueError(
+            f"No work queue backend for {url!r} (known: {', '.join(sorted(_BACKENDS))})"
+        )
+    return factory(url)